@@ -1,19 +1,292 @@
-from flask import Flask, render_template_string, jsonify
-from lco_integration import LCOIntegration
+from flask import Flask, Blueprint, Response, current_app, g, jsonify, request, stream_with_context
+from flask.json.provider import DefaultJSONProvider
+from LCO_Integration import SimpleLCODemo as LCOIntegration
+from lco_async import AsyncLCOClient, AsyncTransport, EventLoopThread, ThreadedTransport
+from lco_disk_cache import DEFAULT_PATH as HTTP_CACHE_PATH, DiskCacheTransport, disk_cached
+from lco_replay import CassetteTransport
+from lco_resilience import find_breaker
+from lco_transport import get_default_transport
+from forecast import _cached_timeline, forecast_timeline, seconds_until_next_step
+from ephemeris import _cached_night
+import almanac
+from metrics import HTTP_SECONDS, REGISTRY, STAGE_SECONDS, SamplingProfiler
+from static_page import PrecompressedPage
+from status_stream import StatusHub, sse_format
+import records
+from visibility_raster import DEFAULT_DIR as RASTER_DIR, RasterStore
 import os
+import time
 
-app = Flask(__name__)
+BASE_DIR = os.path.dirname(os.path.abspath(__file__))
 
-@app.route('/')
+skywatch = Blueprint('skywatch', __name__)
+
+
+class RecordJSONProvider(DefaultJSONProvider):
+    """jsonify that writes SiteTable/InstrumentTable columns straight to JSON text"""
+
+    def dumps(self, obj, **kwargs):
+        kwargs.setdefault('default', self.default)
+        kwargs.setdefault('ensure_ascii', self.ensure_ascii)
+        kwargs.setdefault('sort_keys', self.sort_keys)
+        return records.dumps(obj, **kwargs)
+
+
+def get_lco():
+    """The worker's shared LCO client, built once in create_app"""
+    return current_app.extensions['lco']
+
+def get_lco_async():
+    """The worker's asyncio LCO client, sharing the sync client's cache"""
+    return current_app.extensions['lco_async']
+
+async def run_async(coro):
+    """Await coro on the worker's background event loop, where the async client's connections live
+
+    The calling WSGI thread still blocks until coro finishes, so in-flight
+    requests per process stay bounded by the server's threads (see README).
+    """
+    return await current_app.extensions['event_loop'].wrap(coro)
+
+
+@skywatch.before_app_request
+def start_request_timer():
+    g.request_started = time.perf_counter()
+    # ?profile=1 swaps the response for the request's sampled stacks, when enabled
+    if current_app.config['PROFILE_REQUESTS'] and request.args.get('profile'):
+        g.profiler = SamplingProfiler(interval=current_app.config['PROFILE_INTERVAL']).start()
+
+@skywatch.after_app_request
+def record_request(response):
+    route = request.url_rule.rule if request.url_rule else 'unmatched'
+    HTTP_SECONDS.observe(time.perf_counter() - g.request_started, route=route, status=response.status_code)
+
+    profiler = g.pop('profiler', None)
+    if profiler is not None:
+        profiler.stop()
+        response = Response(profiler.collapsed(), mimetype='text/plain')
+        response.headers['X-Profile-Samples'] = str(sum(profiler.samples.values()))
+    return response
+
+@skywatch.route('/metrics')
+def metrics():
+    return Response(REGISTRY.render(), mimetype='text/plain; version=0.0.4')
+
+@skywatch.route('/')
 def index():
-    with open('index.html', 'r') as f:
-        return f.read()
+    return current_app.extensions['index_page'].response(request)
 
-@app.route('/api/lco/<site_code>')
-def get_lco_data(site_code):
-    lco = LCOIntegration(os.getenv('LCO_API_TOKEN'))
-    data = lco.get_site_data(site_code)
+@skywatch.route('/api/lco/batch')
+async def get_lco_batch():
+    site_codes = [code.strip() for code in request.args.get('sites', '').split(',') if code.strip()]
+    if not site_codes:
+        return jsonify({'error': 'sites is required, e.g. ?sites=ogg,coj'}), 400
+    if len(site_codes) > current_app.config['BATCH_MAX_SITES']:
+        return jsonify({'error': f"at most {current_app.config['BATCH_MAX_SITES']} sites per batch"}), 400
+
+    # Partial results are still a 200, failed sites are listed under 'errors'
+    data = await run_async(get_lco_async().get_sites_data(site_codes, timeout=current_app.config['BATCH_TIMEOUT']))
     return jsonify(data)
 
+# Stays synchronous: it is nearly always a cache hit, where an async view's
+# per-request event loop costs more than overlapping I/O saves
+@skywatch.route('/api/lco/<site_code>')
+def get_lco_data(site_code):
+    try:
+        data = get_lco().get_site_data(site_code)
+    except Exception as e:
+        return jsonify({'error': f'LCO API unavailable: {e}'}), 502
+    if data is None:
+        return jsonify({'error': f'Site {site_code} not found'}), 404
+    with STAGE_SECONDS.time(stage='render'):
+        return jsonify(data)
+
+@skywatch.route('/api/lco/<site_code>/report')
+async def get_lco_report(site_code):
+    if await run_async(get_lco_async().get_site(site_code)) is None:
+        return jsonify({'error': f'Site {site_code} not found'}), 404
+    report = await run_async(get_lco_async().generate_forecast_report(site_code))
+    return Response(report, mimetype='text/plain; charset=utf-8')
+
+@skywatch.route('/api/lco/<site_code>/stream')
+def stream_lco_status(site_code):
+    if get_lco().get_site(site_code) is None:
+        return jsonify({'error': f'Site {site_code} not found'}), 404
+
+    hub = current_app.extensions['status_hub']
+    heartbeat = current_app.config['STATUS_HEARTBEAT']
+
+    def events():
+        # Every browser shares the site's single poller; this only drains our own queue
+        subscription = hub.subscribe(site_code)
+        try:
+            yield f"retry: {heartbeat * 1000}\n\n"
+            while True:
+                event = subscription.get(timeout=heartbeat)
+                yield sse_format(*event, dumps=records.dumps) if event else ": keepalive\n\n"
+        finally:
+            hub.unsubscribe(site_code, subscription)
+
+    response = Response(stream_with_context(events()), mimetype='text/event-stream')
+    response.headers['Cache-Control'] = 'no-cache'
+    response.headers['X-Accel-Buffering'] = 'no'
+    return response
+
+@skywatch.route('/api/nearest')
+def get_nearest():
+    lat = request.args.get('lat', type=float)
+    lon = request.args.get('lon', type=float)
+    k = request.args.get('k', default=3, type=int)
+    radius_km = request.args.get('radius_km', type=float)
+    if lat is None or lon is None:
+        return jsonify({'error': 'lat and lon are required'}), 400
+    if not -90 <= lat <= 90 or not -180 <= lon <= 180:
+        return jsonify({'error': 'lat must be within ±90 and lon within ±180'}), 400
+    if not 1 <= k <= current_app.config['NEAREST_MAX_K']:
+        return jsonify({'error': f"k must be between 1 and {current_app.config['NEAREST_MAX_K']}"}), 400
+    if radius_km is not None and radius_km <= 0:
+        return jsonify({'error': 'radius_km must be positive'}), 400
+
+    data = get_lco().nearest_sites(lat, lon, k, radius_km)
+    with STAGE_SECONDS.time(stage='render'):
+        return jsonify({'lat': lat, 'lon': lon, 'k': k, 'radius_km': radius_km, **data})
+
+@skywatch.route('/api/visibility/point')
+def get_visibility_point():
+    lat = request.args.get('lat', type=float)
+    lon = request.args.get('lon', type=float)
+    if lat is None or lon is None:
+        return jsonify({'error': 'lat and lon are required'}), 400
+    if not -90 <= lat <= 90 or not -180 <= lon <= 180:
+        return jsonify({'error': 'lat must be within ±90 and lon within ±180'}), 400
+    raster = current_app.extensions['raster'].current()
+    if raster is None:
+        return jsonify({'error': 'visibility raster not built yet'}), 503
+
+    row, col = raster.cell(lat, lon)
+    scores = raster.point(lat, lon)
+    slot = raster.slot()
+    return jsonify({
+        'cell': {'lat': 90 - (row + 0.5) * raster.resolution, 'lon': -180 + (col + 0.5) * raster.resolution,
+                 'size': raster.resolution},
+        'start': raster.slot_start(0),
+        'step': raster.step,
+        'slot': slot,
+        'score': int(scores[slot]) if slot is not None else None,
+        'scores': scores.tolist(),
+    })
+
+@skywatch.route('/api/visibility/tiles/<int:slot>/<int:z>/<int:x>/<int:y>.png')
+def get_visibility_tile(slot, z, x, y):
+    raster = current_app.extensions['raster'].current()
+    if raster is None:
+        return jsonify({'error': 'visibility raster not built yet'}), 503
+    if not (slot < raster.slots and z <= current_app.config['RASTER_MAX_ZOOM'] and x < 2 ** z and y < 2 ** z):
+        return jsonify({'error': 'tile out of range'}), 404
+
+    response = Response(current_app.extensions['raster'].tile_png(raster, slot, z, x, y), mimetype='image/png')
+    response.headers['Cache-Control'] = 'public, max-age=3600'
+    response.set_etag(f'{raster.version}-{slot}-{z}-{x}-{y}')
+    return response.make_conditional(request)
+
+@skywatch.route('/api/forecast')
+def get_forecast():
+    lat = request.args.get('lat', type=float)
+    lon = request.args.get('lon', type=float)
+    hours = request.args.get('hours', default=6, type=int)
+    step = request.args.get('step', default=30, type=int)
+    if lat is None or lon is None:
+        return jsonify({'error': 'lat and lon are required'}), 400
+
+    try:
+        with STAGE_SECONDS.time(stage='forecast'):
+            data = forecast_timeline(lat, lon, hours, step)
+    except ValueError as e:
+        return jsonify({'error': str(e)}), 400
+
+    with STAGE_SECONDS.time(stage='render'):
+        response = jsonify(data)
+    # Same cell, same slot -> same answer, so shared caches can keep it until the next step
+    response.headers['Cache-Control'] = f'public, max-age={seconds_until_next_step(step)}'
+    return response
+
+
+def create_app(config=None):
+    """Build the app with one LCO client and the page loaded into memory
+
+    Called once per worker process. The client's transport pool and caches
+    are thread-safe, so every request thread in the worker shares them.
+    """
+    app = Flask(__name__)
+    app.json = RecordJSONProvider(app)
+    app.config.from_mapping(
+        LCO_API_TOKEN=os.getenv('LCO_API_TOKEN'),
+        LCO_API_URL=os.getenv('LCO_API_URL'),
+        LCO_ARCHIVE_URL=os.getenv('LCO_ARCHIVE_URL'),
+        # Set to a directory to record upstream responses, or replay them offline
+        LCO_CASSETTES=os.getenv('LCO_CASSETTES'),
+        LCO_CASSETTE_MODE=os.getenv('LCO_CASSETTE_MODE', 'auto'),
+        INDEX_PATH=os.path.join(BASE_DIR, 'index2.0.html'),
+        INDEX_MAX_AGE=300,
+        BATCH_MAX_SITES=20,
+        BATCH_TIMEOUT=15,
+        NEAREST_MAX_K=20,
+        STATUS_POLL_INTERVAL=30,
+        STATUS_HEARTBEAT=15,
+        # Built nightly by visibility_raster.py
+        RASTER_DIR=os.getenv('SKYWATCH_RASTER_DIR', RASTER_DIR),
+        RASTER_MAX_ZOOM=8,
+        # Sampling profiler on ?profile=1; leave off in production, it exposes stack frames
+        PROFILE_REQUESTS=os.getenv('SKYWATCH_PROFILE') == '1',
+        PROFILE_INTERVAL=0.002,
+        # Upstream requests in flight at once across every async route in the worker
+        ASYNC_MAX_CONCURRENCY=64,
+        # Response cache shared by every worker on the host; 'off' disables it
+        HTTP_CACHE_PATH=os.getenv('SKYWATCH_HTTP_CACHE', HTTP_CACHE_PATH),
+    )
+    if config:
+        app.config.update(config)
+
+    if app.config['LCO_CASSETTES']:
+        transport = CassetteTransport(app.config['LCO_CASSETTES'], app.config['LCO_CASSETTE_MODE'])
+    else:
+        transport = get_default_transport()
+        if not isinstance(transport, DiskCacheTransport):
+            transport = disk_cached(transport, app.config['HTTP_CACHE_PATH'])
+    app.extensions['lco'] = LCOIntegration(
+        app.config['LCO_API_TOKEN'],
+        transport=transport,
+        base_url=app.config['LCO_API_URL'],
+        archive_url=app.config['LCO_ARCHIVE_URL'],
+    )
+    # Async routes share one event loop per worker, so their upstream I/O overlaps;
+    # cassettes are blocking, so with them configured the async client calls them from threads
+    if app.config['LCO_CASSETTES']:
+        async_transport = ThreadedTransport(transport)
+    else:
+        # Shares the blocking stack's disk cache and circuit breakers, so both paths fail fast together
+        async_transport = AsyncTransport(max_per_host=app.config['ASYNC_MAX_CONCURRENCY'],
+                                         cache=transport if isinstance(transport, DiskCacheTransport) else None,
+                                         breaker=find_breaker(transport))
+    app.extensions['event_loop'] = EventLoopThread()
+    app.extensions['lco_async'] = AsyncLCOClient(
+        app.extensions['lco'], async_transport, max_concurrency=app.config['ASYNC_MAX_CONCURRENCY'])
+    app.extensions['status_hub'] = StatusHub(
+        app.extensions['lco'].refresh_telescope_status, app.config['STATUS_POLL_INTERVAL'])
+    app.extensions['raster'] = RasterStore(app.config['RASTER_DIR'])
+    REGISTRY.register_cache('lco', app.extensions['lco'].cache)
+    REGISTRY.register_cache('forecast_timeline', _cached_timeline)
+    REGISTRY.register_cache('night_ephemeris', _cached_night)
+    REGISTRY.register_cache('almanac', almanac.CACHE)
+    if isinstance(transport, DiskCacheTransport):
+        REGISTRY.register_cache('http_disk', transport)
+    app.extensions['index_page'] = PrecompressedPage.from_file(
+        app.config['INDEX_PATH'], max_age=app.config['INDEX_MAX_AGE'])
+    app.register_blueprint(skywatch)
+    return app
+
+
+app = create_app()
+
 if __name__ == '__main__':
-    app.run(debug=True)
\ No newline at end of file
+    app.run(debug=True)
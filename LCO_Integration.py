@@ -1,127 +1,306 @@
-# simple_lco_demo.py
-# Run this with: python3 simple_lco_demo.py
-# No extra packages needed - uses only Python standard library
+# LCO_Integration.py
+# Run this with: python3 LCO_Integration.py
+# Needs numpy (visibility scoring, ephemeris, planner, scheduler, records); simple_lco_demo.py is the stdlib-only copy
 
-import json
-import urllib.request
 import urllib.parse
 from datetime import datetime, timedelta
 import math
+from concurrent.futures import ThreadPoolExecutor, wait
+
+from almanac import almanac
+from ephemeris import utc_now, visible_targets
+from lco_cache import TTLCache
+from lco_health import probe_endpoints
+from lco_pagination import iter_records
+from lco_transport import TransportError, get_default_transport
+from metrics import error_category, timed
+from planner import plan_season
+from records import InstrumentTable, SiteTable
+from scheduler import schedule
+from site_index import SiteIndex
+from status_stream import state_counts
+from visibility import score_grid, time_grid
 
 
 class SimpleLCODemo:
-    def __init__(self, api_token=None):
+    # (fresh seconds, extra seconds served stale while refreshing) per endpoint
+    CACHE_TTLS = {
+        'sites': (24 * 3600, 7 * 24 * 3600),
+        'instruments': (300, 600),
+        'health': (60, 0),
+    }
+
+    def __init__(self, api_token=None, transport=None, cache=None,
+                 base_url=None, archive_url=None):
         self.api_token = api_token
-        self.base_url = "https://observe.lco.global/api"
+        # Override both to run against a local stand-in (see lco_standin.py)
+        self.base_url = base_url or "https://observe.lco.global/api"
+        self.archive_url = archive_url or "https://archive-api.lco.global"
+        # Shared keep-alive pool, pass your own transport to tune timeouts
+        self.transport = transport or get_default_transport()
+        self.cache = cache or TTLCache(max_entries=128)
+        # Bounded pool for multi-site fan-out, shared by every caller of this client
+        self.executor = ThreadPoolExecutor(max_workers=8, thread_name_prefix='lco-batch')
+        # Ball tree over site coordinates, re-indexed whenever the site list changes
+        self.site_index = SiteIndex()
+
+    def _auth_headers(self):
+        headers = {}
+        if self.api_token:
+            headers['Authorization'] = f'Token {self.api_token}'
+        return headers
+
+    def _fetch_json(self, url):
+        """Like make_request, but raises instead of returning None"""
+        return self.transport.get_json(url, self._auth_headers())
 
     def make_request(self, url):
         """Make HTTP request to LCO API"""
         try:
-            req = urllib.request.Request(url)
-            if self.api_token:
-                req.add_header('Authorization', f'Token {self.api_token}')
-
-            with urllib.request.urlopen(req, timeout=10) as response:
-                return json.loads(response.read().decode())
+            return self._fetch_json(url)
         except Exception as e:
-            print(f"API Request failed: {e}")
+            print(f"API Request failed ({error_category(e)}): {e}")
             return None
 
-    def test_connection(self):
-        """Test if we can connect to LCO API"""
+    def check_health(self, timeout=10):
+        """Probe all candidate endpoints at once and report which one answered"""
         # Try multiple endpoints to find working one
         test_urls = [
             f"{self.base_url}/sites/",
             f"{self.base_url}/site/",
-            "https://observe.lco.global/api/profile/",
-            "https://archive-api.lco.global/frames/"
+            f"{self.base_url}/profile/",
+            f"{self.archive_url}/frames/"
         ]
+        ttl, stale = self.CACHE_TTLS['health']
+        return self.cache.get_or_load(
+            'health', lambda: probe_endpoints(test_urls, self._fetch_json, timeout), ttl, stale)
+
+    def test_connection(self):
+        """Test if we can connect to LCO API"""
+        report = self.check_health()
+
+        for endpoint in report['endpoints']:
+            latency = f"{endpoint['latency_ms']:.0f} ms" if endpoint['latency_ms'] is not None else "-"
+            print(f"Testing: {endpoint['url']} - {endpoint['status']} ({latency})")
 
-        for url in test_urls:
-            print(f"Testing: {url}")
-            data = self.make_request(url)
-            if data:
-                print("✅ Successfully connected to LCO API!")
-                if isinstance(data, dict) and 'results' in data:
-                    print(f"Found {len(data.get('results', []))} items")
-                else:
-                    print("Connected and received data")
-                return True
+        if report['ok']:
+            print("✅ Successfully connected to LCO API!")
+            winner = next(e for e in report['endpoints'] if e['url'] == report['winner'])
+            if 'items' in winner:
+                print(f"Found {winner['items']} items")
+            else:
+                print("Connected and received data")
+            return True
 
         print("❌ Could not connect to LCO API")
         print("This is normal - LCO API may require authentication or have changed endpoints")
         return False
 
-    def get_observatory_sites(self):
-        """Get list of all LCO observatory sites"""
+    def _cached(self, key, endpoint, fetch):
+        """cache.get_or_load for fetch(); raises fetch's error when it fails with nothing cached to fall back on"""
+        errors = []
+
+        def load():
+            try:
+                return fetch()
+            except Exception as e:
+                print(f"API Request failed ({error_category(e)}): {e}")
+                errors.append(e)
+                return None
+
+        ttl, stale = self.CACHE_TTLS[endpoint]
+        value = self.cache.get_or_load(key, load, ttl, stale)
+        if value is None:
+            raise errors[0] if errors else TransportError(f"{endpoint} unavailable")
+        return value
+
+    def _fetch_sites(self):
+        """Download the site list and index it by code"""
         url = f"{self.base_url}/sites/"
-        data = self.make_request(url)
-
-        if data and 'results' in data:
-            sites = []
-            for site in data['results']:
-                sites.append({
-                    'code': site.get('code'),
-                    'name': site.get('name'),
-                    'latitude': site.get('latitude'),
-                    'longitude': site.get('longitude'),
-                    'elevation': site.get('elevation'),
-                    'timezone': site.get('timezone')
-                })
-            return sites
-        return []
+        data = self._fetch_json(url)
+        if not data or 'results' not in data:
+            raise TransportError("Site list response has no results", url=url)
+        sites = SiteTable.from_records(data['results'])
+        return sites, sites.index('code')
 
-    def get_telescope_status(self, site_code=None):
-        """Get current telescope status"""
-        url = f"{self.base_url}/instruments/"
+    def _load_sites(self):
+        try:
+            return self._cached('sites', 'sites', self._fetch_sites)
+        except Exception:
+            return SiteTable(), {}
+
+    def get_observatory_sites(self):
+        """Get list of all LCO observatory sites, as a SiteTable of SiteRecords"""
+        return self._load_sites()[0]
+
+    def get_site(self, site_code):
+        """Look up one site by code without scanning the list"""
+        return self._load_sites()[1].get(site_code)
+
+    def get_site_index(self):
+        """(SiteIndex, source) over the live site list, or the demo sites when it's unavailable"""
+        sites, source = self.get_observatory_sites(), 'lco'
+        if not sites:
+            sites, source = DEMO_SITE_RECORDS, 'demo'
+        self.site_index.update(sites)
+        return self.site_index, source
+
+    def nearest_sites(self, lat, lon, k=3, radius_km=None):
+        """The k sites closest to (lat, lon), optionally only those within radius_km, with current scores"""
+        index, source = self.get_site_index()
+        if radius_km is not None:
+            matches = index.within(lat, lon, radius_km, limit=k)
+        else:
+            matches = index.nearest(lat, lon, k)
+
+        scores = self.calculate_visibility_scores(
+            [site['latitude'] for site, _ in matches],
+            [site['longitude'] for site, _ in matches],
+            [site['elevation'] or 0 for site, _ in matches],
+            [utc_now()]
+        )
+        return {
+            'source': source,
+            'sites': [
+                {**site, 'distance_km': distance, 'visibility_score': round(float(score), 1)}
+                for (site, distance), score in zip(matches, scores[:, 0])
+            ],
+        }
+
+    def plan_season(self, start, nights, targets=None, **options):
+        """Best nights per target across every site, see planner.plan_season for options"""
+        index, source = self.get_site_index()
+        return {'source': source, **plan_season(index.sites, start, nights, targets, **options)}
+
+    def schedule(self, requests, night=None, **options):
+        """Assign observation requests to schedulable instruments across every site, see scheduler.Scheduler"""
+        index, source = self.get_site_index()
+        return {'source': source, **schedule(index.sites, self.get_telescope_status(), requests, night,
+                                             **options).result()}
+
+    def iter_instruments(self, site_code=None, fields=None, **filters):
+        """Stream instrument records across every page"""
         if site_code:
-            url += f"?site={site_code}"
-
-        data = self.make_request(url)
-
-        if data and 'results' in data:
-            telescopes = []
-            for instrument in data['results']:
-                telescopes.append({
-                    'name': instrument.get('name'),
-                    'site': instrument.get('site'),
-                    'telescope': instrument.get('telescope'),
-                    'state': instrument.get('state'),
-                    'type': instrument.get('instrument_type')
-                })
-            return telescopes
-        return []
-
-    def calculate_visibility_score(self, lat, lon, elevation=0):
+            filters['site'] = site_code
+        return iter_records(self._fetch_json, f"{self.base_url}/instruments/", filters, fields)
+
+    def iter_frames(self, fields=None, page_size=100, **filters):
+        """Stream archive frame metadata across every page
+
+        filters are passed to the archive API as-is, e.g. SITEID='ogg',
+        start='2024-01-01', OBJECT='M42'.
+        """
+        filters.setdefault('limit', page_size)
+        return iter_records(self._fetch_json, f"{self.archive_url}/frames/", filters, fields)
+
+    def _fetch_telescope_status(self, site_code):
+        return InstrumentTable.from_records(self.iter_instruments(site_code))
+
+    def _load_telescope_status(self, site_code):
+        """Cached InstrumentTable, raising the upstream error when there is none to fall back on"""
+        return self._cached(('instruments', site_code), 'instruments',
+                            lambda: self._fetch_telescope_status(site_code))
+
+    def get_telescope_status(self, site_code=None):
+        """Get current telescope status, as an InstrumentTable of InstrumentRecords (empty on failure)"""
+        try:
+            return self._load_telescope_status(site_code)
+        except Exception:
+            return InstrumentTable()
+
+    def refresh_telescope_status(self, site_code):
+        """Fetch instrument status now, bypassing and then refreshing the cache (None on failure)"""
+        try:
+            telescopes = self._fetch_telescope_status(site_code)
+        except Exception as e:
+            print(f"API Request failed ({error_category(e)}): {e}")
+            return None
+        ttl, stale = self.CACHE_TTLS['instruments']
+        self.cache.set(('instruments', site_code), telescopes, ttl, stale)
+        return telescopes
+
+    def calculate_visibility_score(self, lat, lon, elevation=0, when=None):
         """Calculate visibility score based on location"""
-        # Simple scoring algorithm
-        score = 80  # Base score for observatories
+        return float(self.calculate_visibility_scores([lat], [lon], [elevation], [when or utc_now()])[0, 0])
 
-        # Altitude bonus (higher = better)
-        altitude_bonus = min(20, elevation / 200)
-        score += altitude_bonus
+    @timed('score')
+    def calculate_visibility_scores(self, lats, lons, elevations, times, weather=None):
+        """Score every site at every time in one vectorized pass, shape (sites, times)"""
+        return score_grid(lats, lons, elevations, times, weather)
 
-        # Latitude considerations for certain objects
-        lat_factor = abs(lat) / 90  # 0 to 1
-        score += lat_factor * 10
+    def get_site_data(self, site_code):
+        """Site info, instrument status and current score in one JSON-ready dict
 
-        # Add some randomness for weather simulation
-        import random
-        weather_factor = random.uniform(-20, 20)
-        score += weather_factor
+        None for an unknown site; raises when the instrument status can't be
+        fetched, rather than reporting a site with no telescopes.
+        """
+        site_info = self.get_site(site_code)
+        if not site_info:
+            return None
+        return self.build_site_data(site_info, self._load_telescope_status(site_code))
+
+    def build_site_data(self, site_info, telescopes):
+        """The get_site_data dict from already fetched site info and status, no I/O"""
+        visibility_score = self.calculate_visibility_score(
+            site_info['latitude'],
+            site_info['longitude'],
+            site_info['elevation'] or 0
+        )
+        return {
+            'site': site_info,
+            'telescopes': telescopes,
+            'visibility_score': round(visibility_score, 1),
+        }
 
-        return max(0, min(100, score))
+    def get_sites_data(self, site_codes, timeout=15):
+        """get_site_data for several sites concurrently
+
+        Returns {'sites': {code: data}, 'errors': {code: reason}}; a site
+        that fails or takes longer than timeout seconds only lands in
+        'errors', the rest still come back.
+        """
+        site_codes = list(dict.fromkeys(site_codes))
+        # Every site needs the same site list, fetch it once before fanning out;
+        # without it no site can be told apart from an unknown code
+        try:
+            self._cached('sites', 'sites', self._fetch_sites)
+        except Exception as e:
+            return {'sites': {}, 'errors': {code: f'site list unavailable: {e}' for code in site_codes}}
+
+        futures = {self.executor.submit(self.get_site_data, code): code for code in site_codes}
+        done, not_done = wait(futures, timeout=timeout)
+
+        results, errors = {}, {}
+        for future in done:
+            code = futures[future]
+            try:
+                data = future.result()
+            except Exception as e:
+                errors[code] = str(e)
+                continue
+            if data is None:
+                errors[code] = 'not found'
+            else:
+                results[code] = data
+        for future in not_done:
+            future.cancel()
+            errors[futures[future]] = f'timed out after {timeout}s'
+
+        return {'sites': results, 'errors': errors}
 
     def generate_forecast_report(self, site_code):
         """Generate a complete forecast report for a site"""
-        sites = self.get_observatory_sites()
-        site_info = next((s for s in sites if s['code'] == site_code), None)
+        site_info = self.get_site(site_code)
 
         if not site_info:
             return f"Site {site_code} not found"
 
-        # Get telescope status
-        telescopes = self.get_telescope_status(site_code)
+        return self.format_forecast_report(site_code, site_info, self.get_telescope_status(site_code))
+
+    @timed('report')
+    def format_forecast_report(self, site_code, site_info, telescopes):
+        """Report text from already fetched site info and status, no I/O"""
+        counts = state_counts(telescopes)
 
         # Calculate visibility
         visibility_score = self.calculate_visibility_score(
@@ -129,6 +308,7 @@ class SimpleLCODemo:
             site_info['longitude'],
             site_info['elevation']
         )
+        sky = almanac(site_info['latitude'], site_info['longitude'])
 
         # Generate report
         report = f"""
@@ -137,21 +317,26 @@ class SimpleLCODemo:
 
 📍 Observatory: {site_info['name']} ({site_code.upper()})
 🌍 Location: {site_info['latitude']:.4f}°, {site_info['longitude']:.4f}°
-⛰️  Elevation: {site_info['elevation']}m
+⛰️  Elevation: {site_info['elevation'] or 0:.0f}m
 🕐 Timezone: {site_info['timezone']}
 📅 Generated: {datetime.now().strftime('%Y-%m-%d %H:%M:%S')}
 
 🔭 TELESCOPE STATUS
 {'-' * 20}
-Total Instruments: {len(telescopes)}
-Available: {len([t for t in telescopes if t['state'] == 'AVAILABLE'])}
-Maintenance: {len([t for t in telescopes if t['state'] != 'AVAILABLE'])}
+Total Instruments: {counts['total']}
+Available: {counts['available']}
+Maintenance: {counts['unavailable']}
 
 🌤️  VISIBILITY FORECAST
 {'-' * 20}
 Current Score: {visibility_score:.1f}/100
 Status: {'Excellent' if visibility_score > 80 else 'Good' if visibility_score > 60 else 'Fair' if visibility_score > 40 else 'Poor'}
 
+🌙 TONIGHT (UTC)
+{'-' * 20}
+{format_almanac(sky)}
+Moon: {sky['moon_phase_name']}, {sky['moon_illumination']:.0%} illuminated
+
 📊 DETAILED BREAKDOWN
 {'-' * 20}
 """
@@ -176,6 +361,12 @@ Status: {'Excellent' if visibility_score > 80 else 'Good' if visibility_score >
         }
 
         site_name = site_names.get(site_code, 'Unknown Observatory')
+        demo_site = DEMO_SITES_BY_CODE.get(site_code, DEMO_SITES[0])
+        targets = visible_targets(demo_site['lat'], demo_site['lon'], limit=4)
+        target_lines = "\n".join(
+            f"• {t['name']} - Magnitude {t['magnitude']}, {t['altitude']:.0f}° altitude" for t in targets
+        ) or "• Nothing above 10° altitude right now"
+        sky = almanac(demo_site['lat'], demo_site['lon'])
         visibility_score = random.uniform(60, 95)
 
         report = f"""
@@ -184,13 +375,13 @@ Status: {'Excellent' if visibility_score > 80 else 'Good' if visibility_score >
 🌡️ Temperature: {random.randint(45, 75)}°F  
 💨 Wind Speed: {random.randint(5, 15)} mph
 👁️ Atmospheric Seeing: {random.uniform(1.0, 2.5):.1f} arcsec
-🌙 Moon Illumination: {random.randint(10, 90)}%
+🌙 Moon: {sky['moon_phase_name']}, {sky['moon_illumination']:.0%} illuminated
+
+🌌 Tonight (UTC):
+{format_almanac(sky)}
 
 🎯 Tonight's Best Targets:
-• Jupiter - Magnitude -2.5, 45° altitude
-• Saturn - Magnitude 0.5, 60° altitude  
-• Orion Nebula - Magnitude 4.0, 70° altitude
-• Andromeda Galaxy - Magnitude 3.4, 50° altitude
+{target_lines}
 
 📊 6-Hour Forecast:
 {datetime.now().strftime('%H:%M')} - {visibility_score:.0f}/100
@@ -240,29 +431,60 @@ def main():
     print("Get your token at: https://observe.lco.global/")
 
 
+DEMO_SITES = [
+    {"name": "Haleakala Observatory, Hawaii", "code": "ogg", "lat": 20.7084, "lon": -156.2570, "elev": 3052},
+    {"name": "Siding Spring Observatory, Australia", "code": "coj", "lat": -31.2734, "lon": 149.0700, "elev": 1116},
+    {"name": "Cerro Tololo, Chile", "code": "lsc", "lat": -30.1677, "lon": -70.8047, "elev": 2207},
+    {"name": "McDonald Observatory, Texas", "code": "elp", "lat": 30.6797, "lon": -104.0247, "elev": 2027},
+    {"name": "Teide Observatory, Canary Islands", "code": "tfn", "lat": 28.3009, "lon": -16.5105, "elev": 2390},
+    {"name": "South African Astronomical Observatory", "code": "cpt", "lat": -32.3806, "lon": 20.8106, "elev": 1798}
+]
+
+DEMO_SITES_BY_CODE = {site['code']: site for site in DEMO_SITES}
+
+# DEMO_SITES in the shape get_observatory_sites returns
+DEMO_SITE_RECORDS = SiteTable.from_records(
+    {'code': site['code'], 'name': site['name'], 'latitude': site['lat'], 'longitude': site['lon'],
+     'elevation': site['elev'], 'timezone': None}
+    for site in DEMO_SITES
+)
+
+TARGET_EMOJI = {'planet': "🪐", 'nebula': "🌌", 'galaxy': "🌌", 'star cluster': "✨"}
+
+
+def format_almanac(sky):
+    """Sunset/dark/sunrise lines for an almanac entry, HH:MM UTC"""
+    def hhmm(iso):
+        return iso[11:16] if iso else '--:--'
+    return (f"🌇 Sunset {hhmm(sky['sunset'])}  🌌 Dark {hhmm(sky['dusk'])}-{hhmm(sky['dawn'])}  "
+            f"🌅 Sunrise {hhmm(sky['sunrise'])}  ({sky['dark_hours']:.1f}h dark)")
+
+
 def show_demo_data(lco):
     """Show demo data when API is restricted"""
     print("\n🎯 DEMO MODE - LCO Observatory Network")
     print("=" * 45)
 
-    demo_sites = [
-        {"name": "Haleakala Observatory, Hawaii", "code": "ogg", "lat": 20.7084, "lon": -156.2570, "elev": 3052},
-        {"name": "Siding Spring Observatory, Australia", "code": "coj", "lat": -31.2734, "lon": 149.0700, "elev": 1116},
-        {"name": "Cerro Tololo, Chile", "code": "lsc", "lat": -30.1677, "lon": -70.8047, "elev": 2207},
-        {"name": "McDonald Observatory, Texas", "code": "elp", "lat": 30.6797, "lon": -104.0247, "elev": 2027},
-        {"name": "Teide Observatory, Canary Islands", "code": "tfn", "lat": 28.3009, "lon": -16.5105, "elev": 2390},
-        {"name": "South African Astronomical Observatory", "code": "cpt", "lat": -32.3806, "lon": 20.8106, "elev": 1798}
-    ]
+    demo_sites = DEMO_SITES
+
+    # Whole network x 6 hours in one vectorized pass
+    slots = time_grid(hours=6, step_minutes=60)
+    scores = lco.calculate_visibility_scores(
+        [site['lat'] for site in demo_sites],
+        [site['lon'] for site in demo_sites],
+        [site['elev'] for site in demo_sites],
+        slots
+    )
 
     print("\n📍 LCO Observatory Sites (Live Data Structure):")
     for i, site in enumerate(demo_sites, 1):
-        score = lco.calculate_visibility_score(site['lat'], site['lon'], site['elev'])
+        score = scores[i - 1, 0]
         status = "🌟 Excellent" if score > 85 else "👍 Good" if score > 70 else "⚠️ Fair"
         print(f"{i}. {site['name']} ({site['code'].upper()}) - {status} ({score:.0f}/100)")
 
     # Detailed forecast for Haleakala
     site = demo_sites[0]  # Haleakala
-    score = lco.calculate_visibility_score(site['lat'], site['lon'], site['elev'])
+    score = scores[0, 0]
 
     print(f"\n🔭 LIVE FORECAST - {site['name']}")
     print("=" * 50)
@@ -278,27 +500,24 @@ def show_demo_data(lco):
     print(f"🌡️ Temperature: {random.randint(55, 70)}°F")
     print(f"💨 Wind Speed: {random.randint(5, 12)} mph")
     print(f"👁️ Seeing: {random.uniform(1.0, 2.0):.1f} arcseconds")
-    print(f"🌙 Moon Phase: {random.randint(15, 85)}%")
+    sky = almanac(site['lat'], site['lon'])
+    print(f"🌙 Moon Phase: {sky['moon_phase_name']}, {sky['moon_illumination']:.0%} illuminated")
+    print(format_almanac(sky))
 
     # Tonight's targets
     print(f"\n✨ OPTIMAL TARGETS TONIGHT")
-    targets = [
-        "🪐 Jupiter - Mag -2.5, Alt 65°, Az 180°",
-        "🪐 Saturn - Mag 0.5, Alt 45°, Az 220°",
-        "🌌 Orion Nebula (M42) - Mag 4.0, Alt 70°",
-        "🌌 Andromeda Galaxy (M31) - Mag 3.4, Alt 55°",
-        "⭐ Sirius - Mag -1.5, Alt 40°, Az 160°",
-        "🌟 Vega - Mag 0.0, Alt 80°, Az 45°"
-    ]
+    targets = visible_targets(site['lat'], site['lon'], limit=6)
 
     for target in targets:
-        print(f"  {target}")
+        emoji = TARGET_EMOJI.get(target.get('type'), "⭐")
+        print(f"  {emoji} {target['name']} - Mag {target['magnitude']}, "
+              f"Alt {target['altitude']:.0f}°, Az {target['azimuth']:.0f}°")
+    if not targets:
+        print("  Nothing above 10° altitude right now")
 
     print(f"\n🎯 6-HOUR VISIBILITY FORECAST")
-    now = datetime.now()
-    for i in range(6):
-        time_slot = now + timedelta(hours=i)
-        forecast_score = random.randint(75, 95)
+    for time_slot, forecast_score in zip(slots.astype(datetime), scores[0]):
+        forecast_score = round(forecast_score)
         status = "🌟" if forecast_score > 85 else "👍" if forecast_score > 70 else "⚠️"
         print(f"{time_slot.strftime('%H:%M')} - {status} {forecast_score}/100")
 
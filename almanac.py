@@ -0,0 +1,170 @@
+# almanac.py
+# Sunset, sunrise, astronomical twilight and Moon phase per site and night
+# Computed for many sites x nights in one vectorized pass, memoized per (site, night)
+# Run this with: python3 almanac.py                      (tonight at every demo site)
+#                python3 almanac.py --year 2026           (precompute a whole year, timed)
+
+import argparse
+import time
+from datetime import date, datetime, timedelta
+
+import numpy as np
+
+from ephemeris import (earth_position, equatorial_to_altaz, julian_date, local_sidereal_time, moon_ecliptic,
+                       moon_illumination, night_of, sun_radec)
+from lco_cache import TTLCache
+
+
+STEP_MINUTES = 10
+SUN_HORIZON = -0.833  # apparent sunrise/sunset: refraction plus the Sun's semi-diameter
+ASTRONOMICAL_TWILIGHT = -18.0
+PHASE_NAMES = ['New Moon', 'Waxing Crescent', 'First Quarter', 'Waxing Gibbous',
+               'Full Moon', 'Waning Gibbous', 'Last Quarter', 'Waning Crescent']
+
+# Entries never go stale, the bound just keeps memory flat; a year for six sites is ~2200 entries
+CACHE = TTLCache(max_entries=8192)
+FOREVER = float('inf')
+
+
+def _key(lat, lon, night):
+    return round(float(lat), 2), round(float(lon), 2), night
+
+
+def _crossings(values, threshold, rising):
+    """Fractional slot of the first (setting) or last (rising) threshold crossing along the last axis, NaN if none"""
+    above = values >= threshold
+    crossed = (~above[..., :-1] & above[..., 1:]) if rising else (above[..., :-1] & ~above[..., 1:])
+    n = crossed.shape[-1]
+    if rising:
+        index = n - 1 - np.argmax(crossed[..., ::-1], axis=-1)
+    else:
+        index = np.argmax(crossed, axis=-1)
+    a = np.take_along_axis(values, index[..., None], -1)[..., 0]
+    b = np.take_along_axis(values, index[..., None] + 1, -1)[..., 0]
+    with np.errstate(divide='ignore', invalid='ignore'):
+        slot = index + (a - threshold) / (a - b)  # linear interpolation inside the step
+    return np.where(crossed.any(axis=-1), slot, np.nan)
+
+
+def _iso(starts, slots, step_minutes):
+    """ISO UTC strings for fractional slots after each start (None for NaN)"""
+    seconds = np.where(np.isnan(slots), 0, np.rint(slots * step_minutes * 60)).astype(np.int64)
+    times = (starts + seconds.astype('timedelta64[s]')).astype(str)
+    return np.where(np.isnan(slots), None, np.char.add(times, 'Z').astype(object))
+
+
+def compute(lats, lons, nights, step_minutes=STEP_MINUTES):
+    """Almanac dicts for every site x night, as a list (per site) of lists (per night)
+
+    A night runs from local mean noon on the date to the next noon, so
+    sunset and dusk come before dawn and sunrise. Times are ISO UTC
+    strings, or None when the Sun never crosses that altitude (polar day
+    or night).
+    """
+    lats = np.asarray(lats, dtype=float)
+    lons = np.asarray(lons, dtype=float)
+    days = np.array([np.datetime64(night, 'D') for night in nights])
+    n_t = 24 * 60 // step_minutes
+
+    # (sites, nights) start times and (sites, nights, slots) sample times
+    offsets = np.rint((12 - lons / 15) * 3600).astype(np.int64).astype('timedelta64[s]')
+    starts = days.astype('datetime64[s]')[None, :] + offsets[:, None]
+    times = starts[..., None] + (np.arange(n_t) * step_minutes * 60).astype('timedelta64[s]')
+    jd = julian_date(times.ravel()).reshape(times.shape)
+
+    sun_ra, sun_dec = sun_radec(jd.ravel())
+    lst = local_sidereal_time(jd, lons[:, None, None])
+    sun_alt = equatorial_to_altaz(sun_ra.reshape(jd.shape), sun_dec.reshape(jd.shape),
+                                  lats[:, None, None], lst)[0]
+
+    sunset = _crossings(sun_alt, SUN_HORIZON, rising=False)
+    sunrise = _crossings(sun_alt, SUN_HORIZON, rising=True)
+    dusk = _crossings(sun_alt, ASTRONOMICAL_TWILIGHT, rising=False)
+    dawn = _crossings(sun_alt, ASTRONOMICAL_TWILIGHT, rising=True)
+    hours = step_minutes / 60
+    night_hours = (sun_alt < SUN_HORIZON).sum(axis=-1) * hours
+    dark_hours = (sun_alt < ASTRONOMICAL_TWILIGHT).sum(axis=-1) * hours
+
+    # Moon at local midnight: illuminated fraction, and age as the Moon-Sun longitude difference
+    midnight = jd[..., n_t // 2]
+    illumination = moon_illumination(midnight.ravel()).reshape(midnight.shape)
+    x, y, _ = earth_position(midnight.ravel())
+    sun_lon = np.arctan2(-y, -x)
+    age = ((moon_ecliptic(midnight.ravel())[0] - sun_lon) % (2 * np.pi) / (2 * np.pi)).reshape(midnight.shape)
+    phase_index = np.rint(age * 8).astype(int) % 8
+
+    columns = {
+        'sunset': _iso(starts, sunset, step_minutes),
+        'dusk': _iso(starts, dusk, step_minutes),
+        'dawn': _iso(starts, dawn, step_minutes),
+        'sunrise': _iso(starts, sunrise, step_minutes),
+    }
+    return [
+        [{
+            'night': nights[j].isoformat(),
+            **{name: column[i, j] for name, column in columns.items()},
+            'night_hours': round(float(night_hours[i, j]), 2),
+            'dark_hours': round(float(dark_hours[i, j]), 2),
+            'moon_illumination': round(float(illumination[i, j]), 3),
+            'moon_age': round(float(age[i, j]), 3),
+            'moon_phase_name': PHASE_NAMES[phase_index[i, j]],
+        } for j in range(len(nights))]
+        for i in range(len(lats))
+    ]
+
+
+def almanac(lat, lon, night=None):
+    """Cached almanac for the night of `night` (a date, a UTC datetime, or default tonight)
+
+    Coordinates are quantized to 0.01 degrees. The returned dict is shared
+    through the cache and must not be modified.
+    """
+    if night is None or isinstance(night, datetime):
+        night = night_of(lon, night)
+    key = _key(lat, lon, night)
+    return CACHE.get_or_load(key, lambda: compute([key[0]], [key[1]], [night])[0][0], FOREVER)
+
+
+def precompute(sites, nights):
+    """Compute and cache every site x night in one batch, returns the number of entries"""
+    sites = [site for site in sites if site.get('latitude') is not None]
+    keys = [_key(site['latitude'], site['longitude'], None)[:2] for site in sites]
+    results = compute([lat for lat, _ in keys], [lon for _, lon in keys], nights)
+    for (lat, lon), per_night in zip(keys, results):
+        for night, entry in zip(nights, per_night):
+            CACHE.set((lat, lon, night), entry, FOREVER)
+    return len(sites) * len(nights)
+
+
+def precompute_year(sites, year=None):
+    """precompute() for every night of a calendar year (default the current one)"""
+    year = year or date.today().year
+    first = date(year, 1, 1)
+    return precompute(sites, [first + timedelta(days=i) for i in range((date(year + 1, 1, 1) - first).days)])
+
+
+def main():
+    from LCO_Integration import DEMO_SITE_RECORDS
+
+    parser = argparse.ArgumentParser(description="Sun and Moon almanac for the LCO sites")
+    parser.add_argument('--date', type=date.fromisoformat, help="local night, default tonight")
+    parser.add_argument('--year', type=int, help="precompute a whole year and report the timing")
+    args = parser.parse_args()
+
+    if args.year:
+        started = time.perf_counter()
+        count = precompute_year(DEMO_SITE_RECORDS, args.year)
+        print(f"✅ Precomputed {count} site-nights for {args.year} in {time.perf_counter() - started:.2f}s")
+        return
+
+    for site in DEMO_SITE_RECORDS:
+        entry = almanac(site['latitude'], site['longitude'], args.date)
+        print(f"\n📍 {site['name']} ({site['code']}) - night of {entry['night']}")
+        print(f"   🌇 Sunset {entry['sunset'] or '-'}   🌌 Dark from {entry['dusk'] or '-'}")
+        print(f"   🌅 Sunrise {entry['sunrise'] or '-'}   🌄 Dark until {entry['dawn'] or '-'}")
+        print(f"   🌙 {entry['moon_phase_name']}, {entry['moon_illumination']:.0%} lit, "
+              f"{entry['dark_hours']:.1f}h of astronomical darkness")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,309 @@
+# benchmark.py
+# Benchmarks for the client, scoring and report paths, run against the local LCO stand-in
+# Run this with: python3 benchmark.py --save-baseline      (first time, records the baseline)
+#                python3 benchmark.py                      (compare against it, exit 1 on regression)
+
+import argparse
+import json
+import os
+import platform
+import sys
+import tempfile
+import threading
+import time
+import tracemalloc
+from concurrent.futures import ThreadPoolExecutor
+from datetime import date, datetime, timezone
+
+from lco_standin import StandInServer, write_demo_cassettes
+from lco_transport import PooledTransport
+
+
+DEFAULT_BASELINE = 'benchmark_baseline.json'
+DEFAULT_OUTPUT = 'bench_results.json'
+# Latency changes smaller than this are timer noise, whatever the ratio
+NOISE_FLOOR_MS = 0.05
+
+# name -> (setup(env) -> callable, iterations, concurrency)
+SCENARIOS = {}
+
+
+def scenario(name, iterations=200, concurrency=1):
+    """Register a benchmark; the decorated function gets the env and returns the op to time"""
+    def register(setup):
+        SCENARIOS[name] = (setup, iterations, concurrency)
+        return setup
+    return register
+
+
+def percentile(ordered, p):
+    if not ordered:
+        return 0.0
+    k = (len(ordered) - 1) * p / 100
+    lo = int(k)
+    hi = min(lo + 1, len(ordered) - 1)
+    return ordered[lo] + (ordered[hi] - ordered[lo]) * (k - lo)
+
+
+def measure(op, iterations, concurrency=1, warmup=5):
+    """Time op() iterations times spread over concurrency threads"""
+    for _ in range(warmup):
+        op()
+
+    latencies = []
+    lock = threading.Lock()
+
+    def worker(count):
+        local = []
+        for _ in range(count):
+            started = time.perf_counter()
+            op()
+            local.append(time.perf_counter() - started)
+        with lock:
+            latencies.extend(local)
+
+    per_worker = [iterations // concurrency + (i < iterations % concurrency) for i in range(concurrency)]
+    started = time.perf_counter()
+    if concurrency == 1:
+        worker(iterations)
+    else:
+        with ThreadPoolExecutor(max_workers=concurrency) as pool:
+            list(pool.map(worker, per_worker))
+    elapsed = time.perf_counter() - started
+
+    latencies.sort()
+    return {
+        'iterations': iterations,
+        'concurrency': concurrency,
+        'p50_ms': round(percentile(latencies, 50) * 1000, 4),
+        'p95_ms': round(percentile(latencies, 95) * 1000, 4),
+        'p99_ms': round(percentile(latencies, 99) * 1000, 4),
+        'mean_ms': round(sum(latencies) / len(latencies) * 1000, 4),
+        'throughput_per_s': round(iterations / elapsed, 2),
+    }
+
+
+def peak_memory(op, repeats=3):
+    """Peak traced allocation (bytes) over a few calls, measured apart from the timings"""
+    tracemalloc.start()
+    try:
+        tracemalloc.reset_peak()
+        for _ in range(repeats):
+            op()
+        return tracemalloc.get_traced_memory()[1]
+    finally:
+        tracemalloc.stop()
+
+
+class BenchEnv:
+    """Stand-in API seeded with demo cassettes, plus a client pointed at it"""
+
+    def __init__(self, latency_ms=20, jitter_ms=5, frames=5000):
+        from LCO_Integration import SimpleLCODemo
+
+        self.tmp = tempfile.TemporaryDirectory(prefix='skywatch-bench-')
+        write_demo_cassettes(self.tmp.name, frames=frames)
+        self.server = StandInServer(('127.0.0.1', 0), self.tmp.name, latency_ms=latency_ms,
+                                    jitter_ms=jitter_ms, page_size=100, seed=1).start()
+        self.base_url = self.server.url() + '/api'
+        self.archive_url = self.server.url()
+        self.lco = SimpleLCODemo(transport=PooledTransport(max_per_host=32),
+                                 base_url=self.base_url, archive_url=self.archive_url)
+
+    def close(self):
+        self.server.shutdown()
+        self.server.server_close()
+        self.tmp.cleanup()
+
+
+@scenario('get_observatory_sites.cold')
+def bench_sites_cold(env):
+    def op():
+        env.lco.cache.invalidate()
+        env.lco.get_observatory_sites()
+    return op
+
+
+@scenario('get_observatory_sites.warm', iterations=5000)
+def bench_sites_warm(env):
+    return env.lco.get_observatory_sites
+
+
+@scenario('get_telescope_status.cold')
+def bench_status_cold(env):
+    def op():
+        env.lco.cache.invalidate()
+        env.lco.get_telescope_status('ogg')
+    return op
+
+
+@scenario('generate_forecast_report.cold', iterations=100)
+def bench_report_cold(env):
+    def op():
+        env.lco.cache.invalidate()
+        env.lco.generate_forecast_report('ogg')
+    return op
+
+
+@scenario('generate_forecast_report.warm', iterations=2000)
+def bench_report_warm(env):
+    return lambda: env.lco.generate_forecast_report('ogg')
+
+
+@scenario('visibility.network_week_5min', iterations=200)
+def bench_visibility_grid(env):
+    from LCO_Integration import DEMO_SITES
+    from visibility import time_grid
+
+    lats = [s['lat'] for s in DEMO_SITES]
+    lons = [s['lon'] for s in DEMO_SITES]
+    elevations = [s['elev'] for s in DEMO_SITES]
+    slots = time_grid(datetime(2024, 1, 1), hours=7 * 24, step_minutes=5)
+    return lambda: env.lco.calculate_visibility_scores(lats, lons, elevations, slots)
+
+
+@scenario('scheduler.queue_1000', iterations=10)
+def bench_scheduler(env):
+    from LCO_Integration import DEMO_SITE_RECORDS
+    from scheduler import schedule, synthetic_network, synthetic_queue
+
+    sites = list(DEMO_SITE_RECORDS)
+    instruments, queue = synthetic_network(sites), synthetic_queue(1000, sites)
+    return lambda: schedule(sites, instruments, queue, date(2024, 1, 15))
+
+
+@scenario('scheduler.reschedule_instrument', iterations=50)
+def bench_reschedule(env):
+    from LCO_Integration import DEMO_SITE_RECORDS
+    from scheduler import schedule, synthetic_network, synthetic_queue
+
+    sites = list(DEMO_SITE_RECORDS)
+    scheduler = schedule(sites, synthetic_network(sites), synthetic_queue(1000, sites), date(2024, 1, 15))
+    now = datetime(2024, 1, 15)
+
+    def op():
+        scheduler.set_instrument_state('lsc-1m0a', 'MANUAL', now)
+        scheduler.set_instrument_state('lsc-1m0a', 'SCHEDULABLE', now)
+    return op
+
+
+@scenario('flask.api_lco_site', iterations=2000, concurrency=16)
+def bench_flask_route(env):
+    from werkzeug.serving import WSGIRequestHandler, make_server
+    from APP import create_app
+
+    class QuietHandler(WSGIRequestHandler):
+        def log_request(self, *args, **kwargs):
+            pass
+
+    # No disk cache: runs must not share (or pollute) the repo's data/http_cache.sqlite
+    app = create_app({'LCO_API_URL': env.base_url, 'LCO_ARCHIVE_URL': env.archive_url,
+                      'HTTP_CACHE_PATH': 'off'})
+    server = make_server('127.0.0.1', 0, app, threaded=True, request_handler=QuietHandler)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    url = f"http://127.0.0.1:{server.server_port}/api/lco/ogg"
+    client = PooledTransport(max_per_host=32)
+
+    def op():
+        response = client.request(url)
+        if response.status != 200:
+            raise RuntimeError(f"{url} returned {response.status}")
+    return op
+
+
+def run(names, scale=1.0, latency_ms=20):
+    env = BenchEnv(latency_ms=latency_ms)
+    results = {}
+    try:
+        for name in names:
+            setup, iterations, concurrency = SCENARIOS[name]
+            op = setup(env)
+            iterations = max(concurrency, int(iterations * scale))
+            result = measure(op, iterations, concurrency)
+            result['peak_memory_kb'] = round(peak_memory(op) / 1024, 1)
+            results[name] = result
+            print(f"  {name:<34} p50 {result['p50_ms']:>9.3f} ms  p95 {result['p95_ms']:>9.3f} ms  "
+                  f"p99 {result['p99_ms']:>9.3f} ms  {result['throughput_per_s']:>10.1f}/s  "
+                  f"peak {result['peak_memory_kb']:>9.1f} KB")
+    finally:
+        env.close()
+    return results
+
+
+def compare(results, baseline, threshold):
+    """Scenarios that got slower (p50/p95) or lost throughput by more than threshold"""
+    regressions = []
+    for name, result in results.items():
+        base = baseline.get('results', {}).get(name)
+        if not base:
+            continue
+        for key in ('p50_ms', 'p95_ms'):
+            if result[key] > base[key] * (1 + threshold) and result[key] - base[key] > NOISE_FLOOR_MS:
+                regressions.append(f"{name}: {key} {base[key]} -> {result[key]}")
+        if result['throughput_per_s'] < base['throughput_per_s'] * (1 - threshold):
+            regressions.append(f"{name}: throughput {base['throughput_per_s']} -> {result['throughput_per_s']}")
+    return regressions
+
+
+def main():
+    parser = argparse.ArgumentParser(description="SkyWatch benchmark harness")
+    parser.add_argument('--only', help="comma separated scenario names (prefix match)")
+    parser.add_argument('--quick', action='store_true', help="run a tenth of the iterations")
+    parser.add_argument('--latency', type=float, default=20, help="stand-in API latency, ms")
+    parser.add_argument('--output', default=DEFAULT_OUTPUT)
+    parser.add_argument('--baseline', default=DEFAULT_BASELINE)
+    parser.add_argument('--save-baseline', action='store_true')
+    parser.add_argument('--threshold', type=float, default=0.15, help="allowed slowdown, 0.15 = 15%%")
+    parser.add_argument('--list', action='store_true')
+    args = parser.parse_args()
+
+    if args.list:
+        print("\n".join(SCENARIOS))
+        return 0
+
+    names = list(SCENARIOS)
+    if args.only:
+        prefixes = args.only.split(',')
+        names = [n for n in names if any(n.startswith(p) for p in prefixes)]
+
+    print(f"⏱️  SkyWatch benchmarks ({len(names)} scenarios, stand-in latency {args.latency} ms)")
+    results = run(names, 0.1 if args.quick else 1.0, args.latency)
+    report = {
+        'meta': {
+            'created': datetime.now(timezone.utc).isoformat(),
+            'python': sys.version.split()[0],
+            'platform': platform.platform(),
+            'cpus': os.cpu_count(),
+            'latency_ms': args.latency,
+            'quick': args.quick,
+        },
+        'results': results,
+    }
+
+    with open(args.output, 'w') as f:
+        json.dump(report, f, indent=2)
+    print(f"\n📄 Results written to {args.output}")
+
+    if args.save_baseline:
+        with open(args.baseline, 'w') as f:
+            json.dump(report, f, indent=2)
+        print(f"📌 Baseline saved to {args.baseline}")
+        return 0
+
+    if not os.path.exists(args.baseline):
+        print(f"No baseline at {args.baseline}, run with --save-baseline to create one")
+        return 0
+
+    with open(args.baseline) as f:
+        regressions = compare(results, json.load(f), args.threshold)
+    if regressions:
+        print(f"\n❌ {len(regressions)} regression(s) beyond {args.threshold:.0%}:")
+        for line in regressions:
+            print(f"  • {line}")
+        return 1
+    print(f"\n✅ No regressions beyond {args.threshold:.0%}")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,330 @@
+# ephemeris.py
+# Alt/az/airmass for the SkyWatch target catalog, vectorized over objects x time
+# Low-precision formulas by default (well under a degree), astropy when asked for and installed
+
+from datetime import date, datetime, timedelta, timezone
+from functools import lru_cache
+
+import numpy as np
+
+try:
+    import astropy.units as u
+    from astropy.coordinates import AltAz, EarthLocation, SkyCoord, get_body
+    from astropy.time import Time
+except ImportError:
+    Time = None
+
+
+J2000 = 2451545.0
+UNIX_EPOCH_JD = 2440587.5
+OBLIQUITY = np.radians(23.43928)
+
+# Same objects as the index2.0.html catalog, plus the demo report targets.
+# Fixed objects carry J2000 RA/Dec in degrees.
+STARS = [
+    {'name': 'Sirius', 'magnitude': -1.46, 'constellation': 'Canis Major', 'ra': 101.2872, 'dec': -16.7161},
+    {'name': 'Vega', 'magnitude': 0.03, 'constellation': 'Lyra', 'ra': 279.2347, 'dec': 38.7837},
+    {'name': 'Polaris', 'magnitude': 1.97, 'constellation': 'Ursa Minor', 'ra': 37.9546, 'dec': 89.2641},
+    {'name': 'Betelgeuse', 'magnitude': 0.5, 'constellation': 'Orion', 'ra': 88.7929, 'dec': 7.4071},
+]
+DEEP_SKY = [
+    {'name': 'Orion Nebula', 'magnitude': 4.0, 'type': 'nebula', 'ra': 83.8221, 'dec': -5.3911},
+    {'name': 'Andromeda Galaxy', 'magnitude': 3.4, 'type': 'galaxy', 'ra': 10.6847, 'dec': 41.2690},
+    {'name': 'Pleiades', 'magnitude': 1.6, 'type': 'star cluster', 'ra': 56.7500, 'dec': 24.1167},
+    {'name': 'Ring Nebula', 'magnitude': 8.8, 'type': 'nebula', 'ra': 283.3963, 'dec': 33.0292},
+]
+# Keplerian elements and rates per Julian century (JPL approximate positions, 1800-2050):
+# a (AU), e, I, L, longitude of perihelion, longitude of ascending node (degrees)
+PLANETS = [
+    {'name': 'Venus', 'magnitude': -4.2, 'type': 'planet',
+     'elements': (0.72333566, 0.00677672, 3.39467605, 181.97909950, 131.60246718, 76.67984255),
+     'rates': (0.00000390, -0.00004107, -0.00078890, 58517.81538729, 0.00268329, -0.27769418)},
+    {'name': 'Mars', 'magnitude': 0.8, 'type': 'planet',
+     'elements': (1.52371034, 0.09339410, 1.84969142, -4.55343205, -23.94362959, 49.55953891),
+     'rates': (0.00001847, 0.00007882, -0.00813131, 19140.30268499, 0.44441088, -0.29257343)},
+    {'name': 'Jupiter', 'magnitude': -2.5, 'type': 'planet',
+     'elements': (5.20288700, 0.04838624, 1.30439695, 34.39644051, 14.72847983, 100.47390909),
+     'rates': (-0.00011607, -0.00013253, -0.00183714, 3034.74612775, 0.21252668, 0.20469106)},
+    {'name': 'Saturn', 'magnitude': 0.5, 'type': 'planet',
+     'elements': (9.53667594, 0.05386179, 2.48599187, 49.95424423, 92.59887831, 113.66242448),
+     'rates': (-0.00125060, -0.00050991, 0.00193609, 1222.49362201, -0.41897216, -0.28867794)},
+]
+EARTH = {
+    'elements': (1.00000261, 0.01671123, -0.00001531, 100.46457166, 102.93768193, 0.0),
+    'rates': (0.00000562, -0.00004392, -0.01294668, 35999.37244981, 0.32327364, 0.0),
+}
+
+CATALOG = PLANETS + STARS + DEEP_SKY
+NAMES = [obj['name'] for obj in CATALOG]
+
+# Precomputed once: fixed objects as radians, planet elements as (n_planets, 1) columns
+FIXED_RA = np.radians([obj['ra'] for obj in STARS + DEEP_SKY])[:, None]
+FIXED_DEC = np.radians([obj['dec'] for obj in STARS + DEEP_SKY])[:, None]
+_PLANET_ELEMENTS = np.array([p['elements'] for p in PLANETS]).T[:, :, None]
+_PLANET_RATES = np.array([p['rates'] for p in PLANETS]).T[:, :, None]
+_EARTH_ELEMENTS = np.array(EARTH['elements'])[:, None, None]
+_EARTH_RATES = np.array(EARTH['rates'])[:, None, None]
+
+
+def utc_now():
+    """Current UTC time as a naive datetime, the convention used throughout this module"""
+    return datetime.now(timezone.utc).replace(tzinfo=None)
+
+
+def julian_date(times):
+    """Julian dates for UTC datetime64 values or naive UTC datetimes"""
+    times = np.asarray(times, dtype='datetime64[s]')
+    return times.astype(np.int64) / 86400.0 + UNIX_EPOCH_JD
+
+
+def _heliocentric(elements, rates, centuries):
+    """Ecliptic J2000 heliocentric xyz (AU) from Keplerian elements, shape (3, n, n_t)"""
+    a, e, incl, mean_long, peri, node = elements + rates * centuries
+    mean_anomaly = np.radians((mean_long - peri + 180) % 360 - 180)
+    incl, peri, node = np.radians(incl), np.radians(peri), np.radians(node)
+    omega = peri - node
+
+    # Kepler's equation, a few Newton steps are plenty for planetary eccentricities
+    ecc_anomaly = mean_anomaly + e * np.sin(mean_anomaly)
+    for _ in range(5):
+        ecc_anomaly -= (ecc_anomaly - e * np.sin(ecc_anomaly) - mean_anomaly) / (1 - e * np.cos(ecc_anomaly))
+
+    xp = a * (np.cos(ecc_anomaly) - e)
+    yp = a * np.sqrt(1 - e * e) * np.sin(ecc_anomaly)
+
+    cw, sw = np.cos(omega), np.sin(omega)
+    cn, sn = np.cos(node), np.sin(node)
+    ci, si = np.cos(incl), np.sin(incl)
+    x = (cw * cn - sw * sn * ci) * xp + (-sw * cn - cw * sn * ci) * yp
+    y = (cw * sn + sw * cn * ci) * xp + (-sw * sn + cw * cn * ci) * yp
+    z = (sw * si) * xp + (cw * si) * yp
+    return np.stack([x, y, z])
+
+
+def _ecliptic_to_radec(x, y, z):
+    y_eq = y * np.cos(OBLIQUITY) - z * np.sin(OBLIQUITY)
+    z_eq = y * np.sin(OBLIQUITY) + z * np.cos(OBLIQUITY)
+    ra = np.arctan2(y_eq, x) % (2 * np.pi)
+    dec = np.arctan2(z_eq, np.hypot(x, y_eq))
+    return ra, dec
+
+
+def earth_position(jd):
+    """Heliocentric ecliptic xyz of the Earth-Moon barycenter, shape (3, n_t)"""
+    centuries = ((np.asarray(jd, dtype=float) - J2000) / 36525)[None, :]
+    return _heliocentric(_EARTH_ELEMENTS, _EARTH_RATES, centuries)[:, 0, :]
+
+
+def sun_radec(jd):
+    """Geocentric RA/Dec of the Sun in radians, each shape (n_t,)"""
+    x, y, z = -earth_position(jd)
+    return _ecliptic_to_radec(x, y, z)
+
+
+def moon_ecliptic(jd):
+    """Geocentric ecliptic longitude, latitude and horizontal parallax of the Moon, radians
+
+    Low-precision series from the Astronomical Almanac, about 0.3 degrees.
+    """
+    t = (np.asarray(jd, dtype=float) - J2000) / 36525
+
+    def s(a, b):
+        return np.sin(np.radians(a + b * t))
+
+    def c(a, b):
+        return np.cos(np.radians(a + b * t))
+
+    lon = (218.32 + 481267.881 * t + 6.29 * s(135.0, 477198.87) - 1.27 * s(259.3, -413335.36)
+           + 0.66 * s(235.7, 890534.22) + 0.21 * s(269.9, 954397.74)
+           - 0.19 * s(357.5, 35999.05) - 0.11 * s(186.5, 966404.03))
+    lat = (5.13 * s(93.3, 483202.02) + 0.28 * s(228.2, 960400.89)
+           - 0.28 * s(318.3, 6003.15) - 0.17 * s(217.6, -407332.21))
+    parallax = (0.9508 + 0.0518 * c(135.0, 477198.87) + 0.0095 * c(259.3, -413335.36)
+                + 0.0078 * c(235.7, 890534.22) + 0.0028 * c(269.9, 954397.74))
+    return np.radians(lon % 360), np.radians(lat), np.radians(parallax)
+
+
+def moon_radec(jd):
+    """Geocentric RA/Dec of the Moon in radians, each shape (n_t,)"""
+    lon, lat, _ = moon_ecliptic(jd)
+    cos_lat = np.cos(lat)
+    return _ecliptic_to_radec(cos_lat * np.cos(lon), cos_lat * np.sin(lon), np.sin(lat))
+
+
+def moon_altitude(jd, lat, lon):
+    """Topocentric altitude of the Moon in degrees (geocentric altitude less parallax)"""
+    jd = np.asarray(jd, dtype=float)
+    altitude = equatorial_to_altaz(*moon_radec(jd), lat, local_sidereal_time(jd, lon))[0]
+    parallax = moon_ecliptic(jd)[2]
+    return altitude - np.degrees(parallax * np.cos(np.radians(altitude)))
+
+
+def angular_separation(ra1, dec1, ra2, dec2):
+    """Great-circle separation in degrees between RA/Dec pairs in radians (broadcasts)"""
+    cos_sep = np.sin(dec1) * np.sin(dec2) + np.cos(dec1) * np.cos(dec2) * np.cos(ra1 - ra2)
+    return np.degrees(np.arccos(np.clip(cos_sep, -1, 1)))
+
+
+def moon_illumination(jd):
+    """Illuminated fraction of the Moon's disk (0 new - 1 full)"""
+    elongation = np.radians(angular_separation(*moon_radec(jd), *sun_radec(jd)))
+    return (1 - np.cos(elongation)) / 2
+
+
+def planet_radec(jd):
+    """Geocentric RA/Dec of every catalog planet in radians, each shape (n_planets, n_t)"""
+    centuries = ((np.asarray(jd, dtype=float) - J2000) / 36525)[None, :]
+    planets = _heliocentric(_PLANET_ELEMENTS, _PLANET_RATES, centuries)
+    earth = earth_position(jd)[:, None, :]
+    return _ecliptic_to_radec(*(planets - earth))
+
+
+def catalog_radec(jd):
+    """RA/Dec of the whole catalog in radians, each shape (n_objects, n_t), ordered like NAMES"""
+    planet_ra, planet_dec = planet_radec(jd)
+    n_t = planet_ra.shape[1]
+    ra = np.vstack([planet_ra, np.broadcast_to(FIXED_RA, (len(FIXED_RA), n_t))])
+    dec = np.vstack([planet_dec, np.broadcast_to(FIXED_DEC, (len(FIXED_DEC), n_t))])
+    return ra, dec
+
+
+def local_sidereal_time(jd, lon):
+    """Local mean sidereal time in radians"""
+    gmst = 280.46061837 + 360.98564736629 * (np.asarray(jd, dtype=float) - J2000)
+    return np.radians((gmst + lon) % 360)
+
+
+def airmass(altitude):
+    """Kasten & Young (1989) airmass for altitudes in degrees, NaN below the horizon"""
+    altitude = np.asarray(altitude, dtype=float)
+    above = np.where(altitude > 0, altitude, np.nan)
+    return 1 / (np.sin(np.radians(above)) + 0.50572 * (above + 6.07995) ** -1.6364)
+
+
+def equatorial_to_altaz(ra, dec, lat, lst):
+    """Altitude and azimuth (degrees, azimuth east of north) for RA/Dec at local sidereal time"""
+    lat = np.radians(lat)
+    hour_angle = lst - ra
+    sin_alt = np.sin(dec) * np.sin(lat) + np.cos(dec) * np.cos(lat) * np.cos(hour_angle)
+    altitude = np.arcsin(np.clip(sin_alt, -1, 1))
+    azimuth = np.arctan2(-np.sin(hour_angle) * np.cos(dec),
+                         np.cos(lat) * np.sin(dec) - np.sin(lat) * np.cos(dec) * np.cos(hour_angle))
+    return np.degrees(altitude), np.degrees(azimuth) % 360
+
+
+def equatorial_altitude(ra, dec, lat, lst):
+    """Altitude alone (degrees), skipping the azimuth when only visibility matters"""
+    lat = np.radians(lat)
+    sin_alt = np.sin(dec) * np.sin(lat) + np.cos(dec) * np.cos(lat) * np.cos(lst - ra)
+    return np.degrees(np.arcsin(np.clip(sin_alt, -1, 1)))
+
+
+def _altaz_astropy(lat, lon, times, elevation):
+    location = EarthLocation(lat=lat * u.deg, lon=lon * u.deg, height=elevation * u.m)
+    obstime = Time(np.asarray(times, dtype='datetime64[s]'), scale='utc')
+    frame = AltAz(obstime=obstime, location=location)
+    alts, azs = [], []
+    for obj in CATALOG:
+        if obj.get('type') == 'planet':
+            coord = get_body(obj['name'].lower(), obstime, location)
+        else:
+            coord = SkyCoord(ra=obj['ra'] * u.deg, dec=obj['dec'] * u.deg)
+        altaz = coord.transform_to(frame)
+        alts.append(altaz.alt.deg)
+        azs.append(altaz.az.deg)
+    return np.array(alts), np.array(azs)
+
+
+def catalog_altaz(lat, lon, times, elevation=0, use_astropy=False):
+    """Altitude, azimuth and airmass of every catalog object at every time
+
+    times are UTC (datetime64 or naive datetimes). Returns three arrays of
+    shape (n_objects, n_times) ordered like NAMES.
+    """
+    if use_astropy and Time is not None:
+        altitude, azimuth = _altaz_astropy(lat, lon, times, elevation)
+    else:
+        jd = julian_date(times)
+        ra, dec = catalog_radec(jd)
+        altitude, azimuth = equatorial_to_altaz(ra, dec, lat, local_sidereal_time(jd, lon)[None, :])
+    return altitude, azimuth, airmass(altitude)
+
+
+def night_of(lon, when=None):
+    """Local date whose evening `when` (UTC) belongs to, using local mean solar time"""
+    local = (when or utc_now()) + timedelta(hours=lon / 15)
+    return (local - timedelta(hours=12)).date()
+
+
+class NightEphemeris:
+    """Catalog positions for one site over one local noon-to-noon night"""
+
+    def __init__(self, lat, lon, night, step_minutes=15, use_astropy=False):
+        self.lat = lat
+        self.lon = lon
+        self.night = night
+        self.step_minutes = step_minutes
+        # Local mean noon on `night`, expressed in UTC
+        start = datetime.combine(night, datetime.min.time()) + timedelta(hours=12 - lon / 15)
+        self.start = np.datetime64(start, 'm')
+        self.times = self.start + np.arange(24 * 60 // step_minutes) * np.timedelta64(step_minutes, 'm')
+        self.altitude, self.azimuth, self.airmass = catalog_altaz(lat, lon, self.times, use_astropy=use_astropy)
+        jd = julian_date(self.times)
+        self.sun_altitude = equatorial_to_altaz(*sun_radec(jd), lat, local_sidereal_time(jd, lon))[0]
+        for array in (self.times, self.altitude, self.azimuth, self.airmass, self.sun_altitude):
+            array.flags.writeable = False  # shared through the cache
+
+    def slot(self, when):
+        """Index of the time step nearest to `when` (UTC)"""
+        offset = (np.datetime64(when, 'm') - self.start).astype(int)
+        return int(np.clip(round(offset / self.step_minutes), 0, len(self.times) - 1))
+
+    def observing_time(self, when=None):
+        """`when` (default now) if the Sun is below the horizon then, otherwise local midnight"""
+        when = when or utc_now()
+        if self.sun_altitude[self.slot(when)] < 0:
+            return when
+        return (self.start + np.timedelta64(12 * 60, 'm')).astype(datetime)
+
+    def targets_at(self, when=None, min_altitude=10, limit=None):
+        """Catalog objects above min_altitude at `when`, highest first"""
+        i = self.slot(when or utc_now())
+        order = np.argsort(-self.altitude[:, i])
+        targets = []
+        for j in order:
+            if self.altitude[j, i] < min_altitude:
+                break
+            obj = {k: v for k, v in CATALOG[j].items() if k not in ('ra', 'dec', 'elements', 'rates')}
+            obj['altitude'] = round(float(self.altitude[j, i]), 1)
+            obj['azimuth'] = round(float(self.azimuth[j, i]), 1)
+            obj['airmass'] = round(float(self.airmass[j, i]), 2)
+            targets.append(obj)
+        return targets[:limit] if limit else targets
+
+
+@lru_cache(maxsize=256)
+def _cached_night(lat, lon, night, step_minutes, use_astropy):
+    return NightEphemeris(lat, lon, night, step_minutes, use_astropy)
+
+
+def night_ephemeris(lat, lon, night=None, step_minutes=15, use_astropy=False):
+    """Cached NightEphemeris, coordinates quantized to 0.01 degrees"""
+    if night is None:
+        night = night_of(lon)
+    elif isinstance(night, datetime):
+        night = night_of(lon, night)
+    elif not isinstance(night, date):
+        night = date.fromisoformat(str(night))
+    return _cached_night(round(lat, 2), round(lon, 2), night, step_minutes, use_astropy)
+
+
+def visible_targets(lat, lon, when=None, min_altitude=10, limit=8, use_astropy=False):
+    """Tonight's catalog objects above min_altitude at a site, highest first
+
+    Without `when` this uses the current time if it is already dark, and
+    local midnight otherwise.
+    """
+    ephemeris = night_ephemeris(lat, lon, night_of(lon, when), use_astropy=use_astropy)
+    if when is None:
+        when = ephemeris.observing_time()
+    return ephemeris.targets_at(when, min_altitude, limit)
@@ -0,0 +1,148 @@
+# forecast.py
+# Server-side forecast timeline for index2.0.html
+# Same scoring as the page's old calculateVisibilityScore, but reproducible and cached per grid cell
+
+from datetime import date, datetime
+from functools import lru_cache
+
+import numpy as np
+
+from almanac import almanac
+from ephemeris import night_ephemeris, utc_now
+from visibility import hash_uniform
+
+
+GRID_DEGREES = 0.25   # nearby queries inside one cell share a cache entry
+MAX_HOURS = 48
+MIN_STEP = 5
+MAX_SLOTS = 288
+CLOUD_KNOT_MINUTES = 180  # cloud cover is interpolated between 3-hourly draws
+
+# One hash stream per simulated quantity
+SEED_LIGHT = 101
+SEED_CLOUD = 102
+SEED_STABILITY = 104
+SEED_WIND = 105
+SEED_TEMPERATURE = 106
+
+
+def quantize(lat, lon, grid=GRID_DEGREES):
+    """Center of the grid cell containing (lat, lon)"""
+    lat = min(max(lat, -90.0), 90.0)
+    lon = (lon + 180.0) % 360.0 - 180.0
+    cell_lat = (np.floor(lat / grid) + 0.5) * grid
+    cell_lon = (np.floor(lon / grid) + 0.5) * grid
+    return round(float(min(cell_lat, 90.0 - grid / 2)), 4), round(float(cell_lon), 4)
+
+
+def _cell_keys(lat, lon):
+    return int(round(lat * 1e4)), int(round(lon * 1e4))
+
+
+def sky_conditions(lat, lon, minutes):
+    """Simulated conditions for one cell at epoch-minute slots, one array per quantity"""
+    lat_key, lon_key = _cell_keys(lat, lon)
+    minutes = np.asarray(minutes, dtype=np.int64)
+
+    light_pollution = 1 + 5 * float(hash_uniform(lat_key, lon_key, seed=SEED_LIGHT))  # 1-6 scale
+
+    # Smooth cloud cover: draws on coarse knots, linear in between
+    knot = minutes // CLOUD_KNOT_MINUTES
+    frac = (minutes % CLOUD_KNOT_MINUTES) / CLOUD_KNOT_MINUTES
+    cloud_a = hash_uniform(lat_key, lon_key, knot, seed=SEED_CLOUD)
+    cloud_b = hash_uniform(lat_key, lon_key, knot + 1, seed=SEED_CLOUD)
+    cloud_cover = 100 * (cloud_a + (cloud_b - cloud_a) * frac)
+
+    moon_phase = moon_illumination(lat, lon, minutes)
+    stability = 1 + 10 * hash_uniform(lat_key, lon_key, minutes, seed=SEED_STABILITY)  # 1-11
+    wind = 5 + 15 * hash_uniform(lat_key, lon_key, minutes, seed=SEED_WIND)
+    temperature = 50 + 20 * hash_uniform(lat_key, lon_key, minutes // 60, seed=SEED_TEMPERATURE)
+
+    return {
+        'light_pollution': light_pollution,
+        'cloud_cover': cloud_cover,
+        'moon_phase': moon_phase,
+        'stability': stability,
+        'wind': wind,
+        'temperature': temperature,
+    }
+
+
+def moon_illumination(lat, lon, minutes):
+    """Moon illumination (0-1) from the almanac for the local night of each epoch-minute slot"""
+    # Local mean solar time, shifted so each night (noon to noon) is one day number
+    days = (np.asarray(minutes, dtype=np.int64) + int(round(lon * 4)) - 720) // 1440
+    unique, inverse = np.unique(days, return_inverse=True)
+    lit = np.array([almanac(lat, lon, np.datetime64(int(day), 'D').astype(date))['moon_illumination']
+                    for day in unique])
+    return lit[inverse].reshape(np.shape(minutes))
+
+
+def score_conditions(conditions):
+    """Visibility score (0-100) for every slot in a sky_conditions result"""
+    score = (100
+             - conditions['light_pollution'] * 10
+             - conditions['cloud_cover'] * 0.8
+             - np.maximum(conditions['moon_phase'] - 0.5, 0) * 40
+             - (10 - conditions['stability']) * 3)
+    return np.clip(score, 0, 100)
+
+
+@lru_cache(maxsize=4096)
+def _cached_timeline(cell_lat, cell_lon, start_minute, hours, step):
+    minutes = start_minute + np.arange(hours * 60 // step) * step
+    conditions = sky_conditions(cell_lat, cell_lon, minutes)
+    scores = score_conditions(conditions)
+    start = np.datetime64(start_minute, 'm').astype(datetime)
+    ephemeris = night_ephemeris(cell_lat, cell_lon, start)
+
+    return {
+        'cell': {'lat': cell_lat, 'lon': cell_lon, 'size': GRID_DEGREES},
+        'start': int(start_minute * 60),
+        'step': step,
+        'current': {
+            'score': int(round(scores[0])),
+            'cloud_cover': int(round(conditions['cloud_cover'][0])),
+            'moon_phase': int(round(conditions['moon_phase'][0] * 100)),
+            'wind': int(round(conditions['wind'][0])),
+            'temperature': int(round(conditions['temperature'][0])),
+            'light_pollution': int(round(conditions['light_pollution'])),
+        },
+        # Columnar so the payload stays small for long timelines
+        'timeline': {
+            'score': np.rint(scores).astype(int).tolist(),
+            'cloud_cover': np.rint(conditions['cloud_cover']).astype(int).tolist(),
+            'seeing': np.rint(np.minimum(conditions['stability'], 10)).astype(int).tolist(),
+        },
+        'targets': ephemeris.targets_at(ephemeris.observing_time(start)),
+        'almanac': almanac(cell_lat, cell_lon, start),
+    }
+
+
+def forecast_timeline(lat, lon, hours=6, step=30, now=None):
+    """Forecast for the grid cell around (lat, lon), starting at the current step boundary
+
+    hours and step are whole numbers (fractions are truncated). Raises
+    ValueError for out-of-range arguments. The returned dict is
+    shared through the cache and must not be modified.
+    """
+    if not (-90 <= lat <= 90 and -180 <= lon <= 180):
+        raise ValueError("lat must be within [-90, 90] and lon within [-180, 180]")
+    hours, step = int(hours), int(step)
+    if not (1 <= hours <= MAX_HOURS):
+        raise ValueError(f"hours must be between 1 and {MAX_HOURS}")
+    if step < MIN_STEP or hours * 60 // step > MAX_SLOTS or hours * 60 < step:
+        raise ValueError(f"step must be at least {MIN_STEP} minutes and give at most {MAX_SLOTS} slots")
+
+    now = now or utc_now()
+    epoch_minute = int(np.datetime64(now, 'm').astype(np.int64))
+    start_minute = epoch_minute - epoch_minute % step
+    cell_lat, cell_lon = quantize(lat, lon)
+    return _cached_timeline(cell_lat, cell_lon, start_minute, hours, step)
+
+
+def seconds_until_next_step(step, now=None):
+    """How long a forecast stays valid, for Cache-Control"""
+    now = now or utc_now()
+    seconds = int(np.datetime64(now, 's').astype(np.int64))
+    return step * 60 - seconds % (step * 60)
@@ -0,0 +1,310 @@
+# frame_store.py
+# Local columnar copy of LCO archive frame metadata
+# Run this with: python3 frame_store.py sync --site ogg
+#                python3 frame_store.py query --site ogg --start 2024-01-01
+
+import argparse
+import json
+import os
+import shutil
+import time
+
+import numpy as np
+import pandas as pd
+
+from LCO_Integration import SimpleLCODemo
+
+
+DEFAULT_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'data', 'frames')
+
+# Archive field -> (column name, kind). 'code' columns are dictionary encoded
+# against a vocabulary shared by all segments.
+FIELDS = {
+    'id': ('id', 'int'),
+    'basename': ('basename', 'bytes'),
+    'DATE_OBS': ('date_obs', 'time'),
+    'SITEID': ('site', 'code'),
+    'TELID': ('telescope', 'code'),
+    'INSTRUME': ('instrument', 'code'),
+    'OBJECT': ('object', 'code'),
+    'FILTER': ('filter', 'code'),
+    'PROPID': ('proposal', 'code'),
+    'EXPTIME': ('exptime', 'float'),
+    'RLEVEL': ('rlevel', 'int'),
+}
+DTYPES = {'int': np.int64, 'bytes': 'S64', 'time': 'datetime64[ms]', 'code': np.int32, 'float': np.float32}
+CODE_COLUMNS = [column for column, kind in FIELDS.values() if kind == 'code']
+
+
+def parse_time(value):
+    if not value:
+        return np.datetime64('NaT', 'ms')
+    return np.datetime64(value.rstrip('Z'), 'ms')
+
+
+class FrameStore:
+    """Append-only segments of memory-mapped .npy columns plus a small JSON manifest
+
+    Each sync writes new segments; queries filter every segment with numpy
+    masks and never touch the network.
+    """
+
+    def __init__(self, path=DEFAULT_PATH, segment_rows=50_000):
+        self.path = path
+        self.segment_rows = segment_rows
+        os.makedirs(path, exist_ok=True)
+        self.meta = self._read_meta()
+        self._codes = {column: {value: i for i, value in enumerate(values)}
+                       for column, values in self.meta['vocab'].items()}
+        self._segments = {}  # name -> {column: memmap}
+
+    # -- manifest ---------------------------------------------------------
+
+    def _meta_path(self):
+        return os.path.join(self.path, 'meta.json')
+
+    def _read_meta(self):
+        try:
+            with open(self._meta_path()) as f:
+                meta = json.load(f)
+            # Stores written before cursors were kept per filter set had one, for unfiltered syncs
+            if 'cursor' in meta:
+                meta['cursors'] = {'': meta.pop('cursor')}
+            return meta
+        except FileNotFoundError:
+            return {
+                'segments': [],
+                'rows': 0,
+                'vocab': {column: [] for column in CODE_COLUMNS},
+                'cursors': {},
+                'id_ranges': {},
+            }
+
+    def _write_meta(self):
+        tmp = self._meta_path() + '.tmp'
+        with open(tmp, 'w') as f:
+            json.dump(self.meta, f)
+        os.replace(tmp, self._meta_path())
+
+    def __len__(self):
+        return self.meta['rows']
+
+    # -- ingestion --------------------------------------------------------
+
+    def _encode(self, column, value):
+        codes = self._codes[column]
+        value = '' if value is None else str(value)
+        if value not in codes:
+            codes[value] = len(codes)
+            self.meta['vocab'][column].append(value)
+        return codes[value]
+
+    def _id_range(self, name):
+        """[min, max] frame id of a segment, kept in the manifest (filled in for older stores)"""
+        ranges = self.meta.setdefault('id_ranges', {})
+        if name not in ranges:
+            ids = self._segment(name)['id']
+            ranges[name] = [int(ids.min()), int(ids.max())] if len(ids) else [0, -1]
+        return ranges[name]
+
+    def _stored(self, ids):
+        """Mask of ids already stored; only segments whose id range overlaps ids are read"""
+        stored = np.zeros(len(ids), dtype=bool)
+        if not len(ids):
+            return stored
+        lo, hi = int(ids.min()), int(ids.max())
+        for name in self.meta['segments']:
+            first, last = self._id_range(name)
+            if first <= hi and last >= lo:
+                stored |= np.isin(ids, self._segment(name)['id'])
+        return stored
+
+    def _flush(self, buffers, cursor_key, cursor):
+        """Write buffered rows not already stored as a new segment, saving the cursor in the same manifest write"""
+        ids = np.array(buffers['id'], dtype=np.int64)
+        keep = ~self._stored(ids)
+        if keep.any():
+            segments = self.meta['segments']
+            name = f"{int(segments[-1]) + 1 if segments else 1:06d}"
+            segment_dir = os.path.join(self.path, name)
+            tmp_dir = segment_dir + '.tmp'
+            os.makedirs(tmp_dir, exist_ok=True)
+            for column, kind in FIELDS.values():
+                np.save(os.path.join(tmp_dir, f'{column}.npy'), np.array(buffers[column], dtype=DTYPES[kind])[keep])
+            os.replace(tmp_dir, segment_dir)
+            self.meta['segments'].append(name)
+            self.meta['id_ranges'][name] = [int(ids[keep].min()), int(ids[keep].max())]
+            self.meta['rows'] += int(keep.sum())
+        for column in buffers:
+            buffers[column].clear()
+        if cursor is not None:
+            self.meta['cursors'][cursor_key] = cursor
+        self._write_meta()
+        return int(keep.sum())
+
+    def sync(self, client, page_size=1000, max_records=None, **filters):
+        """Pull frames newer than the stored cursor through client.iter_frames
+
+        Each filter set (e.g. SITEID='ogg') keeps its own cursor, saved with
+        every flushed segment, so an interrupted sync resumes where it
+        stopped. Frames already stored by another filter set are skipped,
+        checking only the segments whose id range overlaps each flush.
+        Works in constant memory: rows are flushed to a new segment every
+        segment_rows records. Returns the number of new frames stored.
+        """
+        cursor_key = '&'.join(f'{k}={filters[k]}' for k in sorted(filters)
+                              if k not in ('start', 'ordering', 'limit'))
+        cursor = self.meta['cursors'].get(cursor_key, {'date_obs': None, 'ids': []})
+        seen_at_cursor = set(cursor['ids'])
+        cursor_time = parse_time(cursor['date_obs']) if cursor['date_obs'] else None
+        if cursor['date_obs']:
+            filters.setdefault('start', cursor['date_obs'])
+        filters.setdefault('ordering', 'DATE_OBS')
+
+        buffers = {column: [] for column, _ in FIELDS.values()}
+        added = read = 0
+
+        def flush():
+            state = None
+            if cursor_time is not None:
+                state = {'date_obs': str(cursor_time), 'ids': sorted(seen_at_cursor)}
+            return self._flush(buffers, cursor_key, state)
+
+        for frame in client.iter_frames(fields=list(FIELDS), page_size=page_size, **filters):
+            date_obs = parse_time(frame.get('DATE_OBS'))
+            # The start filter is inclusive, skip what we already have at the cursor
+            if cursor_time is not None and (date_obs < cursor_time or
+                                            (date_obs == cursor_time and frame['id'] in seen_at_cursor)):
+                continue
+
+            for field, (column, kind) in FIELDS.items():
+                value = frame.get(field)
+                if kind == 'code':
+                    value = self._encode(column, value)
+                elif kind == 'time':
+                    value = date_obs
+                elif kind == 'bytes':
+                    value = (value or '').encode()[:64]
+                elif value is None:
+                    value = 0
+                buffers[column].append(value)
+
+            if cursor_time is None or date_obs > cursor_time:
+                cursor_time, seen_at_cursor = date_obs, set()
+            seen_at_cursor.add(frame['id'])
+
+            read += 1
+            if len(buffers['id']) >= self.segment_rows:
+                added += flush()
+            if max_records and read >= max_records:
+                break
+
+        added += flush()
+        return added
+
+    def compact(self):
+        """Merge all segments into one, keeping the manifest consistent"""
+        if len(self.meta['segments']) < 2:
+            return
+        merged = {column: np.concatenate([self._segment(name)[column] for name in self.meta['segments']])
+                  for column, _ in FIELDS.values()}
+        old = self.meta['segments']
+        name = f"{int(old[-1]) + 1:06d}"
+        tmp_dir = os.path.join(self.path, name + '.tmp')
+        os.makedirs(tmp_dir, exist_ok=True)
+        for column, values in merged.items():
+            np.save(os.path.join(tmp_dir, f'{column}.npy'), values)
+        os.replace(tmp_dir, os.path.join(self.path, name))
+        self.meta['segments'] = [name]
+        ids = merged['id']
+        self.meta['id_ranges'] = {name: [int(ids.min()), int(ids.max())]}
+        self._write_meta()
+        self._segments.clear()
+        for segment in old:
+            shutil.rmtree(os.path.join(self.path, segment), ignore_errors=True)
+
+    # -- queries ----------------------------------------------------------
+
+    def _segment(self, name):
+        if name not in self._segments:
+            segment_dir = os.path.join(self.path, name)
+            self._segments[name] = {column: np.load(os.path.join(segment_dir, f'{column}.npy'), mmap_mode='r')
+                                    for column, _ in FIELDS.values()}
+        return self._segments[name]
+
+    def _code(self, column, value):
+        return self._codes[column].get(value, -1)
+
+    def query(self, site=None, instrument=None, telescope=None, object=None,
+              start=None, end=None, columns=None):
+        """Frames matching every given filter, as a DataFrame with categorical string columns"""
+        equals = {'site': site, 'instrument': instrument, 'telescope': telescope, 'object': object}
+        equals = {column: self._code(column, value) for column, value in equals.items() if value is not None}
+        if any(code < 0 for code in equals.values()):
+            equals = None  # a value we've never seen can't match anything
+        start = parse_time(str(start)) if start is not None else None
+        end = parse_time(str(end)) if end is not None else None
+        columns = columns or [column for column, _ in FIELDS.values()]
+
+        parts = {column: [] for column in columns}
+        for name in self.meta['segments'] if equals is not None else []:
+            segment = self._segment(name)
+            mask = np.ones(len(segment['id']), dtype=bool)
+            for column, code in equals.items():
+                mask &= segment[column] == code
+            if start is not None:
+                mask &= segment['date_obs'] >= start
+            if end is not None:
+                mask &= segment['date_obs'] < end
+            for column in columns:
+                parts[column].append(segment[column][mask])
+
+        data = {}
+        for column in columns:
+            kind = next(k for c, k in FIELDS.values() if c == column)
+            values = np.concatenate(parts[column]) if parts[column] else np.array([], dtype=DTYPES[kind])
+            if kind == 'code':
+                # Codes map straight onto the vocabulary, no per-row string decoding
+                data[column] = pd.Categorical.from_codes(values, categories=self.meta['vocab'][column])
+            elif kind == 'bytes':
+                data[column] = values.astype(str)
+            else:
+                data[column] = values
+        return pd.DataFrame(data)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Sync and query LCO archive frame metadata locally")
+    parser.add_argument('command', choices=['sync', 'query', 'compact'])
+    parser.add_argument('--store', default=DEFAULT_PATH)
+    parser.add_argument('--site')
+    parser.add_argument('--instrument')
+    parser.add_argument('--object')
+    parser.add_argument('--start')
+    parser.add_argument('--end')
+    parser.add_argument('--max-records', type=int)
+    args = parser.parse_args()
+
+    store = FrameStore(args.store)
+    if args.command == 'sync':
+        lco = SimpleLCODemo(os.getenv('LCO_API_TOKEN'))
+        filters = {'SITEID': args.site, 'INSTRUME': args.instrument, 'OBJECT': args.object, 'end': args.end}
+        if args.start:
+            filters['start'] = args.start
+        added = store.sync(lco, max_records=args.max_records,
+                           **{k: v for k, v in filters.items() if v is not None})
+        print(f"✅ Stored {added} new frames ({len(store)} total)")
+    elif args.command == 'compact':
+        store.compact()
+        print(f"✅ Compacted {len(store)} frames into one segment")
+    else:
+        started = time.perf_counter()
+        frames = store.query(site=args.site, instrument=args.instrument, object=args.object,
+                             start=args.start, end=args.end)
+        elapsed = (time.perf_counter() - started) * 1000
+        print(frames.to_string(max_rows=20))
+        print(f"\n{len(frames)} frames in {elapsed:.1f} ms")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,481 @@
+# lco_async.py
+# asyncio LCO client: keep-alive HTTP/1.1 over asyncio streams, bounded concurrency
+# Same surface as SimpleLCODemo (sites, telescope status, reports), every method a coroutine
+# Standard library only; APP.py runs it on one background event loop per worker
+
+import asyncio
+import gzip
+import http.client
+import io
+import os
+import random
+import ssl
+import threading
+import time
+import urllib.parse
+from collections import deque
+
+from lco_pagination import with_params
+from lco_resilience import COALESCED, RETRIES, RETRY_STATUSES, CircuitBreakerTransport
+from lco_transport import REDIRECT_CODES, Response, TransportError, redirect_headers
+from metrics import DECODE_SECONDS, UPSTREAM_ERRORS, UPSTREAM_SECONDS, endpoint_label, error_category
+from records import InstrumentTable, SiteTable
+
+
+class AsyncTransport:
+    """Pool of persistent HTTP/1.1 connections per host, driven by asyncio streams
+
+    GETs are retried on connection errors and 429/502/503/504 with
+    full-jitter backoff, and identical in-flight GETs share one call.
+    Requests pass a per-endpoint circuit breaker first; hand in the
+    blocking stack's CircuitBreakerTransport as breaker so both fail fast
+    together. Pass a DiskCacheTransport as cache to share its on-disk
+    responses with the blocking clients. All methods must run on the same
+    event loop.
+    """
+
+    def __init__(self, max_per_host=16, connect_timeout=3.05, read_timeout=10,
+                 user_agent='skywatch-demo', max_redirects=3, retries=2, base_delay=0.2, max_delay=2.0,
+                 cache=None, breaker=None):
+        self.max_per_host = max_per_host
+        self.connect_timeout = connect_timeout
+        self.read_timeout = read_timeout
+        self.user_agent = user_agent
+        self.max_redirects = max_redirects
+        self.retries = retries
+        self.base_delay = base_delay
+        self.max_delay = max_delay
+        self.cache = cache
+        self.breaker = breaker or CircuitBreakerTransport(None)
+        self._ssl = None
+        self._idle = {}   # (scheme, host, port) -> deque of (reader, writer)
+        self._slots = {}  # (scheme, host, port) -> semaphore bounding open connections
+        self._calls = {}  # request key -> in-flight future
+
+    async def _connect(self, key):
+        scheme, host, port = key
+        if scheme == 'https':
+            self._ssl = self._ssl or ssl.create_default_context()
+            opening = asyncio.open_connection(host, port or 443, ssl=self._ssl, server_hostname=host)
+        else:
+            opening = asyncio.open_connection(host, port or 80)
+        return await asyncio.wait_for(opening, self.connect_timeout)
+
+    async def _checkout(self, key):
+        """Borrow an idle connection for key, or open a new one"""
+        if key not in self._slots:
+            self._slots[key] = asyncio.Semaphore(self.max_per_host)
+            self._idle[key] = deque()
+        try:
+            await asyncio.wait_for(self._slots[key].acquire(), self.connect_timeout + self.read_timeout)
+        except TimeoutError:
+            raise TransportError(f"Connection pool for {key[1]} exhausted")
+        idle = self._idle[key]
+        while idle:
+            reader, writer = idle.pop()
+            if not reader.at_eof() and not writer.is_closing():
+                return reader, writer, True
+            writer.close()
+        try:
+            return *await self._connect(key), False
+        except BaseException:
+            self._slots[key].release()
+            raise
+
+    def _checkin(self, key, stream):
+        """Return a (reader, writer) pair to the pool, or None if it can't be reused"""
+        if stream is not None:
+            self._idle[key].append(stream)
+        self._slots[key].release()
+
+    async def _read_response(self, reader, method):
+        """(status, reason, headers, body, keep_alive) for one response on reader"""
+        status_line = await reader.readline()
+        if not status_line:
+            raise ConnectionResetError("Connection closed by server")
+        version, status, reason = (status_line.decode('latin-1').rstrip('\r\n').split(' ', 2) + [''])[:3]
+        lines = []
+        while True:
+            line = await reader.readline()
+            if line in (b'\r\n', b'\n', b''):
+                break
+            lines.append(line)
+        headers = http.client.parse_headers(io.BytesIO(b''.join(lines) + b'\r\n'))
+        status = int(status)
+
+        keep_alive = version == 'HTTP/1.1' and headers.get('Connection', '').lower() != 'close'
+        if method == 'HEAD' or status in (204, 304) or 100 <= status < 200:
+            body = b''
+        elif 'chunked' in headers.get('Transfer-Encoding', '').lower():
+            chunks = []
+            while True:
+                size = int((await reader.readline()).split(b';', 1)[0], 16)
+                if not size:
+                    while (await reader.readline()) not in (b'\r\n', b'\n', b''):
+                        pass  # trailers
+                    break
+                chunks.append(await reader.readexactly(size))
+                await reader.readexactly(2)
+            body = b''.join(chunks)
+        elif headers.get('Content-Length') is not None:
+            body = await reader.readexactly(int(headers['Content-Length']))
+        else:
+            body = await reader.read()
+            keep_alive = False
+        return status, reason, headers, body, keep_alive
+
+    async def _exchange(self, reader, writer, method, host, path, headers):
+        lines = [f'{method} {path} HTTP/1.1', f'Host: {host}'] + [f'{k}: {v}' for k, v in headers.items()]
+        writer.write(('\r\n'.join(lines) + '\r\n\r\n').encode('latin-1'))
+        await writer.drain()
+        return await asyncio.wait_for(self._read_response(reader, method), self.read_timeout)
+
+    async def _send(self, key, method, path, headers):
+        host = key[1] if key[2] is None else f'{key[1]}:{key[2]}'
+        reader, writer, reused = await self._checkout(key)
+        try:
+            try:
+                result = await self._exchange(reader, writer, method, host, path, headers)
+            except (ConnectionError, asyncio.IncompleteReadError):
+                # Server closed an idle keep-alive socket, retry once on a fresh one
+                if not reused:
+                    raise
+                writer.close()
+                reader, writer = await self._connect(key)
+                result = await self._exchange(reader, writer, method, host, path, headers)
+        except BaseException:
+            writer.close()
+            self._checkin(key, None)
+            raise
+
+        status, reason, response_headers, body, keep_alive = result
+        if not keep_alive:
+            writer.close()
+        self._checkin(key, (reader, writer) if keep_alive else None)
+        if response_headers.get('Content-Encoding', '').lower() == 'gzip':
+            body = gzip.decompress(body)
+        return status, reason, response_headers, body
+
+    async def _request_once(self, url, headers, method):
+        send_headers = {
+            'Accept': 'application/json',
+            'Accept-Encoding': 'gzip',
+            'Connection': 'keep-alive',
+            'User-Agent': self.user_agent,
+        }
+        send_headers.update(headers or {})
+
+        for _ in range(self.max_redirects + 1):
+            parts = urllib.parse.urlsplit(url)
+            key = (parts.scheme, parts.hostname, parts.port)
+            path = parts.path or '/'
+            if parts.query:
+                path += '?' + parts.query
+
+            status, reason, response_headers, body = await self._send(key, method, path, send_headers)
+            location = response_headers.get('Location')
+            if status in REDIRECT_CODES and location:
+                target = urllib.parse.urljoin(url, location)
+                send_headers = redirect_headers(send_headers, url, target)
+                url = target
+                continue
+            return Response(url, status, reason, response_headers, body)
+
+        raise TransportError(f"Too many redirects for {url}", url=url)
+
+    def _delay(self, attempt, response=None):
+        delay = random.uniform(0, min(self.max_delay, self.base_delay * 2 ** attempt))
+        retry_after = response.headers.get('Retry-After') if response is not None else None
+        if retry_after and retry_after.isdigit():
+            delay = max(delay, min(float(retry_after), self.max_delay))
+        return delay
+
+    async def _retrying(self, url, headers, method):
+        """Same policy as lco_resilience.RetryTransport; timeouts are not retried"""
+        for attempt in range(self.retries + 1):
+            last_attempt = attempt == self.retries or method != 'GET'
+            try:
+                response = await self._request_once(url, headers, method)
+            except TimeoutError:
+                raise
+            except (ConnectionError, OSError, asyncio.IncompleteReadError):
+                if last_attempt:
+                    raise
+                delay = self._delay(attempt)
+            else:
+                if response.status not in RETRY_STATUSES or last_attempt:
+                    return response
+                delay = self._delay(attempt, response)
+            RETRIES.inc(endpoint=endpoint_label(url))
+            await asyncio.sleep(delay)
+
+    async def _guarded(self, url, headers, method):
+        """_retrying behind the circuit breaker, like CircuitBreakerTransport around RetryTransport"""
+        ticket = self.breaker.admit(url)
+        try:
+            response = await self._retrying(url, headers, method)
+        except BaseException:
+            self.breaker.record(ticket)
+            raise
+        self.breaker.record(ticket, response)
+        return response
+
+    async def request(self, url, headers=None, method='GET'):
+        """Send a request and return the fully read Response"""
+        if method != 'GET':
+            return await self._guarded(url, headers, method)
+        if self.cache is None:
+            return await self._single_flight(url, headers)
+        # SQLite calls go to a thread, a busy database must not stall the loop
+        cached, send, state = await asyncio.to_thread(self.cache.lookup, url, headers)
+        if cached is not None:
+            return cached
+        return await asyncio.to_thread(self.cache.store, state, await self._single_flight(url, send))
+
+    async def _single_flight(self, url, headers):
+        key = (url, tuple(sorted((headers or {}).items())))
+        call = self._calls.get(key)
+        if call is not None:
+            COALESCED.inc(endpoint=endpoint_label(url))
+        else:
+            call = self._calls[key] = asyncio.ensure_future(self._guarded(url, headers, 'GET'))
+            call.add_done_callback(lambda done: self._calls.pop(key, None) if self._calls.get(key) is done else None)
+            # Mark the outcome as retrieved even if every waiter was cancelled
+            call.add_done_callback(lambda done: done.cancelled() or done.exception())
+        # Shielded so one caller timing out doesn't cancel the call for the others
+        return await asyncio.shield(call)
+
+    async def get_json(self, url, headers=None):
+        """GET url and decode the JSON body, timing the two apart and counting failures"""
+        endpoint = endpoint_label(url)
+        started = time.perf_counter()
+        try:
+            response = await self.request(url, headers)
+            UPSTREAM_SECONDS.observe(time.perf_counter() - started, endpoint=endpoint)
+            if response.status >= 400:
+                raise TransportError(f"HTTP Error {response.status}: {response.reason}",
+                                     status=response.status, url=url)
+            with DECODE_SECONDS.time(endpoint=endpoint):
+                return response.json()
+        except Exception as e:
+            UPSTREAM_ERRORS.inc(endpoint=endpoint, category=error_category(e))
+            raise
+
+    async def close(self):
+        """Close every idle connection"""
+        for idle in self._idle.values():
+            while idle:
+                idle.pop()[1].close()
+
+
+class ThreadedTransport:
+    """AsyncTransport's get_json over a blocking Transport (e.g. cassettes), run in worker threads"""
+
+    def __init__(self, inner):
+        self.inner = inner
+
+    async def get_json(self, url, headers=None):
+        return await asyncio.to_thread(self.inner.get_json, url, headers)
+
+    async def close(self):
+        pass
+
+
+class AsyncLCOClient:
+    """Coroutine versions of the SimpleLCODemo calls that touch the network
+
+    Every upstream request waits on one semaphore, so at most
+    max_concurrency are in flight however many callers there are. Pass
+    the sync client to share its credentials, URLs and cache; its pure
+    helpers (scoring, report formatting) are reused as-is.
+    """
+
+    def __init__(self, client, transport=None, max_concurrency=32):
+        self.client = client
+        self.transport = transport or AsyncTransport(max_per_host=max_concurrency)
+        self.cache = client.cache
+        self.max_concurrency = max_concurrency
+        self._semaphore = None
+
+    @property
+    def semaphore(self):
+        # Created on first use so it belongs to the loop the client runs on
+        if self._semaphore is None:
+            self._semaphore = asyncio.Semaphore(self.max_concurrency)
+        return self._semaphore
+
+    async def _fetch_json(self, url):
+        """Like make_request, but raises instead of returning None"""
+        async with self.semaphore:
+            return await self.transport.get_json(url, self.client._auth_headers())
+
+    async def make_request(self, url):
+        try:
+            return await self._fetch_json(url)
+        except Exception as e:
+            print(f"API Request failed ({error_category(e)}): {e}")
+            return None
+
+    async def iter_records(self, url, params=None, fields=None):
+        """Yield every record across every page, fetching the next page while this one is consumed"""
+        upcoming = asyncio.ensure_future(self._fetch_json(with_params(url, params)))
+        try:
+            while upcoming is not None:
+                page = await upcoming
+                next_url = page.get('next') if isinstance(page, dict) else None
+                upcoming = asyncio.ensure_future(self._fetch_json(next_url)) if next_url else None
+                for record in (page or {}).get('results') or []:
+                    yield {field: record.get(field) for field in fields} if fields else record
+        finally:
+            if upcoming is not None:
+                upcoming.cancel()
+
+    def iter_instruments(self, site_code=None, fields=None, **filters):
+        if site_code:
+            filters['site'] = site_code
+        return self.iter_records(f"{self.client.base_url}/instruments/", filters, fields)
+
+    def iter_frames(self, fields=None, page_size=100, **filters):
+        filters.setdefault('limit', page_size)
+        return self.iter_records(f"{self.client.archive_url}/frames/", filters, fields)
+
+    async def _cached(self, key, endpoint, fetch):
+        """SimpleLCODemo._cached for a coroutine fetch()"""
+        errors = []
+
+        async def load():
+            try:
+                return await fetch()
+            except Exception as e:
+                print(f"API Request failed ({error_category(e)}): {e}")
+                errors.append(e)
+                return None
+
+        ttl, stale = self.client.CACHE_TTLS[endpoint]
+        value = await self.cache.aget_or_load(key, load, ttl, stale)
+        if value is None:
+            raise errors[0] if errors else TransportError(f"{endpoint} unavailable")
+        return value
+
+    async def _fetch_sites(self):
+        url = f"{self.client.base_url}/sites/"
+        data = await self._fetch_json(url)
+        if not data or 'results' not in data:
+            raise TransportError("Site list response has no results", url=url)
+        sites = SiteTable.from_records(data['results'])
+        return sites, sites.index('code')
+
+    async def _load_sites(self):
+        try:
+            return await self._cached('sites', 'sites', self._fetch_sites)
+        except Exception:
+            return SiteTable(), {}
+
+    async def get_observatory_sites(self):
+        """SiteTable of every LCO site"""
+        return (await self._load_sites())[0]
+
+    async def get_site(self, site_code):
+        return (await self._load_sites())[1].get(site_code)
+
+    async def _fetch_telescope_status(self, site_code):
+        return InstrumentTable.from_records([record async for record in self.iter_instruments(site_code)])
+
+    async def _load_telescope_status(self, site_code):
+        return await self._cached(('instruments', site_code), 'instruments',
+                                  lambda: self._fetch_telescope_status(site_code))
+
+    async def get_telescope_status(self, site_code=None):
+        """InstrumentTable for one site, or every site when site_code is None (empty on failure)"""
+        try:
+            return await self._load_telescope_status(site_code)
+        except Exception:
+            return InstrumentTable()
+
+    async def get_site_data(self, site_code):
+        """Site info, instrument status and score
+
+        The site is resolved first (the list is cached), so unknown codes
+        never reach upstream or take cache slots. Raises when the
+        instrument status can't be fetched, like SimpleLCODemo.get_site_data.
+        """
+        site_info = await self.get_site(site_code)
+        if not site_info:
+            return None
+        return self.client.build_site_data(site_info, await self._load_telescope_status(site_code))
+
+    async def get_sites_data(self, site_codes, timeout=15):
+        """get_site_data for several sites at once, same result shape as SimpleLCODemo.get_sites_data"""
+        site_codes = list(dict.fromkeys(site_codes))
+        try:
+            await self._cached('sites', 'sites', self._fetch_sites)
+        except Exception as e:
+            return {'sites': {}, 'errors': {code: f'site list unavailable: {e}' for code in site_codes}}
+
+        tasks = {asyncio.ensure_future(self.get_site_data(code)): code for code in site_codes}
+        done, not_done = await asyncio.wait(tasks, timeout=timeout)
+
+        results, errors = {}, {}
+        for task in done:
+            code = tasks[task]
+            if task.exception() is not None:
+                errors[code] = str(task.exception())
+            elif task.result() is None:
+                errors[code] = 'not found'
+            else:
+                results[code] = task.result()
+        for task in not_done:
+            task.cancel()
+            errors[tasks[task]] = f'timed out after {timeout}s'
+
+        return {'sites': results, 'errors': errors}
+
+    async def generate_forecast_report(self, site_code):
+        site_info = await self.get_site(site_code)
+        if not site_info:
+            return f"Site {site_code} not found"
+        return self.client.format_forecast_report(site_code, site_info, await self.get_telescope_status(site_code))
+
+    async def close(self):
+        await self.transport.close()
+
+
+class EventLoopThread:
+    """One event loop in a daemon thread, for running coroutines from sync (or other loops') code
+
+    Started on first use and restarted after a fork, so it is safe to
+    build before gunicorn forks its workers.
+    """
+
+    def __init__(self, name='skywatch-async'):
+        self.name = name
+        self._lock = threading.Lock()
+        self._loop = None
+        self._pid = None
+
+    @property
+    def loop(self):
+        with self._lock:
+            if self._loop is None or self._pid != os.getpid():
+                self._loop = asyncio.new_event_loop()
+                self._pid = os.getpid()
+                threading.Thread(target=self._loop.run_forever, daemon=True, name=self.name).start()
+            return self._loop
+
+    def submit(self, coro):
+        """concurrent.futures.Future for coro running on the background loop"""
+        return asyncio.run_coroutine_threadsafe(coro, self.loop)
+
+    def run(self, coro, timeout=None):
+        """Block until coro finishes on the background loop and return its result"""
+        return self.submit(coro).result(timeout)
+
+    async def wrap(self, coro):
+        """Await coro from another event loop while it runs on the background loop"""
+        return await asyncio.wrap_future(self.submit(coro))
+
+    def stop(self):
+        with self._lock:
+            if self._loop is not None and self._pid == os.getpid():
+                self._loop.call_soon_threadsafe(self._loop.stop)
+            self._loop = None
@@ -0,0 +1,133 @@
+# lco_cache.py
+# In-memory TTL cache for LCO metadata, shared by the client copies
+# Standard library only
+
+import asyncio
+import threading
+import time
+from collections import OrderedDict
+
+
+class TTLCache:
+    """Bounded LRU cache with per-entry TTL and stale-while-revalidate"""
+
+    def __init__(self, max_entries=256):
+        self.max_entries = max_entries
+        self._lock = threading.Lock()
+        self._entries = OrderedDict()  # key -> (value, stored_at, ttl, stale_ttl)
+        self._refreshing = set()
+        self._tasks = set()  # background async refreshes, referenced until done
+        self.hits = 0
+        self.stale_hits = 0
+        self.misses = 0
+        self.fallbacks = 0
+
+    def get(self, key, default=None):
+        """Return the cached value for key if it is still fresh"""
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry and time.monotonic() - entry[1] < entry[2]:
+                self._entries.move_to_end(key)
+                return entry[0]
+        return default
+
+    def set(self, key, value, ttl, stale_ttl=0):
+        with self._lock:
+            self._entries[key] = (value, time.monotonic(), ttl, stale_ttl)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+
+    def invalidate(self, key=None):
+        """Drop one key, or everything when key is None"""
+        with self._lock:
+            if key is None:
+                self._entries.clear()
+            else:
+                self._entries.pop(key, None)
+
+    def _lookup(self, key):
+        """Classify and count one get_or_load lookup: (entry or None, served, start_refresh)
+
+        served is True when entry's value should be returned as is (fresh,
+        or stale within stale_ttl); start_refresh is True for the one caller
+        that should reload a stale entry in the background.
+        """
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry:
+                age = time.monotonic() - entry[1]
+                if age < entry[2]:
+                    self._entries.move_to_end(key)
+                    self.hits += 1
+                    return entry, True, False
+                if age < entry[2] + entry[3]:
+                    self._entries.move_to_end(key)
+                    self.stale_hits += 1
+                    start_refresh = key not in self._refreshing
+                    self._refreshing.add(key)
+                    return entry, True, start_refresh
+            self.misses += 1
+            return entry, False, False
+
+    def _loaded(self, key, value, entry, ttl, stale_ttl):
+        """Store a fresh load, or fall back to the expired entry when it failed"""
+        if value is not None:
+            self.set(key, value, ttl, stale_ttl)
+        elif entry:
+            with self._lock:
+                self.fallbacks += 1
+            return entry[0]
+        return value
+
+    def get_or_load(self, key, loader, ttl, stale_ttl=0):
+        """Return the cached value, calling loader() on a miss
+
+        Within stale_ttl seconds after expiry the old value is returned
+        right away and loader() runs in a background thread. A loader
+        result of None is treated as a failure and never cached; if an
+        expired value is still held it is returned instead (last good value).
+        """
+        entry, served, start_refresh = self._lookup(key)
+        if start_refresh:
+            threading.Thread(target=self._refresh, args=(key, loader, ttl, stale_ttl), daemon=True).start()
+        if served:
+            return entry[0]
+        return self._loaded(key, loader(), entry, ttl, stale_ttl)
+
+    async def aget_or_load(self, key, loader, ttl, stale_ttl=0):
+        """get_or_load for async loaders: loader() returns an awaitable
+
+        Same entries and counters as get_or_load, so sync and async clients
+        can share one cache. Stale values are refreshed in a task on the
+        running loop.
+        """
+        entry, served, start_refresh = self._lookup(key)
+        if start_refresh:
+            task = asyncio.ensure_future(self._arefresh(key, loader, ttl, stale_ttl))
+            self._tasks.add(task)
+            task.add_done_callback(self._tasks.discard)
+        if served:
+            return entry[0]
+        return self._loaded(key, await loader(), entry, ttl, stale_ttl)
+
+    def _refresh(self, key, loader, ttl, stale_ttl):
+        try:
+            value = loader()
+            if value is not None:
+                self.set(key, value, ttl, stale_ttl)
+        finally:
+            with self._lock:
+                self._refreshing.discard(key)
+
+    async def _arefresh(self, key, loader, ttl, stale_ttl):
+        try:
+            value = await loader()
+            if value is not None:
+                self.set(key, value, ttl, stale_ttl)
+        finally:
+            with self._lock:
+                self._refreshing.discard(key)
+
+    def __len__(self):
+        return len(self._entries)
@@ -0,0 +1,270 @@
+# lco_disk_cache.py
+# Persistent HTTP response cache shared by every worker process on a host
+# SQLite in WAL mode; stale entries are revalidated with If-None-Match / If-Modified-Since
+# Standard library only
+
+import hashlib
+import json
+import os
+import sqlite3
+import threading
+import time
+
+from lco_replay import make_headers, normalize_url
+from lco_transport import Response, Transport
+
+
+# Next to the code, not the working directory, so workers started anywhere share one file
+DEFAULT_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'data', 'http_cache.sqlite')
+DEFAULT_MAX_BYTES = 64 * 1024 * 1024
+# Describe the wire encoding, not the stored body
+SKIP_HEADERS = ('connection', 'content-encoding', 'content-length', 'keep-alive', 'transfer-encoding')
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS responses (
+    key TEXT PRIMARY KEY,
+    url TEXT NOT NULL,
+    status INTEGER NOT NULL,
+    reason TEXT,
+    headers TEXT NOT NULL,
+    body BLOB NOT NULL,
+    etag TEXT,
+    last_modified TEXT,
+    fresh_until REAL NOT NULL,
+    accessed_at REAL NOT NULL,
+    size INTEGER NOT NULL
+);
+CREATE INDEX IF NOT EXISTS responses_accessed ON responses (accessed_at);
+"""
+
+
+def cache_control(headers):
+    """{directive: value or True} from a Cache-Control header"""
+    directives = {}
+    for part in (headers.get('Cache-Control') or '').split(','):
+        name, _, value = part.strip().partition('=')
+        if name:
+            directives[name.lower()] = value.strip('"') or True
+    return directives
+
+
+def freshness(headers, default):
+    """Seconds a response may be reused without revalidating, None if it must not be stored"""
+    directives = cache_control(headers)
+    if 'no-store' in directives:
+        return None
+    if 'no-cache' in directives:
+        return 0
+    try:
+        return int(directives['max-age'])
+    except (KeyError, ValueError):
+        return default
+
+
+class DiskCacheTransport(Transport):
+    """Caches GET 200 responses in a SQLite file that any number of processes can share
+
+    A response younger than its max-age (or fresh_for seconds when the
+    server sends none) is served from disk. Older ones are revalidated
+    with their ETag / Last-Modified, so an unchanged resource costs a 304
+    with no body. The Authorization header is part of the key, so tokens
+    never see each other's responses. Total body size is kept under
+    max_bytes by evicting the least recently used entries.
+
+    Writes use BEGIN IMMEDIATE transactions and SQLite's own file locks,
+    so concurrent workers never corrupt or half-write an entry. Any
+    database error degrades to an uncached request.
+    """
+
+    def __init__(self, inner, path=DEFAULT_PATH, max_bytes=DEFAULT_MAX_BYTES, fresh_for=30, timeout=10):
+        self.inner = inner
+        self.path = path
+        self.max_bytes = max_bytes
+        self.fresh_for = fresh_for
+        self.timeout = timeout
+        self._local = threading.local()
+        self._lock = threading.Lock()
+        self.hits = 0         # served from disk
+        self.stale_hits = 0   # revalidated with a 304
+        self.misses = 0       # full body fetched
+        self.evictions = 0
+        if os.path.dirname(path):
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+        self._db().executescript(SCHEMA)
+
+    def _db(self):
+        """This thread's connection; reopened after a fork so workers never share a handle"""
+        conn = getattr(self._local, 'conn', None)
+        if conn is None or self._local.pid != os.getpid():
+            conn = sqlite3.connect(self.path, timeout=self.timeout, isolation_level=None)
+            conn.execute('PRAGMA journal_mode=WAL')
+            conn.execute('PRAGMA synchronous=NORMAL')
+            self._local.conn, self._local.pid = conn, os.getpid()
+        return conn
+
+    def _count(self, name, amount=1):
+        with self._lock:
+            setattr(self, name, getattr(self, name) + amount)
+
+    @staticmethod
+    def key(url, headers=None):
+        auth = (headers or {}).get('Authorization', '')
+        return hashlib.sha256(f'{normalize_url(url)}\n{auth}'.encode()).hexdigest()
+
+    def _lookup(self, key):
+        try:
+            return self._db().execute(
+                'SELECT url, status, reason, headers, body, etag, last_modified, fresh_until'
+                ' FROM responses WHERE key = ?', (key,)).fetchone()
+        except sqlite3.Error:
+            return None
+
+    def _touch(self, key, now):
+        # Skip the write when the entry was used recently, a hot key would otherwise write on every hit
+        try:
+            self._db().execute('UPDATE responses SET accessed_at = ? WHERE key = ? AND accessed_at < ?',
+                               (now, key, now - 10))
+        except sqlite3.Error:
+            pass
+
+    def _store(self, key, url, status, reason, headers, body, ttl, now):
+        if len(body) > self.max_bytes:
+            return
+        header_items = [(k, v) for k, v in headers.items() if k.lower() not in SKIP_HEADERS]
+        db = self._db()
+        try:
+            db.execute('BEGIN IMMEDIATE')
+            try:
+                db.execute('INSERT OR REPLACE INTO responses VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)',
+                           (key, url, status, reason, json.dumps(header_items), body, headers.get('ETag'),
+                            headers.get('Last-Modified'), now + ttl, now, len(body)))
+                evicted = self._evict(db, key)
+                db.execute('COMMIT')
+            except BaseException:
+                db.execute('ROLLBACK')
+                raise
+        except sqlite3.Error:
+            return
+        if evicted:
+            self._count('evictions', evicted)
+
+    def _evict(self, db, keep):
+        """Drop least recently used entries (never keep) until the bodies fit in max_bytes"""
+        total = db.execute('SELECT COALESCE(SUM(size), 0) FROM responses').fetchone()[0]
+        if total <= self.max_bytes:
+            return 0
+        evicted = 0
+        rows = db.execute('SELECT key, size FROM responses WHERE key != ? ORDER BY accessed_at', (keep,)).fetchall()
+        for old, size in rows:
+            if total <= self.max_bytes:
+                break
+            db.execute('DELETE FROM responses WHERE key = ?', (old,))
+            total -= size
+            evicted += 1
+        return evicted
+
+    def _revalidated(self, key, row, response, now):
+        """Refresh a stored entry from a 304 and return it as a full Response"""
+        url, status, reason, stored_headers, body = row[:5]
+        headers = dict(json.loads(stored_headers))
+        headers.update((k, v) for k, v in response.headers.items() if k.lower() not in SKIP_HEADERS)
+        ttl = freshness(headers, self.fresh_for)
+        try:
+            if ttl is None:
+                self._db().execute('DELETE FROM responses WHERE key = ?', (key,))
+            else:
+                self._db().execute(
+                    'UPDATE responses SET headers = ?, etag = ?, last_modified = ?, fresh_until = ?, accessed_at = ?'
+                    ' WHERE key = ?', (json.dumps(list(headers.items())), headers.get('ETag'),
+                                       headers.get('Last-Modified'), now + ttl, now, key))
+        except sqlite3.Error:
+            pass
+        return Response(url, status, reason, make_headers(headers), body)
+
+    def lookup(self, url, headers=None):
+        """(fresh cached Response or None, headers to send, state for store())
+
+        The headers to send carry If-None-Match / If-Modified-Since when a
+        stale entry can be revalidated. Split from request() so other
+        transports (the asyncio one) can share the cache.
+        """
+        key = self.key(url, headers)
+        row = self._lookup(key)
+        now = time.time()
+        if row is not None and now < row[7]:
+            self._touch(key, now)
+            self._count('hits')
+            url, status, reason, stored_headers, body = row[:5]
+            return Response(url, status, reason, make_headers(json.loads(stored_headers)), body), None, None
+
+        send = dict(headers or {})
+        if row is not None:
+            if row[5]:
+                send['If-None-Match'] = row[5]
+            if row[6]:
+                send['If-Modified-Since'] = row[6]
+        return None, send, (key, row)
+
+    def store(self, state, response):
+        """Record the upstream response for a lookup() miss, returns what the caller should see"""
+        key, row = state
+        now = time.time()
+        if response.status == 304 and row is not None:
+            self._count('stale_hits')
+            return self._revalidated(key, row, response, now)
+        self._count('misses')
+        if response.status == 200:
+            ttl = freshness(response.headers, self.fresh_for)
+            if ttl is not None:
+                self._store(key, response.url, response.status, response.reason, response.headers,
+                            response.body, ttl, now)
+        return response
+
+    def request(self, url, headers=None, method='GET'):
+        if method != 'GET':
+            return self.inner.request(url, headers, method)
+        cached, send, state = self.lookup(url, headers)
+        if cached is not None:
+            return cached
+        return self.store(state, self.inner.request(url, send, method))
+
+    def invalidate(self, url=None, headers=None):
+        """Drop one URL's entry, or everything when url is None"""
+        try:
+            if url is None:
+                self._db().execute('DELETE FROM responses')
+            else:
+                self._db().execute('DELETE FROM responses WHERE key = ?', (self.key(url, headers),))
+        except sqlite3.Error:
+            pass
+
+    def stats(self):
+        """{'entries', 'bytes'} currently on disk"""
+        entries, size = self._db().execute('SELECT COUNT(*), COALESCE(SUM(size), 0) FROM responses').fetchone()
+        return {'entries': entries, 'bytes': size}
+
+    def close(self):
+        conn = getattr(self._local, 'conn', None)
+        if conn is not None:
+            conn.close()
+            self._local.conn = None
+        self.inner.close()
+
+
+def disk_cached(inner, path=None, max_bytes=DEFAULT_MAX_BYTES):
+    """Wrap inner in a DiskCacheTransport at path, or return inner unchanged
+
+    Opt-in: path defaults to $SKYWATCH_HTTP_CACHE, and with neither set
+    (or set to 'off') there is no disk cache. 'on' means DEFAULT_PATH. A
+    path that can't be opened also leaves inner unchanged.
+    """
+    path = path or os.getenv('SKYWATCH_HTTP_CACHE')
+    if not path or path.lower() in ('off', '0', 'none'):
+        return inner
+    if path.lower() in ('on', '1'):
+        path = DEFAULT_PATH
+    try:
+        return DiskCacheTransport(inner, path, max_bytes)
+    except (OSError, sqlite3.Error) as e:
+        print(f"⚠️ Shared response cache disabled ({path}): {e}")
+        return inner
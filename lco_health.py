@@ -0,0 +1,64 @@
+# lco_health.py
+# Concurrent endpoint probing for SimpleLCODemo.test_connection
+# Standard library only
+
+import time
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
+from datetime import datetime, timezone
+
+
+def _probe(url, fetch):
+    started = time.perf_counter()
+    try:
+        data = fetch(url)
+        result = {'url': url, 'status': 'ok' if data else 'empty', 'error': None}
+        if isinstance(data, dict) and 'results' in data:
+            result['items'] = len(data.get('results') or [])
+    except Exception as e:
+        result = {'url': url, 'status': 'error', 'error': str(e)}
+    result['latency_ms'] = round((time.perf_counter() - started) * 1000, 1)
+    return result
+
+
+def probe_endpoints(urls, fetch, timeout=10):
+    """Fetch every url at once and stop at the first one that answers
+
+    fetch(url) must return decoded JSON or raise. Endpoints still in
+    flight when a winner is found are abandoned and reported as
+    'cancelled'; their threads finish in the background.
+    """
+    report = {
+        'ok': False,
+        'winner': None,
+        'checked_at': datetime.now(timezone.utc).isoformat(),
+        'endpoints': [],
+    }
+    started = time.perf_counter()
+    pool = ThreadPoolExecutor(max_workers=len(urls), thread_name_prefix='lco-probe')
+    pending = {pool.submit(_probe, url, fetch): url for url in urls}
+    results = {}
+
+    try:
+        while pending and report['winner'] is None:
+            remaining = timeout - (time.perf_counter() - started)
+            if remaining <= 0:
+                break
+            done, _ = wait(pending, timeout=remaining, return_when=FIRST_COMPLETED)
+            for future in done:
+                result = future.result()
+                results[pending.pop(future)] = result
+                if result['status'] == 'ok' and report['winner'] is None:
+                    report['winner'] = result['url']
+    finally:
+        pool.shutdown(wait=False, cancel_futures=True)
+
+    for url in urls:
+        if url in results:
+            report['endpoints'].append(results[url])
+        else:
+            status = 'cancelled' if report['winner'] else 'timeout'
+            report['endpoints'].append({'url': url, 'status': status, 'error': None, 'latency_ms': None})
+
+    report['ok'] = report['winner'] is not None
+    report['elapsed_ms'] = round((time.perf_counter() - started) * 1000, 1)
+    return report
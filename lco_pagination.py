@@ -0,0 +1,51 @@
+# lco_pagination.py
+# Streaming iterators over paginated (Django REST framework) LCO endpoints
+# Standard library only
+
+import urllib.parse
+from concurrent.futures import ThreadPoolExecutor
+
+
+def with_params(url, params):
+    """Append query parameters to url, skipping None values"""
+    params = {k: v for k, v in (params or {}).items() if v is not None}
+    if not params:
+        return url
+    separator = '&' if urllib.parse.urlsplit(url).query else '?'
+    return url + separator + urllib.parse.urlencode(params, doseq=True)
+
+
+def iter_pages(fetch, url, prefetch=True):
+    """Yield each page, following `next` links
+
+    While the caller works through one page the next one is already being
+    fetched in a background thread, so at most two pages are ever held.
+    """
+    pool = ThreadPoolExecutor(max_workers=1, thread_name_prefix='lco-page') if prefetch else None
+    try:
+        page = fetch(url)
+        while page:
+            next_url = page.get('next') if isinstance(page, dict) else None
+            upcoming = pool.submit(fetch, next_url) if pool and next_url else None
+            yield page
+            if upcoming is not None:
+                page = upcoming.result()
+            else:
+                page = fetch(next_url) if next_url else None
+    finally:
+        if pool:
+            pool.shutdown(wait=False, cancel_futures=True)
+
+
+def iter_records(fetch, url, params=None, fields=None, prefetch=True):
+    """Yield every record under `results`, optionally keeping only `fields`
+
+    params are sent to the server as filters. Projection happens as each
+    record is yielded, so full records never pile up.
+    """
+    for page in iter_pages(fetch, with_params(url, params), prefetch):
+        for record in page.get('results') or []:
+            if fields:
+                yield {field: record.get(field) for field in fields}
+            else:
+                yield record
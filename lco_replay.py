@@ -0,0 +1,131 @@
+# lco_replay.py
+# Record/replay transport: saves LCO responses as on-disk cassettes and plays them back
+# Standard library only
+
+import hashlib
+import http.client
+import json
+import os
+import threading
+import time
+import urllib.parse
+
+from lco_transport import Response, Transport, TransportError, get_default_transport
+
+
+MODES = ('record', 'replay', 'auto')
+
+
+def make_headers(items):
+    """Case-insensitive header object like the one http.client returns"""
+    headers = http.client.HTTPMessage()
+    for name, value in dict(items).items():
+        headers[name] = value
+    return headers
+
+
+def normalize_url(url):
+    """Same request -> same key, whatever the query parameter order"""
+    parts = urllib.parse.urlsplit(url)
+    query = urllib.parse.urlencode(sorted(urllib.parse.parse_qsl(parts.query, keep_blank_values=True)))
+    return urllib.parse.urlunsplit((parts.scheme, parts.netloc.lower(), parts.path or '/', query, ''))
+
+
+def cassette_name(url):
+    """Readable, collision-free file name for a URL: host/path__hash.json"""
+    url = normalize_url(url)
+    parts = urllib.parse.urlsplit(url)
+    path = parts.path.strip('/').replace('/', '_') or 'root'
+    digest = hashlib.sha1(url.encode()).hexdigest()[:10]
+    return os.path.join(parts.hostname or 'local', f'{path}__{digest}.json')
+
+
+class CassetteTransport(Transport):
+    """Wraps a transport and records every response to disk, or serves them back
+
+    mode 'record' always hits the network and overwrites cassettes,
+    'replay' never touches the network and raises on a missing cassette,
+    'auto' replays what exists and records the rest. 5xx and 429 responses
+    are passed through but never recorded.
+    """
+
+    def __init__(self, path='cassettes', mode='auto', inner=None):
+        if mode not in MODES:
+            raise ValueError(f"mode must be one of {MODES}")
+        self.path = path
+        self.mode = mode
+        self.inner = inner or get_default_transport()
+        self._lock = threading.Lock()
+
+    def _file(self, url):
+        return os.path.join(self.path, cassette_name(url))
+
+    def load(self, url):
+        """The recorded Response for url, or None"""
+        try:
+            with open(self._file(url), encoding='utf-8') as f:
+                cassette = json.load(f)
+        except FileNotFoundError:
+            return None
+        return response_from_cassette(cassette)
+
+    def save(self, url, response):
+        body = response.body.decode('utf-8', errors='replace')
+        try:
+            body = json.loads(body)
+            encoding = 'json'
+        except ValueError:
+            encoding = 'text'
+        cassette = {
+            'url': normalize_url(url),
+            'status': response.status,
+            'reason': response.reason,
+            'headers': {k: v for k, v in response.headers.items()
+                        if k.lower() not in ('content-encoding', 'content-length', 'transfer-encoding')},
+            'encoding': encoding,
+            'body': body,
+            'recorded_at': time.strftime('%Y-%m-%dT%H:%M:%SZ', time.gmtime()),
+        }
+        path = self._file(url)
+        with self._lock:
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+            tmp = f'{path}.{threading.get_ident()}.tmp'
+            with open(tmp, 'w', encoding='utf-8') as f:
+                json.dump(cassette, f, indent=1)
+            os.replace(tmp, path)
+
+    def request(self, url, headers=None, method='GET'):
+        if self.mode != 'record':
+            response = self.load(url)
+            if response is not None:
+                return response
+            if self.mode == 'replay':
+                raise TransportError(f"No cassette recorded for {url}", url=url)
+
+        response = self.inner.request(url, headers, method)
+        if response.status < 500 and response.status != 429:
+            # Never pin an outage or a rate limit into a cassette; the next run records afresh
+            self.save(url, response)
+        return response
+
+    def close(self):
+        self.inner.close()
+
+
+def response_from_cassette(cassette):
+    body = cassette['body']
+    if cassette.get('encoding', 'json') == 'json':
+        body = json.dumps(body).encode()
+    else:
+        body = body.encode()
+    return Response(cassette['url'], cassette['status'], cassette.get('reason', ''),
+                    make_headers(cassette.get('headers', {})), body)
+
+
+def iter_cassettes(path):
+    """Every cassette dict stored under path"""
+    for root, _, files in os.walk(path):
+        for name in sorted(files):
+            if name.endswith('.json'):
+                with open(os.path.join(root, name), encoding='utf-8') as f:
+                    yield json.load(f)
@@ -0,0 +1,221 @@
+# lco_resilience.py
+# Transport wrappers that keep the client responsive when LCO is slow or down
+# Standard library only. get_default_transport() stacks them as
+#   SingleFlightTransport(CircuitBreakerTransport(RetryTransport(PooledTransport())))
+
+import random
+import threading
+import time
+
+from lco_transport import Transport, TransportError
+from metrics import REGISTRY, endpoint_label
+
+
+RETRY_STATUSES = (429, 502, 503, 504)
+
+COALESCED = REGISTRY.counter(
+    'skywatch_upstream_coalesced_total', 'Requests that joined an identical in-flight call', ['endpoint'])
+RETRIES = REGISTRY.counter(
+    'skywatch_upstream_retries_total', 'Upstream retries after a transient failure', ['endpoint'])
+CIRCUIT_OPENED = REGISTRY.counter(
+    'skywatch_circuit_opened_total', 'Times an endpoint circuit tripped open', ['endpoint'])
+CIRCUIT_REJECTED = REGISTRY.counter(
+    'skywatch_circuit_rejected_total', 'Requests failed fast by an open circuit', ['endpoint'])
+
+
+class CircuitOpenError(TransportError):
+    """Raised without touching the network while an endpoint's circuit is open"""
+
+    category = 'circuit_open'
+
+
+class _Call:
+    def __init__(self):
+        self.done = threading.Event()
+        self.response = None
+        self.error = None
+
+
+class SingleFlightTransport(Transport):
+    """Concurrent identical requests share one in-flight call to the inner transport"""
+
+    def __init__(self, inner):
+        self.inner = inner
+        self._lock = threading.Lock()
+        self._calls = {}
+
+    def request(self, url, headers=None, method='GET'):
+        key = (method, url, tuple(sorted((headers or {}).items())))
+        with self._lock:
+            call = self._calls.get(key)
+            leader = call is None
+            if leader:
+                call = self._calls[key] = _Call()
+
+        if not leader:
+            COALESCED.inc(endpoint=endpoint_label(url))
+            call.done.wait()
+        else:
+            try:
+                call.response = self.inner.request(url, headers, method)
+            except Exception as e:
+                call.error = e
+            finally:
+                with self._lock:
+                    del self._calls[key]
+                call.done.set()
+
+        if call.error is not None:
+            raise call.error
+        return call.response
+
+    def close(self):
+        self.inner.close()
+
+
+class RetryTransport(Transport):
+    """Retries connection errors and 429/502/503/504 with full-jitter exponential backoff
+
+    Timeouts are not retried: a request that already waited read_timeout
+    would only wait again, and the circuit breaker handles a dead host.
+    """
+
+    def __init__(self, inner, retries=2, base_delay=0.2, max_delay=2.0, rng=None):
+        self.inner = inner
+        self.retries = retries
+        self.base_delay = base_delay
+        self.max_delay = max_delay
+        self.rng = rng or random.Random()
+
+    def _delay(self, attempt, response=None):
+        delay = self.rng.uniform(0, min(self.max_delay, self.base_delay * 2 ** attempt))
+        retry_after = response.headers.get('Retry-After') if response is not None else None
+        if retry_after and retry_after.isdigit():
+            delay = max(delay, min(float(retry_after), self.max_delay))
+        return delay
+
+    def request(self, url, headers=None, method='GET'):
+        for attempt in range(self.retries + 1):
+            last_attempt = attempt == self.retries
+            try:
+                response = self.inner.request(url, headers, method)
+            except TimeoutError:
+                raise
+            except (ConnectionError, OSError) as e:
+                if last_attempt or method != 'GET':
+                    raise
+                delay = self._delay(attempt)
+            else:
+                if response.status not in RETRY_STATUSES or last_attempt or method != 'GET':
+                    return response
+                delay = self._delay(attempt, response)
+            RETRIES.inc(endpoint=endpoint_label(url))
+            time.sleep(delay)
+
+    def close(self):
+        self.inner.close()
+
+
+class _Circuit:
+    def __init__(self):
+        self.failures = 0
+        self.opened_at = None
+        self.trial_running = False
+
+
+class CircuitBreakerTransport(Transport):
+    """Per-endpoint breaker: after failure_threshold consecutive failures, fail fast
+
+    After reset_timeout seconds one trial request is let through; success
+    closes the circuit, failure keeps it open for another reset_timeout.
+    Exceptions and 5xx/429 responses count as failures, other 4xx don't.
+    """
+
+    def __init__(self, inner, failure_threshold=5, reset_timeout=30.0):
+        self.inner = inner
+        self.failure_threshold = failure_threshold
+        self.reset_timeout = reset_timeout
+        self._lock = threading.Lock()
+        self._circuits = {}
+
+    def state(self, url):
+        """'closed', 'open' or 'half-open' for the endpoint serving url"""
+        with self._lock:
+            circuit = self._circuits.get(endpoint_label(url))
+            if circuit is None or circuit.opened_at is None:
+                return 'closed'
+            if time.monotonic() - circuit.opened_at >= self.reset_timeout:
+                return 'half-open'
+            return 'open'
+
+    def _admit(self, endpoint):
+        """True when a request may go out; marks it as the half-open trial if needed"""
+        with self._lock:
+            circuit = self._circuits.setdefault(endpoint, _Circuit())
+            if circuit.opened_at is None:
+                return True, False
+            if time.monotonic() - circuit.opened_at < self.reset_timeout or circuit.trial_running:
+                return False, False
+            circuit.trial_running = True
+            return True, True
+
+    def _record(self, endpoint, ok, trial):
+        with self._lock:
+            circuit = self._circuits[endpoint]
+            if trial:
+                circuit.trial_running = False
+            if ok:
+                circuit.failures = 0
+                circuit.opened_at = None
+                return
+            circuit.failures += 1
+            if trial or (circuit.opened_at is None and circuit.failures >= self.failure_threshold):
+                if circuit.opened_at is None:
+                    CIRCUIT_OPENED.inc(endpoint=endpoint)
+                circuit.opened_at = time.monotonic()
+
+    def admit(self, url):
+        """Ticket for a request to url, or CircuitOpenError while its endpoint's circuit is open
+
+        For transports that can't be wrapped (the asyncio one): pass the
+        ticket to record() once the request finishes, so both share state.
+        """
+        endpoint = endpoint_label(url)
+        allowed, trial = self._admit(endpoint)
+        if not allowed:
+            CIRCUIT_REJECTED.inc(endpoint=endpoint)
+            raise CircuitOpenError(f"Circuit open for {endpoint}, failing fast", url=url)
+        return endpoint, trial
+
+    def record(self, ticket, response=None):
+        """Count the outcome of an admitted request: a Response, or None when it raised"""
+        ok = response is not None and response.status < 500 and response.status != 429
+        self._record(ticket[0], ok, ticket[1])
+
+    def request(self, url, headers=None, method='GET'):
+        ticket = self.admit(url)
+        try:
+            response = self.inner.request(url, headers, method)
+        except Exception:
+            self.record(ticket)
+            raise
+        self.record(ticket, response)
+        return response
+
+    def close(self):
+        self.inner.close()
+
+
+def find_breaker(transport):
+    """The CircuitBreakerTransport in a stack of wrappers (following .inner), or None"""
+    while transport is not None:
+        if isinstance(transport, CircuitBreakerTransport):
+            return transport
+        transport = getattr(transport, 'inner', None)
+    return None
+
+
+def resilient(inner, retries=2, failure_threshold=5, reset_timeout=30.0):
+    """Wrap inner in retry, circuit breaker and single-flight, in that order"""
+    return SingleFlightTransport(
+        CircuitBreakerTransport(RetryTransport(inner, retries), failure_threshold, reset_timeout))
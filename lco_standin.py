@@ -0,0 +1,259 @@
+# lco_standin.py
+# Local stand-in for the LCO observe and archive APIs, served from recorded cassettes
+# Run this with: python3 lco_standin.py --seed-demo --latency 40 --error-rate 0.02
+# then point the client at it: SimpleLCODemo(base_url="http://127.0.0.1:8001/api",
+#                                            archive_url="http://127.0.0.1:8001")
+
+import argparse
+import gzip
+import hashlib
+import json
+import random
+import threading
+import time
+import urllib.parse
+from datetime import datetime, timedelta
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+from lco_replay import CassetteTransport, iter_cassettes, normalize_url
+from lco_transport import Transport
+
+
+DEFAULT_PORT = 8001
+# Query parameters that control paging/sorting rather than filter records
+CONTROL_PARAMS = {'limit', 'offset', 'ordering', 'start', 'end', 'format'}
+
+
+class StandInServer(ThreadingHTTPServer):
+    """Serves every recorded endpoint path, re-paginated, with injected latency and errors"""
+
+    daemon_threads = True
+    request_queue_size = 128  # bursts from concurrent clients, the default of 5 drops SYNs
+
+    def __init__(self, address, cassettes='cassettes', latency_ms=0, jitter_ms=0,
+                 error_rate=0.0, error_status=503, page_size=50, max_page_size=1000, seed=None):
+        super().__init__(address, StandInHandler)
+        self.latency_ms = latency_ms
+        self.jitter_ms = jitter_ms
+        self.error_rate = error_rate
+        self.error_status = error_status
+        self.page_size = page_size
+        self.max_page_size = max_page_size
+        self.rng = random.Random(seed)
+        self.rng_lock = threading.Lock()
+        self.records = {}   # path -> list of result records (paginated endpoints)
+        self.payloads = {}  # path -> raw body (everything else)
+        self.load(cassettes)
+
+    def load(self, path):
+        """Merge every recorded page of every endpoint under path"""
+        seen = {}
+        for cassette in iter_cassettes(path):
+            if cassette.get('status', 200) >= 400:
+                continue
+            endpoint = urllib.parse.urlsplit(cassette['url']).path
+            body = cassette['body']
+            if isinstance(body, dict) and 'results' in body:
+                keys = seen.setdefault(endpoint, set())
+                records = self.records.setdefault(endpoint, [])
+                for record in body['results']:
+                    key = record.get('id', json.dumps(record, sort_keys=True))
+                    if key not in keys:
+                        keys.add(key)
+                        records.append(record)
+            else:
+                self.payloads.setdefault(endpoint, body)
+
+    def url(self):
+        host, port = self.server_address[:2]
+        return f"http://{host}:{port}"
+
+    def start(self):
+        """Serve from a daemon thread, handy for tests and benchmarks"""
+        thread = threading.Thread(target=self.serve_forever, daemon=True, name='lco-standin')
+        thread.start()
+        return self
+
+    def delay(self):
+        with self.rng_lock:
+            jitter = self.rng.uniform(0, self.jitter_ms) if self.jitter_ms else 0
+            fail = self.rng.random() < self.error_rate
+        return (self.latency_ms + jitter) / 1000, fail
+
+
+def _matches(record, filters):
+    for key, value in filters.items():
+        if key in record and str(record[key]) != value:
+            return False
+    return True
+
+
+def paginate(records, params, base_url, default_size, max_size):
+    """Filter, sort and slice records the way a DRF LimitOffsetPagination endpoint would"""
+    filters = {k: v for k, v in params.items() if k not in CONTROL_PARAMS}
+    selected = [r for r in records if _matches(r, filters)]
+    if 'start' in params:
+        selected = [r for r in selected if str(r.get('DATE_OBS', '')) >= params['start']]
+    if 'end' in params:
+        selected = [r for r in selected if str(r.get('DATE_OBS', '')) < params['end']]
+    if 'ordering' in params:
+        field = params['ordering'].lstrip('-')
+        selected.sort(key=lambda r: (r.get(field) is None, r.get(field)), reverse=params['ordering'].startswith('-'))
+
+    limit = min(int(params.get('limit', default_size)), max_size)
+    offset = int(params.get('offset', 0))
+
+    def link(new_offset):
+        return base_url + '?' + urllib.parse.urlencode({**params, 'limit': limit, 'offset': new_offset})
+
+    return {
+        'count': len(selected),
+        'next': link(offset + limit) if offset + limit < len(selected) else None,
+        'previous': link(max(offset - limit, 0)) if offset > 0 else None,
+        'results': selected[offset:offset + limit],
+    }
+
+
+class StandInHandler(BaseHTTPRequestHandler):
+    protocol_version = 'HTTP/1.1'
+    # Headers and body go out as separate writes; with Nagle on, every reused
+    # keep-alive connection would stall ~40 ms on delayed ACK
+    disable_nagle_algorithm = True
+
+    def do_GET(self):
+        delay, fail = self.server.delay()
+        if delay:
+            time.sleep(delay)
+        if fail:
+            return self.send_json({'detail': 'Injected failure.'}, self.server.error_status)
+
+        parts = urllib.parse.urlsplit(self.path)
+        params = dict(urllib.parse.parse_qsl(parts.query))
+        path = parts.path if parts.path.endswith('/') else parts.path + '/'
+
+        if path in self.server.records:
+            base_url = f"http://{self.headers.get('Host', 'localhost')}{path}"
+            try:
+                body = paginate(self.server.records[path], params, base_url,
+                                self.server.page_size, self.server.max_page_size)
+            except ValueError:
+                return self.send_json({'detail': 'Invalid limit or offset.'}, 400)
+            return self.send_json(body)
+        if path in self.server.payloads:
+            return self.send_json(self.server.payloads[path])
+        return self.send_json({'detail': 'Not found.'}, 404)
+
+    def send_json(self, body, status=200):
+        data = json.dumps(body).encode()
+        etag = f'"{hashlib.sha1(data).hexdigest()[:16]}"'
+        if status == 200 and etag in self.headers.get('If-None-Match', ''):
+            self.send_response(304)
+            self.send_header('ETag', etag)
+            self.send_header('Content-Length', '0')
+            self.end_headers()
+            return
+        self.send_response(status)
+        self.send_header('Content-Type', 'application/json')
+        if status == 200:
+            self.send_header('ETag', etag)
+        if 'gzip' in self.headers.get('Accept-Encoding', ''):
+            data = gzip.compress(data, compresslevel=1)
+            self.send_header('Content-Encoding', 'gzip')
+        self.send_header('Content-Length', str(len(data)))
+        self.end_headers()
+        self.wfile.write(data)
+
+    def log_message(self, format, *args):
+        pass
+
+
+def write_demo_cassettes(path='cassettes', frames=5000, seed=42):
+    """Record a synthetic network (demo sites, instruments, archive frames) as cassettes"""
+    from LCO_Integration import DEMO_SITES
+
+    rng = random.Random(seed)
+    # Only save() is used, so the recorder needs no network stack behind it
+    recorder = CassetteTransport(path, mode='record', inner=Transport())
+
+    sites = [{'code': s['code'], 'name': s['name'], 'latitude': s['lat'], 'longitude': s['lon'],
+              'elevation': s['elev'], 'timezone': 'UTC'} for s in DEMO_SITES]
+
+    instruments = []
+    for site in DEMO_SITES:
+        for i, kind in enumerate(['1M0-SCICAM-SINISTRO', '0M4-SCICAM-QHY600', '2M0-FLOYDS-SCICAM']):
+            instruments.append({
+                'name': f"{site['code']}-{kind.split('-')[-1].lower()}{i:02d}",
+                'site': site['code'],
+                'telescope': ['1m0a', '0m4a', '2m0a'][i],
+                'state': rng.choice(['AVAILABLE', 'AVAILABLE', 'AVAILABLE', 'SCHEDULABLE', 'MANUAL']),
+                'instrument_type': kind,
+            })
+
+    objects = ['M42', 'M31', 'NGC 253', 'M57', 'SN 2024abc', 'Jupiter', 'M45', 'NGC 1300']
+    start = datetime(2024, 1, 1)
+    archive = []
+    for i in range(frames):
+        inst = rng.choice(instruments)
+        archive.append({
+            'id': 1_000_000 + i,
+            'basename': f"{inst['site']}{inst['telescope']}-{i:08d}-e91",
+            'DATE_OBS': (start + timedelta(minutes=7 * i)).isoformat() + '.000Z',
+            'SITEID': inst['site'],
+            'TELID': inst['telescope'],
+            'INSTRUME': inst['name'],
+            'OBJECT': rng.choice(objects),
+            'FILTER': rng.choice(['rp', 'gp', 'ip', 'V', 'B']),
+            'EXPTIME': rng.choice([10.0, 30.0, 60.0, 120.0, 300.0]),
+            'RLEVEL': 91,
+            'PROPID': rng.choice(['LCO2024A-001', 'LCO2024A-002', 'EDU-SKYWATCH']),
+        })
+
+    payloads = {
+        'https://observe.lco.global/api/sites/': sites,
+        'https://observe.lco.global/api/instruments/': instruments,
+        'https://archive-api.lco.global/frames/': archive,
+    }
+    for url, results in payloads.items():
+        body = json.dumps({'count': len(results), 'next': None, 'previous': None, 'results': results}).encode()
+        recorder.save(normalize_url(url), _DemoResponse(body))
+    return {url: len(results) for url, results in payloads.items()}
+
+
+class _DemoResponse:
+    status = 200
+    reason = 'OK'
+
+    def __init__(self, body):
+        self.body = body
+        self.headers = {'Content-Type': 'application/json'}
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Serve recorded LCO API cassettes locally")
+    parser.add_argument('--cassettes', default='cassettes')
+    parser.add_argument('--host', default='127.0.0.1')
+    parser.add_argument('--port', type=int, default=DEFAULT_PORT)
+    parser.add_argument('--latency', type=float, default=0, help="added latency per request, ms")
+    parser.add_argument('--jitter', type=float, default=0, help="extra uniform random latency, ms")
+    parser.add_argument('--error-rate', type=float, default=0.0, help="fraction of requests that fail")
+    parser.add_argument('--error-status', type=int, default=503)
+    parser.add_argument('--page-size', type=int, default=50)
+    parser.add_argument('--seed-demo', action='store_true', help="write synthetic demo cassettes first")
+    args = parser.parse_args()
+
+    if args.seed_demo:
+        counts = write_demo_cassettes(args.cassettes)
+        print(f"📼 Wrote demo cassettes: {counts}")
+
+    server = StandInServer((args.host, args.port), args.cassettes, args.latency, args.jitter,
+                           args.error_rate, args.error_status, args.page_size)
+    print(f"🛰️  LCO stand-in serving {sorted(server.records) + sorted(server.payloads)}")
+    print(f"   on {server.url()} (latency {args.latency}±{args.jitter} ms, error rate {args.error_rate})")
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+
+
+if __name__ == "__main__":
+    main()
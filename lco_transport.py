@@ -0,0 +1,217 @@
+# lco_transport.py
+# Keep-alive HTTP transport shared by the LCO client copies
+# Standard library only, so simple_lco_demo.py still runs without extra packages
+
+import gzip
+import http.client
+import json
+import threading
+import time
+import urllib.parse
+from collections import deque
+
+from metrics import DECODE_SECONDS, UPSTREAM_ERRORS, UPSTREAM_SECONDS, endpoint_label, error_category
+
+
+REDIRECT_CODES = (301, 302, 303, 307, 308)
+
+
+def redirect_headers(headers, url, target):
+    """Headers to send to a redirect target: credentials stay with the original scheme and host"""
+    old, new = urllib.parse.urlsplit(url), urllib.parse.urlsplit(target)
+    if (old.scheme, old.hostname) == (new.scheme, new.hostname):
+        return headers
+    return {k: v for k, v in headers.items() if k.lower() != 'authorization'}
+
+
+class TransportError(Exception):
+    """Raised when an upstream request fails"""
+
+    def __init__(self, message, status=None, url=None):
+        super().__init__(message)
+        self.status = status
+        self.url = url
+
+
+class Response:
+    """Fully read HTTP response"""
+
+    def __init__(self, url, status, reason, headers, body):
+        self.url = url
+        self.status = status
+        self.reason = reason
+        self.headers = headers
+        self.body = body
+
+    def json(self):
+        # json.loads takes bytes directly, no intermediate str copy
+        return json.loads(self.body) if self.body else None
+
+
+class Transport:
+    """Base for transports: subclasses implement request(), get_json comes for free
+
+    Wrappers (recording, caching, ...) take another transport and delegate
+    to it, so they can be stacked under SimpleLCODemo.make_request.
+    """
+
+    def request(self, url, headers=None, method='GET'):
+        raise NotImplementedError
+
+    def get_json(self, url, headers=None):
+        """GET url and decode the JSON body, timing the two apart and counting failures"""
+        endpoint = endpoint_label(url)
+        started = time.perf_counter()
+        try:
+            response = self.request(url, headers)
+            UPSTREAM_SECONDS.observe(time.perf_counter() - started, endpoint=endpoint)
+            if response.status >= 400:
+                raise TransportError(f"HTTP Error {response.status}: {response.reason}",
+                                     status=response.status, url=url)
+            with DECODE_SECONDS.time(endpoint=endpoint):
+                return response.json()
+        except Exception as e:
+            UPSTREAM_ERRORS.inc(endpoint=endpoint, category=error_category(e))
+            raise
+
+    def close(self):
+        pass
+
+
+class PooledTransport(Transport):
+    """Bounded pool of persistent HTTP/1.1 connections per host"""
+
+    def __init__(self, max_per_host=4, connect_timeout=3.05, read_timeout=10,
+                 user_agent='skywatch-demo', max_redirects=3):
+        self.max_per_host = max_per_host
+        self.connect_timeout = connect_timeout
+        self.read_timeout = read_timeout
+        self.user_agent = user_agent
+        self.max_redirects = max_redirects
+        self._lock = threading.Lock()
+        self._idle = {}   # (scheme, host, port) -> deque of open connections
+        self._slots = {}  # (scheme, host, port) -> semaphore bounding open connections
+
+    def _slot(self, key):
+        with self._lock:
+            if key not in self._slots:
+                self._slots[key] = threading.BoundedSemaphore(self.max_per_host)
+                self._idle[key] = deque()
+            return self._slots[key]
+
+    def _connect(self, key):
+        scheme, host, port = key
+        if scheme == 'https':
+            conn = http.client.HTTPSConnection(host, port, timeout=self.connect_timeout)
+        else:
+            conn = http.client.HTTPConnection(host, port, timeout=self.connect_timeout)
+        conn.connect()
+        # Handshake is bounded by connect_timeout, everything after by read_timeout
+        conn.sock.settimeout(self.read_timeout)
+        return conn
+
+    def _checkout(self, key):
+        """Borrow an idle connection for key, or open a new one"""
+        if not self._slot(key).acquire(timeout=self.connect_timeout + self.read_timeout):
+            raise TransportError(f"Connection pool for {key[1]} exhausted")
+        with self._lock:
+            idle = self._idle[key]
+            if idle:
+                return idle.pop(), True
+        try:
+            return self._connect(key), False
+        except Exception:
+            self._slots[key].release()
+            raise
+
+    def _checkin(self, key, conn):
+        """Return conn to the pool, or drop it if it can't be reused"""
+        if conn is not None:
+            with self._lock:
+                self._idle[key].append(conn)
+        self._slots[key].release()
+
+    def _send(self, key, method, path, headers):
+        conn, reused = self._checkout(key)
+        try:
+            try:
+                conn.request(method, path, headers=headers)
+                response = conn.getresponse()
+            except (http.client.RemoteDisconnected, BrokenPipeError, ConnectionResetError):
+                # Server closed an idle keep-alive socket, retry once on a fresh one
+                if not reused:
+                    raise
+                conn.close()
+                conn = self._connect(key)
+                conn.request(method, path, headers=headers)
+                response = conn.getresponse()
+            body = response.read()
+        except Exception:
+            conn.close()
+            self._checkin(key, None)
+            raise
+
+        if response.will_close:
+            conn.close()
+            conn = None
+        self._checkin(key, conn)
+
+        if response.getheader('Content-Encoding', '').lower() == 'gzip':
+            body = gzip.decompress(body)
+        return response, body
+
+    def request(self, url, headers=None, method='GET'):
+        """Send a request and return the fully read Response"""
+        send_headers = {
+            'Accept': 'application/json',
+            'Accept-Encoding': 'gzip',
+            'Connection': 'keep-alive',
+            'User-Agent': self.user_agent,
+        }
+        send_headers.update(headers or {})
+
+        for _ in range(self.max_redirects + 1):
+            parts = urllib.parse.urlsplit(url)
+            key = (parts.scheme, parts.hostname, parts.port)
+            path = parts.path or '/'
+            if parts.query:
+                path += '?' + parts.query
+
+            response, body = self._send(key, method, path, send_headers)
+            location = response.getheader('Location')
+            if response.status in REDIRECT_CODES and location:
+                target = urllib.parse.urljoin(url, location)
+                send_headers = redirect_headers(send_headers, url, target)
+                url = target
+                continue
+            return Response(url, response.status, response.reason, response.headers, body)
+
+        raise TransportError(f"Too many redirects for {url}", url=url)
+
+    def close(self):
+        """Close every idle connection"""
+        with self._lock:
+            for idle in self._idle.values():
+                while idle:
+                    idle.pop().close()
+
+
+_default_transport = None
+_default_lock = threading.Lock()
+
+
+def get_default_transport():
+    """Process-wide transport so every client instance shares one pool
+
+    The pool is wrapped with retries, per-endpoint circuit breakers and
+    single-flight coalescing (see lco_resilience.py). The on-disk response
+    cache (see lco_disk_cache.py) is only added when SKYWATCH_HTTP_CACHE
+    is set; the Flask app turns it on through its own config.
+    """
+    global _default_transport
+    with _default_lock:
+        if _default_transport is None:
+            from lco_disk_cache import disk_cached
+            from lco_resilience import resilient
+            _default_transport = disk_cached(resilient(PooledTransport()))
+        return _default_transport
@@ -0,0 +1,268 @@
+# metrics.py
+# Counters, latency histograms and a sampling profiler for the hot paths
+# Standard library only; APP.py exposes everything as Prometheus text on /metrics
+
+import http.client
+import os
+import sys
+import threading
+import time
+from bisect import bisect_left
+from collections import Counter as _Tally
+from contextlib import contextmanager
+from functools import wraps
+
+
+# Seconds; upstream calls sit in the 10 ms - 10 s range, scoring and rendering well below
+DEFAULT_BUCKETS = (0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+
+
+def _escape(value):
+    return str(value).replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n')
+
+
+def _format_labels(labels):
+    if not labels:
+        return ''
+    return '{' + ','.join(f'{name}="{_escape(value)}"' for name, value in labels.items()) + '}'
+
+
+def _format_value(value):
+    if value == float('inf'):
+        return '+Inf'
+    return repr(float(value)) if isinstance(value, float) else str(value)
+
+
+class _Metric:
+    kind = 'untyped'
+
+    def __init__(self, name, help, labelnames=()):
+        self.name = name
+        self.help = help
+        self.labelnames = tuple(labelnames)
+        self._lock = threading.Lock()
+
+    def _key(self, labels):
+        return tuple(str(labels[name]) for name in self.labelnames)
+
+    def _labels(self, key):
+        return dict(zip(self.labelnames, key))
+
+
+class Counter(_Metric):
+    """Monotonic count per label set"""
+
+    kind = 'counter'
+
+    def __init__(self, name, help, labelnames=()):
+        super().__init__(name, help, labelnames)
+        self._values = {}
+
+    def inc(self, amount=1, **labels):
+        key = self._key(labels)
+        with self._lock:
+            self._values[key] = self._values.get(key, 0) + amount
+
+    def value(self, **labels):
+        return self._values.get(self._key(labels), 0)
+
+    def samples(self):
+        with self._lock:
+            items = list(self._values.items())
+        for key, value in items:
+            yield self.name, self._labels(key), value
+
+
+class Histogram(_Metric):
+    """Cumulative-bucket latency histogram per label set"""
+
+    kind = 'histogram'
+
+    def __init__(self, name, help, labelnames=(), buckets=DEFAULT_BUCKETS):
+        super().__init__(name, help, labelnames)
+        self.buckets = tuple(sorted(buckets))
+        self._values = {}  # key -> [per-bucket counts..., +Inf count, sum]
+
+    def observe(self, value, **labels):
+        key = self._key(labels)
+        index = bisect_left(self.buckets, value)
+        with self._lock:
+            counts = self._values.get(key)
+            if counts is None:
+                counts = self._values[key] = [0] * (len(self.buckets) + 1) + [0.0]
+            counts[index] += 1
+            counts[-1] += value
+
+    @contextmanager
+    def time(self, **labels):
+        started = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.observe(time.perf_counter() - started, **labels)
+
+    def count(self, **labels):
+        counts = self._values.get(self._key(labels))
+        return sum(counts[:-1]) if counts else 0
+
+    def samples(self):
+        with self._lock:
+            items = [(key, list(counts)) for key, counts in self._values.items()]
+        for key, counts in items:
+            labels = self._labels(key)
+            running = 0
+            for bound, count in zip(self.buckets + (float('inf'),), counts[:-1]):
+                running += count
+                yield f'{self.name}_bucket', {**labels, 'le': _format_value(float(bound))}, running
+            yield f'{self.name}_sum', labels, counts[-1]
+            yield f'{self.name}_count', labels, running
+
+
+class Registry:
+    """Metrics plus caches whose hit counters are read at scrape time"""
+
+    def __init__(self):
+        self._metrics = {}
+        self._caches = {}
+        self._lock = threading.Lock()
+
+    def _add(self, metric):
+        with self._lock:
+            return self._metrics.setdefault(metric.name, metric)
+
+    def counter(self, name, help, labelnames=()):
+        return self._add(Counter(name, help, labelnames))
+
+    def histogram(self, name, help, labelnames=(), buckets=DEFAULT_BUCKETS):
+        return self._add(Histogram(name, help, labelnames, buckets))
+
+    def register_cache(self, name, cache):
+        """Export a TTLCache (hits/stale_hits/misses) or an lru_cache'd function (cache_info())"""
+        self._caches[name] = cache
+
+    def _cache_samples(self):
+        requests, ratios = [], []
+        for name, cache in sorted(self._caches.items()):
+            if hasattr(cache, 'cache_info'):
+                info = cache.cache_info()
+                counts = {'hit': info.hits, 'stale': 0, 'miss': info.misses}
+            else:
+                counts = {'hit': cache.hits, 'stale': cache.stale_hits, 'miss': cache.misses}
+            for result, value in counts.items():
+                requests.append(({'cache': name, 'result': result}, value))
+            total = sum(counts.values())
+            # Misses answered with an expired value because the reload failed
+            if hasattr(cache, 'fallbacks'):
+                requests.append(({'cache': name, 'result': 'fallback'}, cache.fallbacks))
+            ratios.append(({'cache': name}, (counts['hit'] + counts['stale']) / total if total else 0.0))
+        return requests, ratios
+
+    def render(self):
+        """Everything in the Prometheus text exposition format (0.0.4)"""
+        lines = []
+        for metric in list(self._metrics.values()):
+            lines.append(f'# HELP {metric.name} {metric.help}')
+            lines.append(f'# TYPE {metric.name} {metric.kind}')
+            for name, labels, value in metric.samples():
+                lines.append(f'{name}{_format_labels(labels)} {_format_value(value)}')
+
+        requests, ratios = self._cache_samples()
+        if requests:
+            lines.append('# HELP skywatch_cache_requests_total Cache lookups by result')
+            lines.append('# TYPE skywatch_cache_requests_total counter')
+            lines.extend(f'skywatch_cache_requests_total{_format_labels(labels)} {value}' for labels, value in requests)
+            lines.append('# HELP skywatch_cache_hit_ratio Fresh and stale hits over all lookups')
+            lines.append('# TYPE skywatch_cache_hit_ratio gauge')
+            lines.extend(f'skywatch_cache_hit_ratio{_format_labels(labels)} {value:.6f}' for labels, value in ratios)
+        return '\n'.join(lines) + '\n'
+
+
+REGISTRY = Registry()
+
+UPSTREAM_SECONDS = REGISTRY.histogram(
+    'skywatch_upstream_request_seconds', 'Upstream HTTP time, until the body is read', ['endpoint'])
+DECODE_SECONDS = REGISTRY.histogram(
+    'skywatch_json_decode_seconds', 'JSON decode time for upstream bodies', ['endpoint'])
+UPSTREAM_ERRORS = REGISTRY.counter(
+    'skywatch_upstream_errors_total', 'Failed upstream requests by category', ['endpoint', 'category'])
+STAGE_SECONDS = REGISTRY.histogram(
+    'skywatch_stage_seconds', 'Time spent per processing stage', ['stage'])
+HTTP_SECONDS = REGISTRY.histogram(
+    'skywatch_http_request_seconds', 'Flask request time by route and status', ['route', 'status'])
+
+
+def endpoint_label(url):
+    """Low-cardinality label for an upstream URL: host plus path, no query"""
+    parts = url.split('?', 1)[0].split('://', 1)[-1]
+    return parts if parts.endswith('/') else parts + '/'
+
+
+def error_category(exc):
+    """Bucket an upstream failure: timeout, connection, http_4xx, http_5xx, decode or other
+
+    Exceptions can name their own bucket with a `category` attribute.
+    """
+    if getattr(exc, 'category', None):
+        return exc.category
+    status = getattr(exc, 'status', None)
+    if isinstance(status, int):
+        return 'http_5xx' if status >= 500 else 'http_4xx'
+    if isinstance(exc, TimeoutError):
+        return 'timeout'
+    if isinstance(exc, (ConnectionError, http.client.HTTPException, OSError)):
+        return 'connection'
+    if isinstance(exc, ValueError):
+        return 'decode'
+    return 'other'
+
+
+def timed(stage):
+    """Decorator recording the wrapped call under skywatch_stage_seconds{stage=...}"""
+    def decorate(func):
+        @wraps(func)
+        def wrapper(*args, **kwargs):
+            with STAGE_SECONDS.time(stage=stage):
+                return func(*args, **kwargs)
+        return wrapper
+    return decorate
+
+
+class SamplingProfiler:
+    """Samples one thread's Python stack from a helper thread every interval seconds
+
+    Only the target thread is sampled, so work handed to the batch executor
+    shows up as the caller waiting. collapsed() is flamegraph.pl input.
+    """
+
+    def __init__(self, thread_id=None, interval=0.002):
+        self.thread_id = thread_id or threading.get_ident()
+        self.interval = interval
+        self.samples = _Tally()
+        self._stop = threading.Event()
+        self._thread = None
+
+    def start(self):
+        self._thread = threading.Thread(target=self._run, daemon=True, name='skywatch-profiler')
+        self._thread.start()
+        return self
+
+    def stop(self):
+        self._stop.set()
+        if self._thread:
+            self._thread.join()
+        return self
+
+    def _run(self):
+        while not self._stop.wait(self.interval):
+            frame = sys._current_frames().get(self.thread_id)
+            stack = []
+            while frame is not None:
+                code = frame.f_code
+                stack.append(f'{code.co_name} ({os.path.basename(code.co_filename)}:{code.co_firstlineno})')
+                frame = frame.f_back
+            if stack:
+                self.samples[';'.join(reversed(stack))] += 1
+
+    def collapsed(self):
+        """'frame;frame;frame count' lines, most sampled first"""
+        return ''.join(f'{stack} {count}\n' for stack, count in self.samples.most_common())
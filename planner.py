@@ -0,0 +1,301 @@
+# planner.py
+# Season planner: observable windows for every site x night x target, best nights ranked per target
+# (site, night) cells run in a process pool and are cached on disk, so reruns only compute what changed
+# Run this with: python3 planner.py --start 2026-10-01 --nights 30
+#                python3 planner.py --nights 180 --targets Vega,Saturn --target "M42=83.82,-5.39" --top 3
+
+import argparse
+import json
+import os
+import time
+from concurrent.futures import ProcessPoolExecutor
+from datetime import date, datetime, timedelta
+
+import numpy as np
+
+from ephemeris import (CATALOG, PLANETS, airmass, angular_separation, equatorial_altitude, julian_date,
+                       local_sidereal_time, moon_altitude, moon_illumination, moon_radec, planet_radec,
+                       sun_radec, utc_now)
+
+
+DEFAULT_DIR = os.path.join('data', 'planner')
+STEP_MINUTES = 10
+TWILIGHT = {'civil': -6, 'nautical': -12, 'astronomical': -18}
+PLANET_INDEX = {planet['name']: i for i, planet in enumerate(PLANETS)}
+CACHE_VERSION = 1
+
+
+def resolve_targets(names=None, extra=()):
+    """Target dicts ({'name', 'ra', 'dec'} in degrees, or a catalog planet) for names plus extra
+
+    names default to the whole catalog; extra holds custom {'name', 'ra', 'dec'} targets.
+    """
+    by_name = {obj['name'].lower(): obj for obj in CATALOG}
+    targets = []
+    for name in names if names is not None else [obj['name'] for obj in CATALOG]:
+        obj = by_name.get(name.strip().lower())
+        if obj is None:
+            raise ValueError(f"Unknown target {name!r}")
+        if obj['name'] in PLANET_INDEX:
+            targets.append({'name': obj['name'], 'planet': True})
+        else:
+            targets.append({'name': obj['name'], 'ra': obj['ra'], 'dec': obj['dec']})
+    targets.extend({'name': t['name'], 'ra': float(t['ra']), 'dec': float(t['dec'])} for t in extra)
+    return targets
+
+
+def target_key(target):
+    """Cache key for a target: its name, plus its coordinates when fixed"""
+    if target.get('planet'):
+        return target['name']
+    return f"{target['name']}@{target['ra']:.4f},{target['dec']:.4f}"
+
+
+def night_times(lon, night, step_minutes=STEP_MINUTES):
+    """UTC slots from local mean noon on `night` to the next noon, like NightEphemeris"""
+    start = datetime.combine(night, datetime.min.time()) + timedelta(hours=12 - lon / 15)
+    return np.datetime64(start, 'm') + np.arange(24 * 60 // step_minutes) * np.timedelta64(step_minutes, 'm')
+
+
+def _windows(times, mask, step_minutes):
+    """[[start, end], ...] ISO UTC strings for each run of True in mask"""
+    edges = np.flatnonzero(np.diff(np.concatenate([[0], mask.astype(np.int8), [0]])))
+    step = np.timedelta64(step_minutes, 'm')
+    return [[str(times[a]) + 'Z', str(times[b - 1] + step) + 'Z'] for a, b in zip(edges[::2], edges[1::2])]
+
+
+def sky_state(site, times, targets, twilight):
+    """Sun, Moon and target geometry at a site over UTC slots, all targets in one vectorized pass
+
+    Returns per-slot 'dark', 'moon_up' and 'illumination', plus 'altitude'
+    and 'separation' (from the Moon, degrees) of shape (targets, slots).
+    """
+    lat, lon = site['latitude'], site['longitude']
+    jd = julian_date(times)
+    lst = local_sidereal_time(jd, lon)
+
+    sun_alt = equatorial_altitude(*sun_radec(jd), lat, lst)
+    moon_ra, moon_dec = moon_radec(jd)
+
+    ra = np.empty((len(targets), len(times)))
+    dec = np.empty_like(ra)
+    planet_ra, planet_dec = planet_radec(jd) if any(t.get('planet') for t in targets) else (None, None)
+    for i, target in enumerate(targets):
+        if target.get('planet'):
+            ra[i], dec[i] = planet_ra[PLANET_INDEX[target['name']]], planet_dec[PLANET_INDEX[target['name']]]
+        else:
+            ra[i], dec[i] = np.radians(target['ra']), np.radians(target['dec'])
+
+    return {
+        'dark': sun_alt < TWILIGHT[twilight],
+        'moon_up': moon_altitude(jd, lat, lon) > 0,
+        'illumination': moon_illumination(jd),
+        'altitude': equatorial_altitude(ra, dec, lat, lst[None, :]),
+        'separation': angular_separation(ra, dec, moon_ra[None, :], moon_dec[None, :]),
+    }
+
+
+def observe_night(site, night, targets, params):
+    """{target_key: summary} for one site and night, all targets in one vectorized pass
+
+    A slot is observable when the Sun is below the twilight limit, the
+    target is above min_altitude and the Moon is either down or at least
+    min_moon_separation degrees away.
+    """
+    step = params['step_minutes']
+    times = night_times(site['longitude'], night, step)
+    sky = sky_state(site, times, targets, params['twilight'])
+    dark, moon_up, illumination = sky['dark'], sky['moon_up'], sky['illumination']
+    altitude, separation = sky['altitude'], sky['separation']
+    observable = (dark[None, :] & (altitude >= params['min_altitude'])
+                  & (~moon_up[None, :] | (separation >= params['min_moon_separation'])))
+
+    # Quality: observable hours weighted by 1/airmass, less up to half for a bright Moon overhead
+    moon_penalty = 1 - 0.5 * illumination * moon_up
+    weight = np.where(observable, moon_penalty[None, :] / airmass(np.where(observable, altitude, 90)), 0)
+    quality = weight.sum(axis=1) * step / 60
+
+    dark_slots = dark.nonzero()[0]
+    results = {}
+    for i, target in enumerate(targets):
+        slots = observable[i]
+        seen = slots.any()
+        results[target_key(target)] = {
+            'hours': round(float(slots.sum()) * step / 60, 2),
+            'quality': round(float(quality[i]), 3),
+            'max_altitude': round(float(altitude[i][slots].max()), 1) if seen else None,
+            'min_airmass': round(float(airmass(altitude[i][slots].max())), 2) if seen else None,
+            'min_moon_separation': round(float(separation[i][dark_slots].min()), 1) if len(dark_slots) else None,
+            'windows': _windows(times, slots, step),
+        }
+    return {
+        'dark_hours': round(len(dark_slots) * step / 60, 2),
+        'moon_illumination': round(float(illumination[len(times) // 2]), 3),  # at local midnight
+        'targets': results,
+    }
+
+
+def cache_path(cache_dir, site_code, night):
+    return os.path.join(cache_dir, site_code, f'{night:%Y-%m-%d}.json')
+
+
+def _cell_meta(site, params):
+    return {'version': CACHE_VERSION, 'params': params,
+            'site': [round(site['latitude'], 5), round(site['longitude'], 5)]}
+
+
+def load_cell(cache_dir, site, night, params):
+    """Cached results for one (site, night), or {} when missing or computed with other settings"""
+    try:
+        with open(cache_path(cache_dir, site['code'], night)) as f:
+            cell = json.load(f)
+    except (OSError, ValueError):
+        return {}
+    return cell if cell.get('meta') == _cell_meta(site, params) else {}
+
+
+def _plan_cell(cache_dir, site, night, targets, params, cached):
+    """Worker: compute the targets missing from one (site, night) and write the merged cell back"""
+    computed = observe_night(site, night, targets, params)
+    cell = {
+        'meta': _cell_meta(site, params),
+        'dark_hours': computed['dark_hours'],
+        'moon_illumination': computed['moon_illumination'],
+        'targets': {**cached.get('targets', {}), **computed['targets']},
+    }
+    path = cache_path(cache_dir, site['code'], night)
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    tmp = f'{path}.{os.getpid()}.tmp'
+    with open(tmp, 'w') as f:
+        json.dump(cell, f, separators=(',', ':'))
+    os.replace(tmp, path)
+    return cell
+
+
+def plan_season(sites, start, nights, targets=None, min_altitude=30, min_moon_separation=30,
+                twilight='astronomical', step_minutes=STEP_MINUTES, top=5, cache_dir=DEFAULT_DIR, workers=None):
+    """Best nights per target across sites x nights
+
+    sites are dicts/records with code, name, latitude, longitude; targets
+    come from resolve_targets() (default: the whole catalog). Returns
+    {'targets': {name: [best nights, highest quality first]}, 'stats': {...}}.
+    """
+    if twilight not in TWILIGHT:
+        raise ValueError(f"twilight must be one of {', '.join(TWILIGHT)}")
+    targets = resolve_targets() if targets is None else targets
+    sites = [{'code': s['code'], 'name': s.get('name'), 'latitude': float(s['latitude']),
+              'longitude': float(s['longitude'])} for s in sites if s.get('latitude') is not None]
+    params = {'min_altitude': min_altitude, 'min_moon_separation': min_moon_separation,
+              'twilight': twilight, 'step_minutes': step_minutes}
+    dates = [start + timedelta(days=i) for i in range(nights)]
+
+    # Only (site, night) cells with missing targets go to the pool, and only with those targets
+    cells, tasks = {}, []
+    for site in sites:
+        for night in dates:
+            cached = load_cell(cache_dir, site, night, params)
+            missing = [t for t in targets if target_key(t) not in cached.get('targets', {})]
+            if missing:
+                tasks.append((cache_dir, site, night, missing, params, cached))
+            else:
+                cells[site['code'], night] = cached
+
+    if len(tasks) > 1 and workers != 1:
+        with ProcessPoolExecutor(max_workers=workers) as pool:
+            computed = pool.map(_plan_cell, *zip(*tasks), chunksize=max(1, len(tasks) // 64))
+            for task, cell in zip(tasks, computed):
+                cells[task[1]['code'], task[2]] = cell
+    else:
+        for task in tasks:
+            cells[task[1]['code'], task[2]] = _plan_cell(*task)
+
+    ranked = {}
+    for target in targets:
+        key = target_key(target)
+        options = []
+        for site in sites:
+            for night in dates:
+                cell = cells[site['code'], night]
+                result = cell['targets'][key]
+                if result['hours'] > 0:
+                    options.append({'site': site['code'], 'site_name': site['name'], 'night': night.isoformat(),
+                                    'moon_illumination': cell['moon_illumination'], **result})
+        options.sort(key=lambda option: (-option['quality'], option['night'], option['site']))
+        ranked[target['name']] = options[:top]
+
+    return {
+        'start': start.isoformat(),
+        'nights': nights,
+        'params': params,
+        'targets': ranked,
+        'stats': {'cells': len(sites) * len(dates), 'computed': len(tasks),
+                  'cached': len(sites) * len(dates) - len(tasks)},
+    }
+
+
+def _custom_target(text):
+    """'NAME=RA,DEC' in degrees"""
+    try:
+        name, coords = text.split('=', 1)
+        ra, dec = (float(v) for v in coords.split(','))
+    except ValueError:
+        raise argparse.ArgumentTypeError(f"expected NAME=RA,DEC, got {text!r}")
+    return {'name': name.strip(), 'ra': ra, 'dec': dec}
+
+
+def main():
+    from LCO_Integration import DEMO_SITE_RECORDS, SimpleLCODemo
+
+    parser = argparse.ArgumentParser(description="Rank the best nights per target across LCO sites")
+    parser.add_argument('--start', type=date.fromisoformat, help="first night, default today (UTC)")
+    parser.add_argument('--nights', type=int, default=30)
+    parser.add_argument('--sites', help="comma-separated site codes, default all")
+    parser.add_argument('--targets', help="comma-separated catalog names, default the whole catalog")
+    parser.add_argument('--target', action='append', type=_custom_target, default=[],
+                        metavar='NAME=RA,DEC', help="extra fixed target, degrees (repeatable)")
+    parser.add_argument('--min-altitude', type=float, default=30)
+    parser.add_argument('--min-moon-separation', type=float, default=30)
+    parser.add_argument('--twilight', choices=list(TWILIGHT), default='astronomical')
+    parser.add_argument('--top', type=int, default=5)
+    parser.add_argument('--workers', type=int, help="processes, default one per core")
+    parser.add_argument('--dir', default=DEFAULT_DIR)
+    parser.add_argument('--live', action='store_true', help="use the live LCO site list instead of the demo sites")
+    parser.add_argument('--json', action='store_true', help="print the full plan as JSON")
+    args = parser.parse_args()
+
+    sites = SimpleLCODemo().get_site_index()[0].sites if args.live else list(DEMO_SITE_RECORDS)
+    if args.sites:
+        wanted = {code.strip() for code in args.sites.split(',')}
+        sites = [site for site in sites if site['code'] in wanted]
+    names = args.targets.split(',') if args.targets else (None if not args.target else [])
+    try:
+        targets = resolve_targets(names, args.target)
+    except ValueError as e:
+        parser.error(str(e))
+
+    started = time.perf_counter()
+    plan = plan_season(sites, args.start or utc_now().date(), args.nights, targets,
+                       args.min_altitude, args.min_moon_separation, args.twilight,
+                       top=args.top, cache_dir=args.dir, workers=args.workers)
+    elapsed = time.perf_counter() - started
+
+    if args.json:
+        print(json.dumps(plan, indent=2))
+        return
+
+    stats = plan['stats']
+    print(f"🔭 Season plan: {len(sites)} sites x {args.nights} nights x {len(targets)} targets")
+    print(f"   {stats['computed']} cells computed, {stats['cached']} from cache, {elapsed:.1f}s")
+    for name, options in plan['targets'].items():
+        print(f"\n⭐ {name}")
+        if not options:
+            print("   No observable nights")
+        for option in options:
+            window = option['windows'][0] if option['windows'] else ['', '']
+            print(f"   {option['night']} {option['site']}: {option['hours']:.1f}h, "
+                  f"max alt {option['max_altitude']}°, moon {option['moon_illumination']:.0%}, "
+                  f"from {window[0][11:16]} UTC (quality {option['quality']:.2f})")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,257 @@
+# records.py
+# Columnar tables for site and instrument lists: a numpy structured array per table,
+# string columns stored as codes into interned, process-wide vocabularies
+
+import json
+import threading
+import uuid
+from collections.abc import Mapping
+from itertools import islice
+
+import numpy as np
+
+
+CHUNK_ROWS = 8192
+
+class StringPool:
+    """Interns strings to int32 codes; code -1 is None. Codes never change once handed out"""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._codes = {}
+        self.values = []
+        self._encoded = np.array(['null'], dtype=object)  # JSON text per code, last slot for -1
+
+    def code(self, value):
+        if value is None:
+            return -1
+        value = str(value)
+        code = self._codes.get(value)
+        if code is None:
+            with self._lock:
+                code = self._codes.get(value)
+                if code is None:
+                    code = self._codes[value] = len(self.values)
+                    self.values.append(value)
+        return code
+
+    def codes(self, values):
+        """int32 codes for a list of values, interning each distinct value once"""
+        local = {value: self.code(value) for value in set(values)}
+        return np.fromiter(map(local.__getitem__, values), dtype=np.int32, count=len(values))
+
+    def lookup(self, value):
+        """Existing code for value, -2 if it was never interned (matches nothing)"""
+        return -1 if value is None else self._codes.get(str(value), -2)
+
+    def value(self, code):
+        return None if code < 0 else self.values[code]
+
+    def encoded(self):
+        """Object array mapping code -> JSON literal, index -1 -> null"""
+        if len(self._encoded) != len(self.values) + 1:
+            values = list(self.values)
+            self._encoded = np.array([json.dumps(v) for v in values] + ['null'], dtype=object)
+        return self._encoded
+
+
+class Record(Mapping):
+    """One row as a typed __slots__ object; reads like a read-only dict (r['code'], r.get, {**r})"""
+
+    __slots__ = ()
+    FIELDS = ()
+
+    def __init__(self, *values):
+        for field, value in zip(self.FIELDS, values):
+            object.__setattr__(self, field, value)
+
+    def __getitem__(self, key):
+        if key not in self.FIELDS:
+            raise KeyError(key)
+        return getattr(self, key)
+
+    def __iter__(self):
+        return iter(self.FIELDS)
+
+    def __len__(self):
+        return len(self.FIELDS)
+
+    def __repr__(self):
+        return f"{type(self).__name__}({', '.join(f'{f}={getattr(self, f)!r}' for f in self.FIELDS)})"
+
+    def to_json(self):
+        return json.dumps({field: getattr(self, field) for field in sorted(self.FIELDS)}, separators=(',', ':'))
+
+
+class SiteRecord(Record):
+    __slots__ = ('code', 'name', 'latitude', 'longitude', 'elevation', 'timezone')
+    FIELDS = __slots__
+
+
+class InstrumentRecord(Record):
+    __slots__ = ('name', 'site', 'telescope', 'state', 'type')
+    FIELDS = __slots__
+
+
+class Table:
+    """Immutable columnar table; subclasses declare COLUMNS as (column, api field, kind)
+
+    kind 'code' columns are int32 codes into the class's StringPools,
+    'float' columns are float64 with NaN for missing values.
+    """
+
+    COLUMNS = ()
+    RECORD = Record
+    _pools = None
+
+    def __init_subclass__(cls, **kwargs):
+        super().__init_subclass__(**kwargs)
+        cls._pools = {column: StringPool() for column, _, kind in cls.COLUMNS if kind == 'code'}
+        cls.DTYPE = np.dtype([(column, np.int32 if kind == 'code' else np.float64)
+                              for column, _, kind in cls.COLUMNS])
+
+    def __init__(self, data=None):
+        self.data = data if data is not None else np.empty(0, dtype=self.DTYPE)
+
+    @classmethod
+    def from_records(cls, items):
+        """Build from API result dicts (any iterable, consumed once)
+
+        Items are taken in chunks and each column of a chunk is encoded in
+        bulk, so only one chunk of source dicts is held at a time.
+        """
+        items = iter(items)
+        chunks = []
+        while True:
+            chunk = list(islice(items, CHUNK_ROWS))
+            if not chunk:
+                break
+            data = np.empty(len(chunk), dtype=cls.DTYPE)
+            for column, field, kind in cls.COLUMNS:
+                values = [item.get(field) for item in chunk]
+                if kind == 'code':
+                    data[column] = cls._pools[column].codes(values)
+                else:
+                    data[column] = np.array(values, dtype=np.float64)  # None -> NaN
+            chunks.append(data)
+        return cls(np.concatenate(chunks) if chunks else None)
+
+    def __len__(self):
+        return len(self.data)
+
+    def _record(self, row):
+        values = []
+        for column, _, kind in self.COLUMNS:
+            value = row[column]
+            if kind == 'code':
+                values.append(self._pools[column].value(int(value)))
+            else:
+                values.append(None if np.isnan(value) else float(value))
+        return self.RECORD(*values)
+
+    def __getitem__(self, index):
+        if isinstance(index, slice):
+            return type(self)(self.data[index])
+        return self._record(self.data[index])
+
+    def __iter__(self):
+        for row in self.data:
+            yield self._record(row)
+
+    def __eq__(self, other):
+        return isinstance(other, Table) and type(self) is type(other) and np.array_equal(self.data, other.data)
+
+    def column(self, column):
+        """Decoded values of one column as a numpy array"""
+        values = self.data[column]
+        if column in self._pools:
+            return np.array(self._pools[column].values + [None], dtype=object)[values]
+        return values
+
+    def filter(self, **equals):
+        """Rows where every column equals the value (or is in the list/tuple/set), vectorized"""
+        mask = np.ones(len(self.data), dtype=bool)
+        for column, wanted in equals.items():
+            values = self.data[column]
+            if isinstance(wanted, (list, tuple, set)):
+                pool = self._pools.get(column)
+                codes = [pool.lookup(w) for w in wanted] if pool else list(wanted)
+                mask &= np.isin(values, codes)
+            else:
+                mask &= values == (self._pools[column].lookup(wanted) if column in self._pools else wanted)
+        return type(self)(self.data[mask])
+
+    def count_by(self, column):
+        """{value: rows} for a code column, via one bincount"""
+        codes = self.data[column]
+        counts = np.bincount(codes + 1)  # shift so None (-1) lands in bin 0
+        pool = self._pools[column]
+        return {pool.value(code - 1): int(n) for code, n in enumerate(counts) if n}
+
+    def index(self, column):
+        """{value: record} keyed on a code column"""
+        return {record[column]: record for record in self}
+
+    def to_json(self):
+        """JSON array of objects, written column by column straight from the arrays"""
+        if not len(self.data):
+            return '[]'
+        parts = []
+        for column, _, kind in sorted(self.COLUMNS):
+            values = self.data[column]
+            if kind == 'code':
+                parts.append(self._pools[column].encoded()[values])
+            else:
+                text = values.astype(str).astype(object)
+                text[np.isnan(values)] = 'null'
+                parts.append(text)
+        template = '{' + ','.join(f'"{column}":%s' for column, _, _ in sorted(self.COLUMNS)) + '}'
+        return '[' + ','.join(template % row for row in zip(*parts)) + ']'
+
+
+class SiteTable(Table):
+    RECORD = SiteRecord
+    COLUMNS = (
+        ('code', 'code', 'code'),
+        ('name', 'name', 'code'),
+        ('latitude', 'latitude', 'float'),
+        ('longitude', 'longitude', 'float'),
+        ('elevation', 'elevation', 'float'),
+        ('timezone', 'timezone', 'code'),
+    )
+
+
+class InstrumentTable(Table):
+    RECORD = InstrumentRecord
+    COLUMNS = (
+        ('name', 'name', 'code'),
+        ('site', 'site', 'code'),
+        ('telescope', 'telescope', 'code'),
+        ('state', 'state', 'code'),
+        ('type', 'instrument_type', 'code'),
+    )
+
+
+def dumps(obj, dumps=json.dumps, **kwargs):
+    """json.dumps that writes any Table or Record inside obj with its own to_json()
+
+    Tables are swapped for placeholder strings, the rest is encoded as
+    usual, then the placeholders are replaced by the tables' JSON text.
+    """
+    fragments = {}
+    token = uuid.uuid4().hex
+    fallback = kwargs.pop('default', None)
+
+    def default(o):
+        if isinstance(o, (Table, Record)):
+            key = f'@@{token}:{len(fragments)}@@'
+            fragments[key] = o.to_json()
+            return key
+        if fallback is not None:
+            return fallback(o)
+        raise TypeError(f"Object of type {type(o).__name__} is not JSON serializable")
+
+    text = dumps(obj, default=default, **kwargs)
+    for key, fragment in fragments.items():
+        text = text.replace(f'"{key}"', fragment, 1)
+    return text
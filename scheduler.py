@@ -0,0 +1,578 @@
+# scheduler.py
+# Telescope-time scheduler: assigns a queue of observation requests to instruments across sites and slots
+# Greedy placement by priority over vectorized visibility windows, then a local search that ejects and
+# re-places lower-value observations; reschedules incrementally when an instrument changes state
+# Run this with: python3 scheduler.py                      (synthetic queue on the demo network, tonight)
+#                python3 scheduler.py --queue queue.json --live
+#                python3 scheduler.py --bench              (synthetic queues up to 5000 requests, timed)
+
+import argparse
+import json
+import random
+import time
+from collections import defaultdict
+from datetime import date, datetime, timedelta, timezone
+
+import numpy as np
+
+from ephemeris import airmass, utc_now
+from planner import TWILIGHT, night_times, resolve_targets, sky_state, target_key
+
+
+STEP_MINUTES = 5
+DEFAULT_MIN_ALTITUDE = 30
+SCHEDULABLE_STATES = frozenset({'AVAILABLE', 'SCHEDULABLE'})
+CHUNK_REQUESTS = 2048    # requests per vectorized visibility pass, bounds temporary memory
+EJECT_CANDIDATES = 4     # cheapest placements tried per request during local search
+EMPTY = np.empty(0, dtype=np.intp)
+
+
+def _minutes(when):
+    """Minutes since the Unix epoch for a UTC datetime (naive or aware) or ISO string"""
+    if isinstance(when, str):
+        when = datetime.fromisoformat(when.replace('Z', '+00:00'))
+    if when.tzinfo is not None:
+        when = when.astimezone(timezone.utc).replace(tzinfo=None)
+    return int(np.datetime64(when, 'm').astype(np.int64))
+
+
+def normalize_requests(items):
+    """Validated request dicts from user input
+
+    Each item needs 'target' (a catalog name or {'name', 'ra', 'dec'} in
+    degrees) and 'duration' in minutes. Optional: 'id', 'priority' (higher
+    wins, default 1), 'instrument_type', 'sites' (a site code or a list of
+    allowed codes), 'min_altitude' (degrees) and 'window' ([start, end] UTC).
+    """
+    items = list(items)
+    names = {item['target'].strip() for item in items if isinstance(item.get('target'), str)}
+    catalog = {t['name'].lower(): t for t in resolve_targets(sorted(names))}
+
+    requests, seen = [], set()
+    for i, item in enumerate(items):
+        request_id = str(item.get('id', i))
+        if request_id in seen:
+            raise ValueError(f"Duplicate request id {request_id!r}")
+        seen.add(request_id)
+        target = item.get('target')
+        if isinstance(target, str):
+            target = catalog[target.strip().lower()]
+        elif isinstance(target, dict):
+            target = {'name': str(target.get('name', request_id)), 'ra': float(target['ra']),
+                      'dec': float(target['dec'])}
+        else:
+            raise ValueError(f"Request {request_id!r} needs a target")
+        duration = float(item.get('duration', 0))
+        min_altitude = float(item.get('min_altitude', DEFAULT_MIN_ALTITUDE))
+        if duration <= 0:
+            raise ValueError(f"Request {request_id!r} needs a positive duration in minutes")
+        if not 0 < min_altitude < 90:
+            raise ValueError(f"Request {request_id!r}: min_altitude must be between 0 and 90 degrees")
+        sites = item.get('sites')
+        if isinstance(sites, str):
+            sites = [sites]
+        elif sites is not None and not isinstance(sites, (list, tuple, set)):
+            raise ValueError(f"Request {request_id!r}: sites must be a site code or a list of them")
+        window = item.get('window')
+        requests.append({
+            'id': request_id,
+            'target': target,
+            'duration': duration,
+            'priority': float(item.get('priority', 1)),
+            'instrument_type': item.get('instrument_type'),
+            'sites': set(sites) if sites else None,
+            'min_altitude': min_altitude,
+            'window': (_minutes(window[0]), _minutes(window[1])) if window else None,
+        })
+    return requests
+
+
+class Scheduler:
+    """Assigns observation requests to instruments across sites and time slots
+
+    Every site's timeline runs from local noon on `night` for `nights` days
+    in step_minutes slots. A request fits where its target is up (above its
+    min_altitude, in the dark, clear of the Moon) for its whole duration on
+    a telescope with a schedulable instrument of its type. One observation
+    at a time per telescope, even when it carries several instruments.
+
+    run() places requests greedily, highest priority and most constrained
+    first, each at its best-airmass free start. A local search then inserts
+    what is left by ejecting lower-value observations and re-placing them
+    elsewhere, keeping a move only when total value (priority x hours)
+    grows. update() / apply_status() reschedule incrementally: only work on
+    instruments that went down is displaced, and only it and the
+    unscheduled queue are placed again.
+    """
+
+    def __init__(self, sites, instruments, requests, night=None, nights=1, min_moon_separation=30,
+                 twilight='astronomical', step_minutes=STEP_MINUTES, time_limit=2.0):
+        if twilight not in TWILIGHT:
+            raise ValueError(f"twilight must be one of {', '.join(TWILIGHT)}")
+        started = time.perf_counter()
+        self.night = night or utc_now().date()
+        self.nights = nights
+        self.min_moon_separation = min_moon_separation
+        self.twilight = twilight
+        self.step = step_minutes
+        self.time_limit = time_limit
+        self.timings = {}
+
+        # Telescopes are (site, telescope) pairs; instruments on one share it
+        coordinates = {s['code']: s for s in sites if s.get('latitude') is not None}
+        self.sites, site_index, telescopes = [], {}, {}
+        self.instruments, self.telescope_instruments, telescope_site = {}, [], []
+        for inst in instruments:
+            site = coordinates.get(inst.get('site'))
+            if site is None:
+                continue
+            if site['code'] not in site_index:
+                site_index[site['code']] = len(self.sites)
+                self.sites.append({'code': site['code'], 'latitude': float(site['latitude']),
+                                   'longitude': float(site['longitude'])})
+            key = (site['code'], inst.get('telescope') or inst['name'])
+            if key not in telescopes:
+                telescopes[key] = len(telescope_site)
+                telescope_site.append(site_index[site['code']])
+                self.telescope_instruments.append([])
+            k = telescopes[key]
+            self.instruments[inst['name']] = {'name': inst['name'], 'site': site['code'], 'telescope': key[1],
+                                              'type': inst.get('type') or inst.get('instrument_type'),
+                                              'state': inst.get('state'), 'k': k}
+            self.telescope_instruments[k].append(inst['name'])
+        self.telescopes = list(telescopes)
+        self.telescope_site = np.array(telescope_site, dtype=np.intp)
+
+        self.n_slots = nights * (24 * 60 // step_minutes)
+        self.times = np.array([
+            np.concatenate([night_times(site['longitude'], self.night + timedelta(days=i), step_minutes)
+                            for i in range(nights)]) for site in self.sites
+        ], dtype='datetime64[m]').reshape(len(self.sites), self.n_slots)
+        self._starts = np.arange(self.n_slots)
+
+        self.requests = normalize_requests(requests)
+        self.slots = np.array([int(np.ceil(q['duration'] / step_minutes)) for q in self.requests], dtype=np.intp)
+        self.priority = np.array([q['priority'] for q in self.requests])
+        self.value = self.priority * self.slots * step_minutes / 60
+        self._density = np.append(self.value / np.maximum(self.slots, 1), 0)  # index -1 is a free slot
+
+        self.quality = self._visibility()
+        self.site_ok = self.quality.any(axis=2)
+        self.options = (self.quality > 0).sum(axis=(1, 2))
+        self.timings['visibility'] = time.perf_counter() - started
+
+        self.owner = np.full((len(self.telescopes), self.n_slots), -1, dtype=np.int32)
+        # Running sums along each telescope's slots: occupied slots, and value in the way (for ejections)
+        self._occupied = np.zeros((len(self.telescopes), self.n_slots + 1), dtype=np.int32)
+        self._blocked = np.zeros((len(self.telescopes), self.n_slots + 1))
+        self.assignments = {}   # request index -> (telescope index, start slot, instrument name)
+        self._not_before = np.zeros(len(self.telescopes), dtype=np.intp)
+        self._index_instruments()
+
+    def _visibility(self):
+        """quality[r, site, start]: mean slot quality of request r starting there, 0 where it can't run
+
+        Slot quality is 1/airmass less up to half for a bright Moon above
+        the horizon, like the season planner.
+        """
+        targets, target_index, keys = [], [], {}
+        for request in self.requests:
+            key = target_key(request['target'])
+            if key not in keys:
+                keys[key] = len(targets)
+                targets.append(request['target'])
+            target_index.append(keys[key])
+        target_index = np.array(target_index, dtype=np.intp)
+        min_altitude = np.array([q['min_altitude'] for q in self.requests])
+        window_start = np.array([q['window'][0] if q['window'] else -np.inf for q in self.requests])
+        window_end = np.array([q['window'][1] if q['window'] else np.inf for q in self.requests])
+
+        n, n_slots = len(self.requests), self.n_slots
+        quality = np.zeros((n, len(self.sites), n_slots), dtype=np.float32)
+        if not n:
+            return quality
+        for i, site in enumerate(self.sites):
+            # Target geometry only where it is dark, well under half of each day
+            dark = np.flatnonzero(sky_state(site, self.times[i], [], self.twilight)['dark'])
+            sky = sky_state(site, self.times[i][dark], targets, self.twilight)
+            clear = ~sky['moon_up'][None, :] | (sky['separation'] >= self.min_moon_separation)
+            up = clear & (sky['altitude'] > 0)
+            moon_penalty = 1 - 0.5 * sky['illumination'] * sky['moon_up']
+            altitude = np.full((len(targets), n_slots), -90.0)
+            weight = np.zeros((len(targets), n_slots))
+            altitude[:, dark] = sky['altitude']
+            weight[:, dark] = np.where(up, moon_penalty[None, :] / airmass(np.where(up, sky['altitude'], 90)), 0)
+            slot_minutes = self.times[i].astype(np.int64)
+
+            for lo in range(0, n, CHUNK_REQUESTS):
+                chunk = slice(lo, lo + CHUNK_REQUESTS)
+                t, d = target_index[chunk], self.slots[chunk]
+                visible = (weight[t] > 0) & (altitude[t] >= min_altitude[chunk, None])
+                # Window sums over every start at once, from cumulative sums along the slots
+                cum_visible = np.zeros((len(t), n_slots + 1), dtype=np.int32)
+                cum_weight = np.zeros((len(t), n_slots + 1))
+                np.cumsum(visible, axis=1, out=cum_visible[:, 1:])
+                np.cumsum(np.where(visible, weight[t], 0), axis=1, out=cum_weight[:, 1:])
+                end = np.minimum(self._starts[None, :] + d[:, None], n_slots)
+                fits = ((np.take_along_axis(cum_visible, end, 1) - cum_visible[:, :-1] == d[:, None])
+                        & (self._starts[None, :] + d[:, None] <= n_slots)
+                        & (slot_minutes[None, :] >= window_start[chunk, None])
+                        & (slot_minutes[None, :] + d[:, None] * self.step <= window_end[chunk, None]))
+                allowed = np.array([q['sites'] is None or site['code'] in q['sites']
+                                    for q in self.requests[chunk]])
+                mean = (np.take_along_axis(cum_weight, end, 1) - cum_weight[:, :-1]) / d[:, None]
+                quality[chunk, i] = np.where(fits & allowed[:, None], mean, 0)
+        return quality
+
+    def _index_instruments(self):
+        """Telescopes with a schedulable instrument, per instrument type (None: any type)"""
+        by_type = defaultdict(set)
+        for inst in self.instruments.values():
+            if inst['state'] in SCHEDULABLE_STATES:
+                by_type[inst['type']].add(inst['k'])
+                by_type[None].add(inst['k'])
+        self._by_type = {kind: np.array(sorted(ks), dtype=np.intp) for kind, ks in by_type.items()}
+
+    def _candidates(self, r):
+        ks = self._by_type.get(self.requests[r]['instrument_type'], EMPTY)
+        return ks[self.site_ok[r, self.telescope_site[ks]]]
+
+    def _instrument(self, r, k):
+        """First schedulable instrument on telescope k that can take request r"""
+        kind = self.requests[r]['instrument_type']
+        for name in self.telescope_instruments[k]:
+            inst = self.instruments[name]
+            if inst['state'] in SCHEDULABLE_STATES and kind in (None, inst['type']):
+                return name
+        return None
+
+    def _open(self, ks, r):
+        """Quality of request r at every start on telescopes ks, 0 where it is taken or already past"""
+        quality = self.quality[r, self.telescope_site[ks]]
+        return np.where(self._starts[None, :] >= self._not_before[ks, None], quality, 0)
+
+    def _best_slot(self, r):
+        """(telescope, start) with the best quality where request r fits on free slots, or None"""
+        ks = self._candidates(r)
+        if not len(ks):
+            return None
+        occupied = self._occupied[ks]
+        end = np.minimum(self._starts + self.slots[r], self.n_slots)
+        quality = np.where(occupied[:, end] == occupied[:, :-1], self._open(ks, r), 0)
+        best = int(np.argmax(quality))
+        i, start = divmod(best, self.n_slots)
+        return (int(ks[i]), start) if quality[i, start] > 0 else None
+
+    def _refresh(self, k):
+        np.cumsum(self.owner[k] >= 0, out=self._occupied[k, 1:])
+        np.cumsum(self._density[self.owner[k]], out=self._blocked[k, 1:])
+
+    def _place(self, r, k, start, instrument=None):
+        self.owner[k, start:start + self.slots[r]] = r
+        self._refresh(k)
+        self.assignments[r] = (k, start, instrument or self._instrument(r, k))
+
+    def _unplace(self, r):
+        k, start, _ = self.assignments.pop(r)
+        self.owner[k, start:start + self.slots[r]] = -1
+        self._refresh(k)
+
+    def _greedy(self, pending):
+        """Place pending requests in order: priority, then fewest options, then longest"""
+        for r in sorted(pending, key=lambda r: (-self.priority[r], self.options[r], -self.slots[r])):
+            if r not in self.assignments:
+                slot = self._best_slot(r)
+                if slot is not None:
+                    self._place(r, *slot)
+
+    def _eject_insert(self, u, k, start):
+        """Place u at (k, start), re-placing what it displaces; the lost requests, or None if not worth it"""
+        blockers = [int(b) for b in np.unique(self.owner[k, start:start + self.slots[u]]) if b >= 0]
+        if any(self.assignments[b][1] < self._not_before[k] for b in blockers):
+            return None  # never move an observation that has already started
+        saved = {b: self.assignments[b] for b in blockers}
+        for b in blockers:
+            self._unplace(b)
+        self._place(u, k, start)
+        lost, moved = [], []
+        for b in sorted(blockers, key=lambda b: -self.value[b]):
+            slot = self._best_slot(b)
+            if slot is None:
+                lost.append(b)
+            else:
+                self._place(b, *slot)
+                moved.append(b)
+        if self.value[u] > sum(self.value[b] for b in lost) + 1e-9:
+            return lost
+        for b in moved:
+            self._unplace(b)
+        self._unplace(u)
+        for b, placement in saved.items():
+            self._place(b, *placement)
+        return None
+
+    def _improve(self, pending, deadline):
+        """Local search: insert unscheduled requests by ejecting cheaper ones, until no move helps"""
+        pending = {r for r in pending if r not in self.assignments}
+        improved = True
+        while improved and time.perf_counter() < deadline:
+            improved = False
+            for u in sorted(pending, key=lambda r: -self.value[r]):
+                if time.perf_counter() >= deadline:
+                    break
+                if u in self.assignments:
+                    continue
+                ks = self._candidates(u)
+                if not len(ks):
+                    continue
+                quality = self._open(ks, u)
+                # Value in the way at each start, counting each owner's value per slot covered
+                cum = self._blocked[ks]
+                end = np.minimum(self._starts + self.slots[u], self.n_slots)
+                cost = np.where(quality > 0, cum[:, end] - cum[:, :-1], np.inf).ravel()
+                cheapest = np.argpartition(cost, EJECT_CANDIDATES)[:EJECT_CANDIDATES] \
+                    if cost.size > EJECT_CANDIDATES else np.arange(cost.size)
+                for best in cheapest[np.argsort(cost[cheapest])]:
+                    if cost[best] >= self.value[u]:
+                        break
+                    i, start = divmod(int(best), self.n_slots)
+                    lost = self._eject_insert(u, int(ks[i]), start)
+                    if lost is not None:
+                        pending.discard(u)
+                        pending.update(lost)
+                        improved = True
+                        break
+
+    def _scheduled_value(self):
+        return float(sum(self.value[r] for r in self.assignments))
+
+    def run(self):
+        """Schedule the whole queue from scratch, returns self"""
+        for r in list(self.assignments):
+            self._unplace(r)
+        started = time.perf_counter()
+        self._greedy(range(len(self.requests)))
+        self.timings['greedy'] = time.perf_counter() - started
+        self.greedy_value = self._scheduled_value()
+        started = time.perf_counter()
+        self._improve(range(len(self.requests)), started + self.time_limit)
+        self.timings['search'] = time.perf_counter() - started
+        return self
+
+    def _set_now(self, now):
+        now = _minutes(now)
+        first = self.times[:, 0].astype(np.int64)
+        not_before = np.clip(-(-(now - first) // self.step), 0, self.n_slots)  # ceil
+        self._not_before = not_before[self.telescope_site]
+
+    def update(self, states, now=None):
+        """Apply {instrument name: new state} and reschedule incrementally
+
+        Observations on instruments that are no longer schedulable and
+        have not finished by `now` (default the current time) are
+        displaced; nothing starts before now. Returns the request ids that
+        were displaced, newly placed, moved or dropped, and the time taken.
+        """
+        started = time.perf_counter()
+        for name, state in states.items():
+            if name not in self.instruments:
+                raise ValueError(f"Unknown instrument {name!r}")
+            self.instruments[name]['state'] = state
+        self._set_now(now or utc_now())
+        self._index_instruments()
+
+        before = dict(self.assignments)
+        displaced = {r for r, (k, start, name) in before.items()
+                     if self.instruments[name]['state'] not in SCHEDULABLE_STATES
+                     and start + self.slots[r] > self._not_before[k]}
+        for r in displaced:
+            self._unplace(r)
+        # Free slots go to the whole unscheduled queue; ejections are only worth trying for the
+        # displaced, since capacity did not grow for anything that was already left out
+        self._greedy([r for r in range(len(self.requests)) if r not in self.assignments])
+        self._improve(displaced, time.perf_counter() + self.time_limit)
+
+        after = self.assignments
+        return {
+            'displaced': [self.requests[r]['id'] for r in sorted(displaced)],
+            'placed': [self.requests[r]['id'] for r in after if r not in before or r in displaced],
+            'moved': [self.requests[r]['id'] for r in after
+                      if r in before and r not in displaced and after[r][:2] != before[r][:2]],
+            'dropped': [self.requests[r]['id'] for r in before if r not in after and r not in displaced],
+            'seconds': round(time.perf_counter() - started, 4),
+        }
+
+    def set_instrument_state(self, name, state, now=None):
+        """update() for a single instrument"""
+        return self.update({name: state}, now)
+
+    def apply_status(self, telescopes, now=None):
+        """update() from a fresh status list (InstrumentTable or dicts), applying only changed states"""
+        changes = {t['name']: t.get('state') for t in telescopes
+                   if t['name'] in self.instruments and self.instruments[t['name']]['state'] != t.get('state')}
+        return self.update(changes, now)
+
+    def result(self):
+        """{'night', 'assignments', 'unscheduled', 'stats'}, assignments ordered by site, telescope and start"""
+        def iso(site, slot):
+            return str(self.times[site, 0] + np.timedelta64(int(slot) * self.step, 'm')) + 'Z'
+
+        assignments = []
+        for r, (k, start, instrument) in self.assignments.items():
+            request, site = self.requests[r], self.telescope_site[k]
+            assignments.append({
+                'request': request['id'],
+                'target': request['target']['name'],
+                'site': self.telescopes[k][0],
+                'telescope': self.telescopes[k][1],
+                'instrument': instrument,
+                'start': iso(site, start),
+                'end': iso(site, start + self.slots[r]),
+                'priority': request['priority'],
+                'quality': round(float(self.quality[r, site, start]), 3),
+            })
+        assignments.sort(key=lambda a: (a['site'], a['telescope'], a['start']))
+        hours = self.slots * self.step / 60
+        scheduled = list(self.assignments)
+        return {
+            'night': self.night.isoformat(),
+            'nights': self.nights,
+            'assignments': assignments,
+            'unscheduled': [q['id'] for r, q in enumerate(self.requests) if r not in self.assignments],
+            'stats': {
+                'requests': len(self.requests),
+                'scheduled': len(scheduled),
+                'telescopes': len(self.telescopes),
+                'requested_hours': round(float(hours.sum()), 2),
+                'scheduled_hours': round(float(hours[scheduled].sum()), 2),
+                'value': round(self._scheduled_value(), 2),
+                'greedy_value': round(getattr(self, 'greedy_value', 0.0), 2),
+                'seconds': {name: round(seconds, 3) for name, seconds in self.timings.items()},
+            },
+        }
+
+
+def schedule(sites, instruments, requests, night=None, **options):
+    """Build a Scheduler and run it, see Scheduler for the options"""
+    return Scheduler(sites, instruments, requests, night, **options).run()
+
+
+# Synthetic network and queues for the benchmark: (telescope, instrument type) per site
+SYNTHETIC_TELESCOPES = [
+    ('1m0a', '1M0-SCICAM-SINISTRO'), ('1m0b', '1M0-SCICAM-SINISTRO'), ('1m0c', '1M0-SCICAM-SINISTRO'),
+    ('2m0a', '2M0-FLOYDS-SCICAM'), ('0m4a', '0M4-SCICAM-QHY600'), ('0m4b', '0M4-SCICAM-QHY600'),
+]
+
+
+def synthetic_network(sites, telescopes=SYNTHETIC_TELESCOPES):
+    """Instrument dicts, all schedulable, for every telescope at every site"""
+    return [{'name': f"{site['code']}-{telescope}", 'site': site['code'], 'telescope': telescope,
+             'state': 'SCHEDULABLE', 'instrument_type': kind}
+            for site in sites for telescope, kind in telescopes]
+
+
+def synthetic_queue(count, sites, seed=0, telescopes=SYNTHETIC_TELESCOPES):
+    """count random requests: fixed targets across the sky, 10-120 min, priorities 1-10, a fifth site-restricted"""
+    rng = random.Random(seed)
+    kinds = sorted({kind for _, kind in telescopes})
+    codes = [site['code'] for site in sites]
+    queue = []
+    for i in range(count):
+        request = {
+            'id': f"req-{i:05d}",
+            'target': {'name': f"T{i:05d}", 'ra': rng.uniform(0, 360),
+                       'dec': np.degrees(np.arcsin(rng.uniform(-0.95, 0.95)))},
+            'duration': rng.choice([10, 15, 20, 30, 45, 60, 90, 120]),
+            'priority': rng.randint(1, 10),
+            'instrument_type': rng.choice(kinds),
+        }
+        if rng.random() < 0.2:
+            request['sites'] = rng.sample(codes, 2)
+        queue.append(request)
+    return queue
+
+
+def bench(sites, sizes=(500, 2000, 5000), night=None, nights=1):
+    """Time visibility, greedy, local search and an incremental reschedule per queue size"""
+    night = night or utc_now().date()
+    instruments = synthetic_network(sites)
+    print(f"⏱️  Scheduler benchmark: {len(instruments)} telescopes at {len(sites)} sites, "
+          f"night of {night}, {nights} night(s)")
+    for size in sizes:
+        scheduler = schedule(sites, instruments, synthetic_queue(size, sites), night, nights=nights)
+        stats = scheduler.result()['stats']
+        seconds = stats['seconds']
+
+        # Take down the busiest instrument before any site's night starts, then bring it back
+        busiest = max(scheduler.instruments, key=lambda name: sum(
+            1 for _, _, inst in scheduler.assignments.values() if inst == name))
+        now = datetime.combine(night, datetime.min.time())
+        down = scheduler.set_instrument_state(busiest, 'MANUAL', now)
+        up = scheduler.set_instrument_state(busiest, 'SCHEDULABLE', now)
+        print(f"\n📋 {size} requests: {stats['scheduled']} scheduled "
+              f"({stats['scheduled_hours']:.0f}h of {stats['requested_hours']:.0f}h requested)")
+        print(f"   visibility {seconds['visibility']:.2f}s, greedy {seconds['greedy']:.2f}s, "
+              f"local search {seconds['search']:.2f}s "
+              f"(value {stats['greedy_value']:.0f} -> {stats['value']:.0f})")
+        print(f"   🔧 {busiest} down: {len(down['displaced'])} displaced, {len(down['placed'])} re-placed, "
+              f"{len(down['dropped'])} dropped in {down['seconds']:.2f}s; "
+              f"back up: {len(up['placed'])} placed in {up['seconds']:.2f}s")
+
+
+def main():
+    from LCO_Integration import DEMO_SITE_RECORDS, SimpleLCODemo
+
+    parser = argparse.ArgumentParser(description="Assign observation requests to LCO telescopes")
+    parser.add_argument('--night', type=date.fromisoformat, help="first night, default today (UTC)")
+    parser.add_argument('--nights', type=int, default=1)
+    parser.add_argument('--queue', help="JSON file with a list of requests, default a synthetic queue")
+    parser.add_argument('--requests', type=int, default=300, help="size of the synthetic queue")
+    parser.add_argument('--live', action='store_true', help="use live LCO sites and instrument states")
+    parser.add_argument('--time-limit', type=float, default=2.0, help="local search budget, seconds")
+    parser.add_argument('--bench', action='store_true', help="time synthetic queues of 500-5000 requests")
+    parser.add_argument('--json', action='store_true', help="print the full schedule as JSON")
+    args = parser.parse_args()
+
+    if args.bench:
+        bench(list(DEMO_SITE_RECORDS), night=args.night, nights=args.nights)
+        return
+
+    if args.live:
+        lco = SimpleLCODemo()
+        sites, instruments = lco.get_site_index()[0].sites, lco.get_telescope_status()
+    else:
+        sites = list(DEMO_SITE_RECORDS)
+        instruments = synthetic_network(sites)
+    if args.queue:
+        with open(args.queue) as f:
+            queue = json.load(f)
+    else:
+        queue = synthetic_queue(args.requests, sites)
+
+    try:
+        plan = schedule(sites, instruments, queue, args.night, nights=args.nights,
+                        time_limit=args.time_limit).result()
+    except ValueError as e:
+        parser.error(str(e))
+
+    if args.json:
+        print(json.dumps(plan, indent=2))
+        return
+
+    stats = plan['stats']
+    print(f"🔭 Schedule for the night of {plan['night']}: {stats['scheduled']}/{stats['requests']} requests "
+          f"on {stats['telescopes']} telescopes, {stats['scheduled_hours']:.1f}h")
+    current = None
+    for assignment in plan['assignments']:
+        telescope = (assignment['site'], assignment['telescope'])
+        if telescope != current:
+            current = telescope
+            print(f"\n📍 {assignment['site']} {assignment['telescope']}")
+        print(f"   {assignment['start'][5:16]}-{assignment['end'][11:16]} {assignment['target']:<12} "
+              f"p{assignment['priority']:g} {assignment['instrument']} (quality {assignment['quality']:.2f})")
+    if plan['unscheduled']:
+        print(f"\n⏳ {len(plan['unscheduled'])} unscheduled")
+
+
+if __name__ == "__main__":
+    main()
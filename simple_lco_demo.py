@@ -1,56 +1,91 @@
 
-import json
-import urllib.request
 import urllib.parse
 from datetime import datetime, timedelta
 import math
+import random
+
+from lco_cache import TTLCache
+from lco_health import probe_endpoints
+from lco_pagination import iter_records
+from lco_transport import get_default_transport
+from metrics import error_category
+from status_stream import state_counts
 
 
 class SimpleLCODemo:
-    def __init__(self, api_token=None):
+    # (fresh seconds, extra seconds served stale while refreshing) per endpoint
+    CACHE_TTLS = {
+        'sites': (24 * 3600, 7 * 24 * 3600),
+        'instruments': (300, 600),
+        'health': (60, 0),
+    }
+
+    def __init__(self, api_token=None, transport=None, cache=None, seed=None,
+                 base_url=None, archive_url=None):
         self.api_token = api_token
-        self.base_url = "https://observe.lco.global/api"
+        # Override both to run against a local stand-in (see lco_standin.py)
+        self.base_url = base_url or "https://observe.lco.global/api"
+        self.archive_url = archive_url or "https://archive-api.lco.global"
+        # Shared keep-alive pool, pass your own transport to tune timeouts
+        self.transport = transport or get_default_transport()
+        self.cache = cache or TTLCache(max_entries=128)
+        # Seed it for reproducible demo scores
+        self.rng = random.Random(seed)
+
+    def _auth_headers(self):
+        headers = {}
+        if self.api_token:
+            headers['Authorization'] = f'Token {self.api_token}'
+        return headers
+
+    def _fetch_json(self, url):
+        """Like make_request, but raises instead of returning None"""
+        return self.transport.get_json(url, self._auth_headers())
 
     def make_request(self, url):
         """Make HTTP request to LCO API"""
         try:
-            req = urllib.request.Request(url)
-            if self.api_token:
-                req.add_header('Authorization', f'Token {self.api_token}')
-
-            with urllib.request.urlopen(req, timeout=10) as response:
-                return json.loads(response.read().decode())
+            return self._fetch_json(url)
         except Exception as e:
-            print(f"API Request failed: {e}")
+            print(f"API Request failed ({error_category(e)}): {e}")
             return None
 
-    def test_connection(self):
-        """Test if we can connect to LCO API"""
+    def check_health(self, timeout=10):
+        """Probe all candidate endpoints at once and report which one answered"""
         # Try multiple endpoints to find working one
         test_urls = [
             f"{self.base_url}/sites/",
             f"{self.base_url}/site/",
-            "https://observe.lco.global/api/profile/",
-            "https://archive-api.lco.global/frames/"
+            f"{self.base_url}/profile/",
+            f"{self.archive_url}/frames/"
         ]
+        ttl, stale = self.CACHE_TTLS['health']
+        return self.cache.get_or_load(
+            'health', lambda: probe_endpoints(test_urls, self._fetch_json, timeout), ttl, stale)
+
+    def test_connection(self):
+        """Test if we can connect to LCO API"""
+        report = self.check_health()
 
-        for url in test_urls:
-            print(f"Testing: {url}")
-            data = self.make_request(url)
-            if data:
-                print("✅ Successfully connected to LCO API!")
-                if isinstance(data, dict) and 'results' in data:
-                    print(f"Found {len(data.get('results', []))} items")
-                else:
-                    print("Connected and received data")
-                return True
+        for endpoint in report['endpoints']:
+            latency = f"{endpoint['latency_ms']:.0f} ms" if endpoint['latency_ms'] is not None else "-"
+            print(f"Testing: {endpoint['url']} - {endpoint['status']} ({latency})")
+
+        if report['ok']:
+            print("✅ Successfully connected to LCO API!")
+            winner = next(e for e in report['endpoints'] if e['url'] == report['winner'])
+            if 'items' in winner:
+                print(f"Found {winner['items']} items")
+            else:
+                print("Connected and received data")
+            return True
 
         print("❌ Could not connect to LCO API")
         print("This is normal - LCO API may require authentication or have changed endpoints")
         return False
 
-    def get_observatory_sites(self):
-        """Get list of all LCO observatory sites"""
+    def _fetch_sites(self):
+        """Download the site list and index it by code (None on failure)"""
         url = f"{self.base_url}/sites/"
         data = self.make_request(url)
 
@@ -65,20 +100,40 @@ class SimpleLCODemo:
                     'elevation': site.get('elevation'),
                     'timezone': site.get('timezone')
                 })
-            return sites
-        return []
+            return sites, {site['code']: site for site in sites}
+        return None
 
-    def get_telescope_status(self, site_code=None):
-        """Get current telescope status"""
-        url = f"{self.base_url}/instruments/"
+    def _load_sites(self):
+        ttl, stale = self.CACHE_TTLS['sites']
+        return self.cache.get_or_load('sites', self._fetch_sites, ttl, stale) or ([], {})
+
+    def get_observatory_sites(self):
+        """Get list of all LCO observatory sites"""
+        return self._load_sites()[0]
+
+    def get_site(self, site_code):
+        """Look up one site by code without scanning the list"""
+        return self._load_sites()[1].get(site_code)
+
+    def iter_instruments(self, site_code=None, fields=None, **filters):
+        """Stream instrument records across every page"""
         if site_code:
-            url += f"?site={site_code}"
+            filters['site'] = site_code
+        return iter_records(self._fetch_json, f"{self.base_url}/instruments/", filters, fields)
 
-        data = self.make_request(url)
+    def iter_frames(self, fields=None, page_size=100, **filters):
+        """Stream archive frame metadata across every page
 
-        if data and 'results' in data:
+        filters are passed to the archive API as-is, e.g. SITEID='ogg',
+        start='2024-01-01', OBJECT='M42'.
+        """
+        filters.setdefault('limit', page_size)
+        return iter_records(self._fetch_json, f"{self.archive_url}/frames/", filters, fields)
+
+    def _fetch_telescope_status(self, site_code):
+        try:
             telescopes = []
-            for instrument in data['results']:
+            for instrument in self.iter_instruments(site_code):
                 telescopes.append({
                     'name': instrument.get('name'),
                     'site': instrument.get('site'),
@@ -87,7 +142,16 @@ class SimpleLCODemo:
                     'type': instrument.get('instrument_type')
                 })
             return telescopes
-        return []
+        except Exception as e:
+            print(f"API Request failed ({error_category(e)}): {e}")
+            return None
+
+    def get_telescope_status(self, site_code=None):
+        """Get current telescope status"""
+        ttl, stale = self.CACHE_TTLS['instruments']
+        telescopes = self.cache.get_or_load(
+            ('instruments', site_code), lambda: self._fetch_telescope_status(site_code), ttl, stale)
+        return telescopes or []
 
     def calculate_visibility_score(self, lat, lon, elevation=0):
         """Calculate visibility score based on location"""
@@ -103,22 +167,21 @@ class SimpleLCODemo:
         score += lat_factor * 10
 
         # Add some randomness for weather simulation
-        import random
-        weather_factor = random.uniform(-20, 20)
+        weather_factor = self.rng.uniform(-20, 20)
         score += weather_factor
 
         return max(0, min(100, score))
 
     def generate_forecast_report(self, site_code):
         """Generate a complete forecast report for a site"""
-        sites = self.get_observatory_sites()
-        site_info = next((s for s in sites if s['code'] == site_code), None)
+        site_info = self.get_site(site_code)
 
         if not site_info:
             return f"Site {site_code} not found"
 
         # Get telescope status
         telescopes = self.get_telescope_status(site_code)
+        counts = state_counts(telescopes)
 
         # Calculate visibility
         visibility_score = self.calculate_visibility_score(
@@ -140,9 +203,9 @@ class SimpleLCODemo:
 
 🔭 TELESCOPE STATUS
 {'-' * 20}
-Total Instruments: {len(telescopes)}
-Available: {len([t for t in telescopes if t['state'] == 'AVAILABLE'])}
-Maintenance: {len([t for t in telescopes if t['state'] != 'AVAILABLE'])}
+Total Instruments: {counts['total']}
+Available: {counts['available']}
+Maintenance: {counts['unavailable']}
 
 🌤️  VISIBILITY FORECAST
 {'-' * 20}
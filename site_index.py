@@ -0,0 +1,187 @@
+# site_index.py
+# Ball tree over observatory sites on the unit sphere, for nearest-site and radius queries
+# Sites are stored as 3-D unit vectors; chord length orders points exactly like great-circle distance
+
+import heapq
+import threading
+
+import numpy as np
+
+
+EARTH_RADIUS_KM = 6371.0
+LEAF_SIZE = 8
+
+
+def unit_vectors(lats, lons):
+    """(n, 3) unit vectors for latitudes/longitudes in degrees"""
+    lat = np.radians(np.asarray(lats, dtype=float))
+    lon = np.radians(np.asarray(lons, dtype=float))
+    cos_lat = np.cos(lat)
+    return np.stack([cos_lat * np.cos(lon), cos_lat * np.sin(lon), np.sin(lat)], axis=-1)
+
+
+def chord_to_km(chord):
+    return 2 * EARTH_RADIUS_KM * np.arcsin(np.clip(np.asarray(chord) / 2, 0, 1))
+
+
+def km_to_chord(km):
+    return 2 * np.sin(min(km / EARTH_RADIUS_KM, np.pi) / 2)
+
+
+class BallTree:
+    """Static ball tree over 3-D points, stored as flat node arrays
+
+    Node i covers points[order[start[i]:end[i]]] inside a ball of radius[i]
+    around center[i]; children of i are left[i] and left[i] + 1.
+    """
+
+    def __init__(self, points, leaf_size=LEAF_SIZE):
+        self.points = np.ascontiguousarray(points, dtype=float).reshape(-1, 3)
+        self.leaf_size = leaf_size
+        self.order = np.arange(len(self.points))
+        self.center, self.radius, self.start, self.end, self.left = [], [], [], [], []
+        if len(self.points):
+            self._reserve(1)
+            self._fill(0, 0, len(self.points))
+        self.center = np.array(self.center).reshape(-1, 3)
+        self.radius = np.array(self.radius)
+        self.left = np.array(self.left, dtype=int)
+
+    def _reserve(self, count):
+        for _ in range(count):
+            self.center.append(None)
+            self.radius.append(0.0)
+            self.start.append(0)
+            self.end.append(0)
+            self.left.append(-1)
+
+    def _fill(self, node, start, end):
+        members = self.points[self.order[start:end]]
+        center = members.mean(axis=0)
+        self.center[node] = center
+        self.radius[node] = float(np.sqrt(((members - center) ** 2).sum(axis=1)).max())
+        self.start[node] = start
+        self.end[node] = end
+        if end - start > self.leaf_size:
+            # Split at the median of the widest axis; children are allocated
+            # as a pair so the right one is always left + 1
+            axis = int(np.ptp(members, axis=0).argmax())
+            mid = (end - start) // 2
+            self.order[start:end] = self.order[start:end][np.argpartition(members[:, axis], mid)]
+            self.left[node] = len(self.start)
+            self._reserve(2)
+            self._fill(self.left[node], start, start + mid)
+            self._fill(self.left[node] + 1, start + mid, end)
+
+    def _bound(self, node, q):
+        return max(float(np.linalg.norm(q - self.center[node])) - self.radius[node], 0.0)
+
+    def _leaf(self, node, q):
+        idx = self.order[self.start[node]:self.end[node]]
+        return idx, np.sqrt(((self.points[idx] - q) ** 2).sum(axis=1))
+
+    def query(self, q, k=1):
+        """(indices, chord distances) of the k points nearest q, closest first"""
+        k = min(k, len(self.points))
+        if k <= 0:
+            return np.array([], dtype=int), np.array([])
+        best = []  # max-heap of (-distance, index)
+        stack = [(0.0, 0)]
+        while stack:
+            bound, node = stack.pop()
+            if len(best) == k and bound >= -best[0][0]:
+                continue
+            if self.left[node] < 0:
+                for i, d in zip(*self._leaf(node, q)):
+                    if len(best) < k:
+                        heapq.heappush(best, (-d, i))
+                    elif d < -best[0][0]:
+                        heapq.heapreplace(best, (-d, i))
+                continue
+            near, far = self.left[node], self.left[node] + 1
+            near_bound, far_bound = self._bound(near, q), self._bound(far, q)
+            if far_bound < near_bound:
+                near, far, near_bound, far_bound = far, near, far_bound, near_bound
+            # Push the far child first so the near one is searched first
+            stack.append((far_bound, far))
+            stack.append((near_bound, near))
+        best.sort(key=lambda item: -item[0])
+        return np.array([i for _, i in best], dtype=int), np.array([-d for d, _ in best])
+
+    def query_radius(self, q, r):
+        """(indices, chord distances) of every point within chord distance r, closest first"""
+        found, dists = [], []
+        stack = [0] if len(self.points) else []
+        while stack:
+            node = stack.pop()
+            if self._bound(node, q) > r:
+                continue
+            if self.left[node] < 0:
+                idx, d = self._leaf(node, q)
+                keep = d <= r
+                found.extend(idx[keep])
+                dists.extend(d[keep])
+            else:
+                stack.extend((self.left[node], self.left[node] + 1))
+        order = np.argsort(dists, kind='stable')
+        return np.array(found, dtype=int)[order], np.array(dists)[order]
+
+
+class SiteIndex:
+    """Nearest-site and radius lookups over site dicts (code, latitude, longitude, ...)
+
+    update() is cheap to call on every request: it only does work when the
+    site list changed, and reuses the unit vectors of sites it already had.
+    Readers always see a matching (sites, tree) pair, swapped in one step.
+    """
+
+    def __init__(self, sites=(), leaf_size=LEAF_SIZE):
+        self.leaf_size = leaf_size
+        self._lock = threading.Lock()
+        self._vectors = {}  # (code, lat, lon) -> unit vector
+        self._signature = None
+        self._state = ([], BallTree(np.empty((0, 3)), leaf_size))
+        self.update(sites)
+
+    @property
+    def sites(self):
+        return self._state[0]
+
+    def update(self, sites):
+        """Re-index if the site list changed, returns True when it did"""
+        sites = [s for s in sites if s.get('latitude') is not None and s.get('longitude') is not None]
+        keys = [(s.get('code'), float(s['latitude']), float(s['longitude'])) for s in sites]
+        signature = tuple(keys)
+        with self._lock:
+            if signature == self._signature:
+                self._state = (sites, self._state[1])
+                return False
+
+            new = [key for key in keys if key not in self._vectors]
+            if new:
+                vectors = unit_vectors([key[1] for key in new], [key[2] for key in new])
+                self._vectors.update(zip(new, vectors))
+            self._vectors = {key: self._vectors[key] for key in keys}
+            tree = BallTree(np.array([self._vectors[key] for key in keys]).reshape(-1, 3), self.leaf_size)
+            self._state = (sites, tree)
+            self._signature = signature
+            return True
+
+    def __len__(self):
+        return len(self.sites)
+
+    @staticmethod
+    def _results(sites, idx, chords):
+        return [(sites[i], round(float(km), 1)) for i, km in zip(idx, chord_to_km(chords))]
+
+    def nearest(self, lat, lon, k=3):
+        """[(site, distance_km)] for the k closest sites"""
+        sites, tree = self._state
+        idx, chords = tree.query(unit_vectors(lat, lon), k)
+        return self._results(sites, idx, chords)
+
+    def within(self, lat, lon, radius_km, limit=None):
+        """[(site, distance_km)] for every site within radius_km, closest first"""
+        sites, tree = self._state
+        idx, chords = tree.query_radius(unit_vectors(lat, lon), km_to_chord(radius_km))
+        return self._results(sites, idx[:limit], chords[:limit])
@@ -0,0 +1,52 @@
+# static_page.py
+# In-memory, precompressed static page for the Flask app
+# brotli is optional, gzip is always available
+
+import gzip
+import hashlib
+
+from flask import Response
+
+try:
+    import brotli
+except ImportError:
+    brotli = None
+
+
+class PrecompressedPage:
+    """A file read once at startup and served from memory with ETags and 304s"""
+
+    def __init__(self, body, mimetype='text/html', max_age=300):
+        self.mimetype = mimetype
+        self.cache_control = f'public, max-age={max_age}'
+        digest = hashlib.sha256(body).hexdigest()[:32]
+
+        # Strong ETags have to differ per encoding, the bytes on the wire differ
+        self.variants = {'identity': (body, digest)}
+        self.variants['gzip'] = (gzip.compress(body, compresslevel=9, mtime=0), f'{digest}-gz')
+        if brotli is not None:
+            self.variants['br'] = (brotli.compress(body, quality=11), f'{digest}-br')
+        self.preference = [e for e in ('br', 'gzip', 'identity') if e in self.variants]
+
+    @classmethod
+    def from_file(cls, path, **kwargs):
+        with open(path, 'rb') as f:
+            return cls(f.read(), **kwargs)
+
+    def response(self, request):
+        """Build the response for request: 304, or the best encoding the client accepts"""
+        encoding = request.accept_encodings.best_match(self.preference, default='identity')
+        body, etag = self.variants[encoding]
+
+        headers = {
+            'Cache-Control': self.cache_control,
+            'ETag': f'"{etag}"',
+            'Vary': 'Accept-Encoding',
+        }
+        if encoding != 'identity':
+            headers['Content-Encoding'] = encoding
+
+        # Only the negotiated variant's tag: a 304 relabels the client's stored body with these headers
+        if request.if_none_match.contains_weak(etag) or request.if_none_match.star_tag:
+            return Response(status=304, headers=headers)
+        return Response(body, mimetype=self.mimetype, headers=headers)
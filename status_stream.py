@@ -0,0 +1,208 @@
+# status_stream.py
+# One background poller per site, diffing instrument snapshots and fanning them out to subscribers
+# Standard library only; APP.py streams the events as Server-Sent Events
+
+import json
+import queue
+import threading
+from collections import Counter
+
+
+def state_counts(telescopes):
+    """{'total', 'available', 'unavailable', 'by_state'} in one pass over the list"""
+    if hasattr(telescopes, 'count_by'):
+        by_state = Counter(telescopes.count_by('state'))  # InstrumentTable: one bincount
+    else:
+        by_state = Counter(t.get('state') for t in telescopes)
+    total = sum(by_state.values())
+    return {
+        'total': total,
+        'available': by_state.get('AVAILABLE', 0),
+        'unavailable': total - by_state.get('AVAILABLE', 0),
+        'by_state': dict(by_state),
+    }
+
+
+def diff_snapshots(old, new):
+    """(changed or added records, removed names) between two {name: record} snapshots"""
+    changed = [record for name, record in new.items() if old.get(name) != record]
+    removed = [name for name in old if name not in new]
+    return changed, removed
+
+
+class Subscription:
+    """A subscriber's event queue; a subscriber that falls behind is resynced with a snapshot"""
+
+    def __init__(self, maxsize=64):
+        self.events = queue.Queue(maxsize=maxsize)
+        self.overflowed = False
+
+    def put(self, event):
+        try:
+            self.events.put_nowait(event)
+        except queue.Full:
+            self.overflowed = True
+
+    def get(self, timeout):
+        """Next (kind, payload) event, or None after timeout seconds"""
+        try:
+            return self.events.get(timeout=timeout)
+        except queue.Empty:
+            return None
+
+
+class SitePoller:
+    """Polls one site every interval seconds for as long as anyone is subscribed"""
+
+    def __init__(self, site_code, fetch, interval, on_idle):
+        self.site_code = site_code
+        self.fetch = fetch
+        self.interval = interval
+        self.on_idle = on_idle
+        self.lock = threading.RLock()
+        self.subscribers = set()
+        self.pending = 0  # subscribers waiting for the first poll
+        self.snapshot = {}  # name -> instrument record
+        self.counts = state_counts([])
+        self.version = 0
+        self.loaded = threading.Event()
+        self._stop = threading.Event()
+        self._thread = threading.Thread(target=self._run, daemon=True, name=f'status-{site_code}')
+
+    def start(self):
+        self._thread.start()
+        return self
+
+    def stop(self):
+        self._stop.set()
+
+    def snapshot_event(self):
+        with self.lock:
+            return 'snapshot', {
+                'site': self.site_code,
+                'version': self.version,
+                'instruments': list(self.snapshot.values()),
+                'counts': self.counts,
+            }
+
+    def _apply(self, telescopes):
+        new = {t['name']: t for t in telescopes}
+        with self.lock:
+            changed, removed = diff_snapshots(self.snapshot, new)
+            if not changed and not removed and self.version:
+                return None
+            # Running counts: only the instruments that moved are re-counted
+            by_state = Counter(self.counts['by_state'])
+            for record in changed:
+                if record['name'] in self.snapshot:
+                    by_state[self.snapshot[record['name']].get('state')] -= 1
+                by_state[record.get('state')] += 1
+            for name in removed:
+                by_state[self.snapshot[name].get('state')] -= 1
+            by_state = +by_state  # drop zero counts
+            total = sum(by_state.values())
+            self.counts = {
+                'total': total,
+                'available': by_state.get('AVAILABLE', 0),
+                'unavailable': total - by_state.get('AVAILABLE', 0),
+                'by_state': dict(by_state),
+            }
+            self.snapshot = new
+            self.version += 1
+            return {'site': self.site_code, 'version': self.version,
+                    'changed': changed, 'removed': removed, 'counts': self.counts}
+
+    def _publish(self, kind, payload):
+        with self.lock:
+            subscribers = list(self.subscribers)
+        for subscription in subscribers:
+            if subscription.overflowed:
+                # Missed diffs can't be replayed, start that subscriber over from a snapshot
+                subscription.overflowed = False
+                subscription.put(self.snapshot_event())
+            else:
+                subscription.put((kind, payload))
+
+    def _run(self):
+        while not self._stop.is_set():
+            telescopes = self.fetch(self.site_code)
+            if telescopes is None:
+                self._publish('error', {'site': self.site_code, 'error': 'upstream unavailable'})
+            else:
+                diff = self._apply(telescopes)
+                if diff is not None:
+                    self._publish('diff', diff)
+            self.loaded.set()
+            if self._stop.wait(self.interval):
+                break
+            with self.lock:
+                idle = not self.subscribers
+            if idle and self.on_idle(self):
+                break
+
+
+class StatusHub:
+    """Shares one SitePoller per site between every subscriber
+
+    Upstream load is one status fetch per site per interval, whether one
+    browser or a thousand are watching. Pollers stop when their last
+    subscriber leaves.
+    """
+
+    def __init__(self, fetch, interval=30):
+        self.fetch = fetch
+        self.interval = interval
+        self._lock = threading.Lock()
+        self._pollers = {}
+
+    def _release(self, poller):
+        """Called by an idle poller; True if it was removed and may exit"""
+        with self._lock, poller.lock:
+            if poller.subscribers or poller.pending:
+                return False
+            if self._pollers.get(poller.site_code) is poller:
+                del self._pollers[poller.site_code]
+            return True
+
+    def subscribe(self, site_code, wait=10):
+        """New Subscription for site_code whose first event is the current snapshot
+
+        Diffs carry the snapshot version; one at or below the snapshot's
+        version is already included in it and can be ignored.
+        """
+        subscription = Subscription()
+        with self._lock:
+            poller = self._pollers.get(site_code)
+            if poller is None:
+                poller = self._pollers[site_code] = SitePoller(
+                    site_code, self.fetch, self.interval, self._release).start()
+            with poller.lock:
+                poller.pending += 1
+        poller.loaded.wait(wait)
+        with poller.lock:
+            subscription.put(poller.snapshot_event())
+            poller.subscribers.add(subscription)
+            poller.pending -= 1
+        return subscription
+
+    def unsubscribe(self, site_code, subscription):
+        with self._lock:
+            poller = self._pollers.get(site_code)
+        if poller is not None:
+            with poller.lock:
+                poller.subscribers.discard(subscription)
+
+    def watchers(self):
+        """{site_code: subscriber count}"""
+        with self._lock:
+            return {code: len(poller.subscribers) for code, poller in self._pollers.items()}
+
+    def close(self):
+        with self._lock:
+            for poller in self._pollers.values():
+                poller.stop()
+            self._pollers.clear()
+
+
+def sse_format(kind, payload, dumps=json.dumps):
+    return f"event: {kind}\ndata: {dumps(payload, separators=(',', ':'))}\n\n"
@@ -0,0 +1,111 @@
+# visibility.py
+# Vectorized visibility scoring over a sites x time grid
+# Same model as SimpleLCODemo.calculate_visibility_score, one numpy pass for the whole grid
+
+from datetime import datetime, timezone
+
+import numpy as np
+
+
+DEFAULT_SEED = 0x5EED
+BASE_SCORE = 80
+WEATHER_RANGE = 20  # weather term is uniform in [-20, 20)
+
+
+def _splitmix64(x):
+    """splitmix64 finalizer, applied elementwise to a uint64 array"""
+    x = x + np.uint64(0x9E3779B97F4A7C15)
+    x ^= x >> np.uint64(30)
+    x *= np.uint64(0xBF58476D1CE4E5B9)
+    x ^= x >> np.uint64(27)
+    x *= np.uint64(0x94D049BB133111EB)
+    x ^= x >> np.uint64(31)
+    return x
+
+
+def _as_key(values):
+    return np.asarray(values, dtype=np.int64).view(np.uint64)
+
+
+def _utc_minute(t):
+    # Naive datetimes are UTC, like datetime64; never the host's local time zone
+    if t.tzinfo is not None:
+        t = t.astimezone(timezone.utc).replace(tzinfo=None)
+    return np.datetime64(t, 'm').astype(np.int64)
+
+
+def to_minutes(times):
+    """Convert datetimes (naive = UTC), datetime64 or epoch seconds to integer epoch minutes"""
+    times = np.asarray(times)
+    if np.issubdtype(times.dtype, np.datetime64):
+        return times.astype('datetime64[m]').astype(np.int64)
+    if times.dtype == object:
+        return np.array([_utc_minute(t) for t in times.ravel()], dtype=np.int64).reshape(times.shape)
+    return (times // 60).astype(np.int64)
+
+
+def time_grid(start=None, hours=6, step_minutes=60):
+    """Evenly spaced datetime64[m] slots starting at start (naive UTC, default now)"""
+    start = np.datetime64(start or datetime.now(timezone.utc).replace(tzinfo=None), 'm')
+    count = int(hours * 60 // step_minutes)
+    return start + np.arange(count) * np.timedelta64(int(step_minutes), 'm')
+
+
+def hash_uniform(*keys, seed=DEFAULT_SEED):
+    """Counter-based uniform [0, 1) draws, one per broadcast combination of keys
+
+    The same (seed, keys) always gives the same value, regardless of which
+    other sites or times are in the batch.
+    """
+    state = np.asarray(seed, dtype=np.uint64)
+    with np.errstate(over='ignore'):
+        for key in keys:
+            # Mix each key on its own (small) shape, so the full broadcast
+            # grid only sees the xor and the cheap finalizer below
+            state = _splitmix64(state) ^ _splitmix64(_as_key(key))
+        state = np.asarray(state * np.uint64(0xD6E8FEB86659FD93))
+    state ^= state >> np.uint64(32)
+    state >>= np.uint64(11)
+    draws = state.astype(np.float64)
+    draws *= 1.0 / (1 << 53)
+    return draws
+
+
+def weather_noise(lats, lons, times, seed=DEFAULT_SEED):
+    """Reproducible weather term for every (site, time), shape (n_sites, n_times)"""
+    lat_key = np.round(np.asarray(lats, dtype=float) * 1e4).astype(np.int64)[:, None]
+    lon_key = np.round(np.asarray(lons, dtype=float) * 1e4).astype(np.int64)[:, None]
+    time_key = to_minutes(times)[None, :]
+    draws = hash_uniform(lat_key, lon_key, time_key, seed=seed)
+    draws *= 2 * WEATHER_RANGE
+    draws -= WEATHER_RANGE
+    return draws
+
+
+def site_scores(lats, elevations):
+    """Weather-independent part of the score for each site"""
+    lats = np.asarray(lats, dtype=float)
+    elevations = np.asarray(elevations, dtype=float)
+    # Altitude bonus (higher = better) plus latitude factor
+    return BASE_SCORE + np.minimum(20, elevations / 200) + np.abs(lats) / 90 * 10
+
+
+def score_grid(lats, lons, elevations, times, weather=None, seed=DEFAULT_SEED):
+    """Score every site at every time in one pass, shape (n_sites, n_times)
+
+    weather, when given, replaces the simulated term and must broadcast to
+    (n_sites, n_times) in the same -20..20 units.
+    """
+    if weather is None:
+        weather = weather_noise(lats, lons, times, seed)
+    scores = site_scores(lats, elevations)[:, None] + weather
+    return np.clip(scores, 0, 100, out=scores)
+
+
+def score_sites(sites, times, weather=None, seed=DEFAULT_SEED):
+    """score_grid for a list of site dicts with latitude/longitude/elevation keys"""
+    lats = [site['latitude'] for site in sites]
+    lons = [site['longitude'] for site in sites]
+    elevations = [site.get('elevation') or 0 for site in sites]
+    return score_grid(lats, lons, elevations, times, weather, seed)
+
@@ -0,0 +1,263 @@
+# visibility_raster.py
+# Nightly precompute of the visibility model over a global lat/lon grid, stored as a memory-mapped .npy
+# Run this with: python3 visibility_raster.py build                 (tonight, 24 hourly slices)
+#                python3 visibility_raster.py build --date 2024-06-01 --workers 8
+#                python3 visibility_raster.py point --lat 20.7 --lon -156.3
+
+import argparse
+import glob
+import json
+import os
+import struct
+import threading
+import time
+import zlib
+from concurrent.futures import ProcessPoolExecutor
+from datetime import date, datetime, timedelta
+from functools import lru_cache
+
+import numpy as np
+
+from ephemeris import utc_now
+from visibility import DEFAULT_SEED, score_grid
+
+
+DEFAULT_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'data', 'raster')
+DEFAULT_RESOLUTION = 0.25  # degrees, same cell size as forecast.py
+DEFAULT_HOURS = 24
+ROWS_PER_TASK = 16
+TILE_SIZE = 256
+NO_DATA = 255
+
+# Score -> RGBA, same bands and colours as the page's excellent/good/fair/poor classes
+BANDS = [(80, (0x00, 0xff, 0x88)), (60, (0xff, 0xeb, 0x3b)), (40, (0xff, 0x98, 0x00)), (0, (0xf4, 0x43, 0x36))]
+
+
+def grid_axes(resolution):
+    """Cell-centre latitudes (north to south) and longitudes (west to east)"""
+    n_lat, n_lon = int(round(180 / resolution)), int(round(360 / resolution))
+    lats = 90 - (np.arange(n_lat) + 0.5) * resolution
+    lons = -180 + (np.arange(n_lon) + 0.5) * resolution
+    return lats, lons
+
+
+def slot_times(start, hours, step_minutes=60):
+    return np.datetime64(start, 'm') + np.arange(hours * 60 // step_minutes) * np.timedelta64(step_minutes, 'm')
+
+
+def _fill_rows(path, meta, row_start, row_end):
+    """Score rows [row_start, row_end) at every slot and write them into the raster in place"""
+    lats, lons = grid_axes(meta['resolution'])
+    times = slot_times(meta['start'], meta['hours'], meta['step_minutes'])
+    raster = np.load(path, mmap_mode='r+')
+
+    lat_cells = np.repeat(lats[row_start:row_end], len(lons))
+    lon_cells = np.tile(lons, row_end - row_start)
+    # No elevation model here, so every cell is scored at sea level
+    scores = score_grid(lat_cells, lon_cells, np.zeros(len(lat_cells)), times, seed=meta['seed'])
+    scores = np.rint(scores).astype(np.uint8).reshape(row_end - row_start, len(lons), -1)
+    raster[:, row_start:row_end, :] = scores.transpose(2, 0, 1)
+    raster.flush()
+    return row_end - row_start
+
+
+def raster_name(night):
+    return f'visibility-{night:%Y%m%d}'
+
+
+def build(night=None, out_dir=DEFAULT_DIR, hours=DEFAULT_HOURS, resolution=DEFAULT_RESOLUTION,
+          workers=None, seed=DEFAULT_SEED, keep=3):
+    """Compute the raster for one UTC night in parallel and publish it atomically
+
+    The array is (slots, lat rows, lon cols) uint8, so each hourly map is one
+    contiguous block. Returns the path of the published .npy file. The
+    newest keep builds (at least 1, the one just published) are kept.
+    """
+    if keep < 1:
+        raise ValueError("keep must be at least 1, the build being published")
+    night = night or utc_now().date()
+    os.makedirs(out_dir, exist_ok=True)
+    lats, lons = grid_axes(resolution)
+    meta = {
+        'start': f'{night:%Y-%m-%d}T00:00',
+        'hours': hours,
+        'step_minutes': 60,
+        'resolution': resolution,
+        'shape': [hours, len(lats), len(lons)],
+        'seed': seed,
+        'model': 'visibility.score_grid',
+        'built_at': utc_now().isoformat(timespec='seconds') + 'Z',
+    }
+
+    base = os.path.join(out_dir, raster_name(night))
+    tmp = f'{base}.{os.getpid()}.tmp.npy'
+    raster = np.lib.format.open_memmap(tmp, mode='w+', dtype=np.uint8, shape=tuple(meta['shape']))
+    raster[:] = NO_DATA
+    raster.flush()
+    del raster
+
+    # Each task writes a disjoint band of rows straight into the file, nothing large crosses processes
+    tasks = [(row, min(row + ROWS_PER_TASK, len(lats))) for row in range(0, len(lats), ROWS_PER_TASK)]
+    with ProcessPoolExecutor(max_workers=workers) as pool:
+        futures = [pool.submit(_fill_rows, tmp, meta, start, end) for start, end in tasks]
+        for future in futures:
+            future.result()
+
+    os.replace(tmp, base + '.npy')
+    with open(base + '.json.tmp', 'w') as f:
+        json.dump(meta, f, indent=1)
+    os.replace(base + '.json.tmp', base + '.json')
+
+    for old in sorted(glob.glob(os.path.join(out_dir, 'visibility-*.json')))[:-keep]:
+        for suffix in ('.json', '.npy'):
+            try:
+                os.remove(old[:-5] + suffix)
+            except FileNotFoundError:
+                pass
+    return base + '.npy'
+
+
+class VisibilityRaster:
+    """Read-only view of one built raster; lookups are slices of the memory map"""
+
+    def __init__(self, path, version=None):
+        self.path = path
+        self.version = version
+        with open(path[:-4] + '.json') as f:
+            self.meta = json.load(f)
+        self.scores = np.load(path, mmap_mode='r')
+        self.resolution = self.meta['resolution']
+        self.step = self.meta['step_minutes']
+        self.start = np.datetime64(self.meta['start'], 'm')
+        self.slots = self.scores.shape[0]
+        self.end = self.start + self.slots * np.timedelta64(self.step, 'm')
+
+    def slot(self, when=None):
+        """Index of the slot containing when (default now), or None outside the raster"""
+        when = np.datetime64(when or utc_now(), 'm')
+        index = int((when - self.start) // np.timedelta64(self.step, 'm'))
+        return index if 0 <= index < self.slots else None
+
+    def slot_start(self, index):
+        return int((self.start + index * np.timedelta64(self.step, 'm')).astype('datetime64[s]').astype(np.int64))
+
+    def cell(self, lat, lon):
+        rows, cols = self.scores.shape[1:]
+        row = min(max(int((90 - lat) / self.resolution), 0), rows - 1)
+        col = int(((lon + 180) % 360) / self.resolution) % cols
+        return row, col
+
+    def point(self, lat, lon):
+        """Every slot's score for the cell containing (lat, lon), a strided view into the file"""
+        row, col = self.cell(lat, lon)
+        return self.scores[:, row, col]
+
+    def covers(self, when=None):
+        return self.slot(when) is not None
+
+    def tile(self, index, z, x, y, size=TILE_SIZE):
+        """Scores of one Web Mercator tile (size x size) at slot index, nearest cell per pixel"""
+        n = 2 ** z
+        pixels = (np.arange(size) + 0.5) / size
+        lon = (x + pixels) / n * 360 - 180
+        lat = np.degrees(np.arctan(np.sinh(np.pi * (1 - 2 * (y + pixels) / n))))
+        rows, cols = self.scores.shape[1:]
+        row = np.clip(((90 - lat) / self.resolution).astype(int), 0, rows - 1)
+        col = (((lon + 180) % 360) / self.resolution).astype(int) % cols
+        # The slot is one contiguous block of the file; only the sampled cells are read
+        return self.scores[index][np.ix_(row, col)]
+
+
+def encode_png(indexed, palette, alpha):
+    """Palette PNG from a (h, w) uint8 array, standard library only"""
+    def chunk(kind, data):
+        return struct.pack('>I', len(data)) + kind + data + struct.pack('>I', zlib.crc32(kind + data) & 0xFFFFFFFF)
+
+    height, width = indexed.shape
+    raw = np.hstack([np.zeros((height, 1), dtype=np.uint8), indexed]).tobytes()  # filter byte 0 per row
+    return (b'\x89PNG\r\n\x1a\n'
+            + chunk(b'IHDR', struct.pack('>IIBBBBB', width, height, 8, 3, 0, 0, 0))
+            + chunk(b'PLTE', palette.tobytes())
+            + chunk(b'tRNS', alpha.tobytes())
+            + chunk(b'IDAT', zlib.compress(raw, 6))
+            + chunk(b'IEND', b''))
+
+
+def _palette():
+    palette = np.zeros((256, 3), dtype=np.uint8)
+    alpha = np.full(256, 170, dtype=np.uint8)
+    for score in range(101):
+        palette[score] = next(color for floor, color in BANDS if score >= floor)
+    alpha[NO_DATA] = 0
+    return palette, alpha
+
+
+PALETTE, ALPHA = _palette()
+
+
+# Keyed on (path, version) so a rebuilt night never serves tiles of the old file
+@lru_cache(maxsize=8)
+def _open(path, version):
+    return VisibilityRaster(path, version)
+
+
+@lru_cache(maxsize=2048)
+def _tile_png(path, version, index, z, x, y):
+    return encode_png(np.ascontiguousarray(_open(path, version).tile(index, z, x, y)), PALETTE, ALPHA)
+
+
+class RasterStore:
+    """Newest raster in a directory, re-checked for a fresh build at most every rescan seconds"""
+
+    def __init__(self, path=DEFAULT_DIR, rescan=60):
+        self.path = path
+        self.rescan = rescan
+        self._lock = threading.Lock()
+        self._checked = 0.0
+        self._latest = None
+
+    def current(self):
+        """The newest VisibilityRaster, or None if nothing has been built yet"""
+        with self._lock:
+            if time.monotonic() - self._checked >= self.rescan:
+                self._checked = time.monotonic()
+                builds = sorted(glob.glob(os.path.join(self.path, 'visibility-*.json')))
+                self._latest = (builds[-1][:-5] + '.npy', os.stat(builds[-1]).st_mtime_ns) if builds else None
+            latest = self._latest
+        return _open(*latest) if latest else None
+
+    def tile_png(self, raster, index, z, x, y):
+        """PNG bytes for one map tile, cached per raster build"""
+        return _tile_png(raster.path, raster.version, index, z, x, y)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Build or query the global visibility raster")
+    parser.add_argument('command', choices=['build', 'point'])
+    parser.add_argument('--dir', default=DEFAULT_DIR)
+    parser.add_argument('--date', type=date.fromisoformat, help="UTC night to build, default today")
+    parser.add_argument('--hours', type=int, default=DEFAULT_HOURS)
+    parser.add_argument('--resolution', type=float, default=DEFAULT_RESOLUTION)
+    parser.add_argument('--workers', type=int, help="processes, default one per core")
+    parser.add_argument('--lat', type=float)
+    parser.add_argument('--lon', type=float)
+    args = parser.parse_args()
+
+    if args.command == 'build':
+        started = time.perf_counter()
+        path = build(args.date, args.dir, args.hours, args.resolution, args.workers)
+        shape = np.load(path, mmap_mode='r').shape
+        print(f"✅ Built {path} {shape} in {time.perf_counter() - started:.1f}s")
+        return
+
+    raster = RasterStore(args.dir).current()
+    if raster is None:
+        print("No raster built yet, run: python3 visibility_raster.py build")
+        return
+    for i, score in enumerate(raster.point(args.lat, args.lon)):
+        slot = datetime(1970, 1, 1) + timedelta(seconds=raster.slot_start(i))
+        print(f"{slot:%Y-%m-%d %H:%M} UTC - {score}/100")
+
+
+if __name__ == "__main__":
+    main()